@@ -0,0 +1,130 @@
+"""Sharded alert evaluation spread across the day.
+
+Instead of checking every stock item at once, each cycle splits stock ids
+into ALERT_SHARDS contiguous ranges and evaluates them one at a time, spread
+evenly over ALERT_WINDOW_HOURS with up to ALERT_JITTER_MINUTES of random
+delay per shard. Each shard updates its alerts, queues its digest email and
+advances the cycle checkpoint in a single transaction, so a crash loses at
+most the shard in progress, which is redone by whichever worker leads next.
+
+run_alert_shards() is registered as a scheduler job and polled every
+ALERT_SHARD_POLL_MINUTES; it runs the shards that are due and returns. After
+downtime the overdue shards are caught up ALERT_MAX_SHARDS_PER_POLL at a time
+rather than all at once. A shard that raises is retried on the next poll and
+skipped for the rest of the cycle after ALERT_SHARD_MAX_ATTEMPTS failures, so
+one bad shard cannot hold up the others.
+"""
+import random
+from datetime import datetime, timedelta
+from flask import current_app
+from alerts import check_low_stock, check_expiration, build_alert_messages, enqueue_alert_messages
+from db import db
+from models.alert_cycle import AlertCycle
+from models.stock import StockItem
+
+cycle_table = AlertCycle.__table__
+
+
+def shard_range(cycle, shard):
+    """The [low, high) stock id range of a shard; the last one also covers ids created during the cycle."""
+    low = shard * cycle.shard_size
+    high = None if shard == cycle.shard_count - 1 else low + cycle.shard_size
+    return (low, high)
+
+
+def shard_due_at(cycle, shard, window, jitter):
+    """Shards are evenly spaced over the window, each delayed by a jitter fixed per cycle and shard."""
+    slot = window / cycle.shard_count
+    delay = random.Random(f"{cycle.cycle_id}:{shard}").uniform(0, min(jitter, slot).total_seconds())
+    return cycle.started_at + slot * shard + timedelta(seconds=delay)
+
+
+def current_cycle(now, window):
+    """Return the cycle in progress, starting a new one when the last has finished and its window has passed."""
+    cycle = AlertCycle.query.order_by(AlertCycle.cycle_id.desc()).first()
+    if cycle is not None and (cycle.completed_at is None or now < cycle.started_at + window):
+        return cycle
+
+    shard_count = current_app.config['ALERT_SHARDS']
+    max_id = db.session.query(db.func.max(StockItem.stock_id)).scalar() or 0
+    cycle = AlertCycle(
+        started_at=now,
+        shard_count=shard_count,
+        shard_size=max_id // shard_count + 1,
+        next_shard=0,
+    )
+    db.session.add(cycle)
+    db.session.commit()
+    print(f"Started alert cycle {cycle.cycle_id}: {shard_count} shards of {cycle.shard_size} stock ids")
+    return cycle
+
+
+def run_shard(cycle, shard):
+    """Evaluate one shard and advance the checkpoint; returns the number of alert emails queued."""
+    stock_range = shard_range(cycle, shard)
+    sections = [
+        check_low_stock(send_email=False, stock_range=stock_range, commit=False),
+        check_expiration(send_email=False, stock_range=stock_range, commit=False),
+    ]
+    queued = enqueue_alert_messages(build_alert_messages(sections))
+    if not advance_checkpoint(cycle, shard):
+        db.session.rollback()
+        return 0
+    db.session.commit()
+    return queued
+
+
+def update_checkpoint(cycle, shard, **values):
+    # The checkpoint only changes if nobody else finished this shard meanwhile
+    return db.session.execute(
+        cycle_table.update()
+        .where(cycle_table.c.cycle_id == cycle.cycle_id, cycle_table.c.next_shard == shard)
+        .values(**values)
+    ).rowcount
+
+
+def advance_checkpoint(cycle, shard):
+    """Move the checkpoint past shard, completing the cycle after the last one. Does not commit."""
+    values = {'next_shard': shard + 1, 'failed_attempts': 0}
+    if shard + 1 == cycle.shard_count:
+        values['completed_at'] = datetime.utcnow()
+    return update_checkpoint(cycle, shard, **values)
+
+
+def record_failure(cycle, shard, error):
+    """Count a failed run of shard, skipping the shard once it has used up its attempts."""
+    db.session.rollback()
+    attempts = (cycle.failed_attempts or 0) + 1
+    label = f"Alert cycle {cycle.cycle_id} shard {shard + 1}/{cycle.shard_count}"
+    if attempts >= current_app.config['ALERT_SHARD_MAX_ATTEMPTS']:
+        advance_checkpoint(cycle, shard)
+        print(f"{label} skipped after {attempts} failed attempts: {error}")
+    else:
+        update_checkpoint(cycle, shard, failed_attempts=attempts)
+        print(f"{label} failed (attempt {attempts}), retrying on the next poll: {error}")
+    db.session.commit()
+
+
+def run_alert_shards(now=None):
+    """Run the shards of the current cycle that are due, up to the per poll limit. Returns the number run."""
+    now = now or datetime.utcnow()
+    window = timedelta(hours=current_app.config['ALERT_WINDOW_HOURS'])
+    jitter = timedelta(minutes=current_app.config['ALERT_JITTER_MINUTES'])
+    max_shards = current_app.config['ALERT_MAX_SHARDS_PER_POLL']
+
+    cycle = current_cycle(now, window)
+    cycle_id = cycle.cycle_id
+    ran = 0
+    while ran < max_shards:
+        cycle = db.session.get(AlertCycle, cycle_id)
+        shard = cycle.next_shard
+        if shard >= cycle.shard_count or shard_due_at(cycle, shard, window, jitter) > now:
+            break
+        try:
+            queued = run_shard(cycle, shard)
+        except Exception as e:
+            record_failure(cycle, shard, e)
+            break
+        print(f"Alert cycle {cycle_id} shard {shard + 1}/{cycle.shard_count} done, {queued} email(s) queued")
+        ran += 1
+    return ran
@@ -1,63 +1,202 @@
 from datetime import datetime, timedelta
-from models.stock import StockItem, Alert
+from models.stock import StockItem, Alert, CategoryThreshold
 from db import db
 from flask import current_app
 from flask_mail import Message
-from extensions import mail
+from mail_outbox import outbox
+from jobs import jobs
 import traceback
 
+def alert_recipients():
+    """Return the configured alert recipients, ignoring blank entries."""
+    return [r.strip() for r in current_app.config['ALERT_EMAIL_RECIPIENTS'] if r and r.strip()]
+
+def enqueue_alert_messages(messages):
+    """Add messages to the mail outbox in the current transaction without committing."""
+    for msg in messages:
+        outbox.enqueue(msg.subject, msg.recipients, msg.body, sender=msg.sender)
+    return len(messages)
+
+def send_alert_messages(messages):
+    """
+    Queue messages in the mail outbox.
+
+    Delivery, connection reuse and per-message retries are handled by the
+    outbox workers. Returns the number of messages queued.
+    """
+    if not messages:
+        return 0
+
+    enqueue_alert_messages(messages)
+    db.session.commit()
+    print(f"Queued {len(messages)} alert emails")
+    return len(messages)
+
+def build_alert_messages(sections):
+    """
+    Build the emails for one alert run.
+
+    sections is a list of (title, lines) pairs. In digest mode each recipient
+    gets one message covering every section; otherwise each line becomes its
+    own message, as before.
+    """
+    recipients = alert_recipients()
+    sections = [(title, lines) for title, lines in sections if lines]
+    if not recipients or not sections:
+        return []
+
+    sender = current_app.config['MAIL_DEFAULT_SENDER']
+    if current_app.config['ALERT_DIGEST']:
+        count = sum(len(lines) for _, lines in sections)
+        body = "HomeStock alert digest\n"
+        for title, lines in sections:
+            body += f"\n{title}:\n" + "\n".join(f"  - {line}" for line in lines) + "\n"
+        return [
+            Message(subject=f"HomeStock Alerts: {count} item(s) need attention",
+                    sender=sender, recipients=[recipient], body=body)
+            for recipient in recipients
+        ]
+
+    return [
+        Message(subject=f"{title}: {line}", sender=sender, recipients=[recipient], body=line)
+        for title, lines in sections
+        for line in lines
+        for recipient in recipients
+    ]
+
 def send_alert_email(subject, message):
-    """Send an alert email to configured recipients."""
-    try:
-        print(f"Attempting to send email with subject: {subject}")
-        if not current_app.config['ALERT_EMAIL_RECIPIENTS']:
-            print("No alert recipients configured")
-            return
-        
-        msg = Message(
-            subject=subject,
-            sender=current_app.config['MAIL_DEFAULT_SENDER'],
-            recipients=current_app.config['ALERT_EMAIL_RECIPIENTS']
+    """Send a single alert email to configured recipients."""
+    recipients = alert_recipients()
+    if not recipients:
+        print("No alert recipients configured")
+        return
+    msg = Message(
+        subject=subject,
+        sender=current_app.config['MAIL_DEFAULT_SENDER'],
+        recipients=recipients
+    )
+    msg.body = message
+    send_alert_messages([msg])
+
+def chunked(values, size=500):
+    values = list(values)
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+def stock_range_filter(column, stock_range):
+    """SQL conditions limiting column to a [low, high) stock id range; high may be None."""
+    if stock_range is None:
+        return []
+    low, high = stock_range
+    conditions = [column >= low]
+    if high is not None:
+        conditions.append(column < high)
+    return conditions
+
+def sync_alerts(kind, matches, stock_range=None):
+    """
+    Bring the alerts of one kind in line with the current matches.
+
+    matches maps stock_id to the alert message for every stock item that
+    currently meets the condition. Only the difference with the active alerts
+    is written: new matches raise (or re-activate) an alert, active alerts
+    that no longer match are resolved, and unchanged ones are not touched.
+    With stock_range, only alerts of stock ids in that range are considered.
+    Returns the stock ids of the newly raised alerts.
+    """
+    now = datetime.utcnow()
+    active = {stock_id for stock_id, in db.session.query(Alert.stock_id).filter(
+        Alert.kind == kind, Alert.is_active == True, Alert.stock_id.isnot(None),
+        *stock_range_filter(Alert.stock_id, stock_range)
+    )}
+    jobs.add_rows_scanned(len(active))
+    raised = [stock_id for stock_id in matches if stock_id not in active]
+    cleared = active - set(matches)
+
+    # Raised alerts re-use the resolved row for the same item if there is one
+    inactive = set()
+    for ids in chunked(raised):
+        inactive.update(stock_id for stock_id, in db.session.query(Alert.stock_id).filter(
+            Alert.kind == kind, Alert.stock_id.in_(ids)
+        ))
+    alert_table = Alert.__table__
+    if inactive:
+        db.session.execute(
+            alert_table.update()
+            .where(alert_table.c.kind == kind, alert_table.c.stock_id == db.bindparam('b_stock_id'))
+            .values(message=db.bindparam('b_message'), is_active=True, created_at=now, resolved_at=None),
+            [{'b_stock_id': stock_id, 'b_message': matches[stock_id]} for stock_id in inactive]
         )
-        msg.body = message
-        print(f"Sending email to: {current_app.config['ALERT_EMAIL_RECIPIENTS']}")
-        mail.send(msg)
-        print("Email sent successfully")
-    except Exception as e:
-        print(f"Error sending email: {str(e)}")
-        print("Full traceback:")
-        print(traceback.format_exc())
-        raise
+    new_rows = [
+        {'stock_id': stock_id, 'kind': kind, 'message': matches[stock_id], 'is_active': True, 'created_at': now}
+        for stock_id in raised if stock_id not in inactive
+    ]
+    if new_rows:
+        db.session.execute(alert_table.insert(), new_rows)
+
+    for ids in chunked(cleared):
+        db.session.execute(
+            alert_table.update()
+            .where(alert_table.c.kind == kind, alert_table.c.stock_id.in_(ids))
+            .values(is_active=False, resolved_at=now)
+        )
+
+    print(f"{kind} alerts: {len(raised)} raised, {len(cleared)} resolved, {len(active) - len(cleared)} unchanged")
+    return raised
+
+def low_stock_query(default_threshold, stock_range=None):
+    """
+    Select (stock_id, name, quantity, threshold) of every stock item below its threshold.
+
+    An item's threshold is its own low_stock_threshold, else its category's,
+    else default_threshold; all of it is resolved in one join. The highest
+    threshold in use is looked up first (two index lookups) and added as a
+    plain quantity bound, so the database can range-scan the quantity index
+    instead of evaluating every row.
+    """
+    bound = max(
+        default_threshold,
+        db.session.query(db.func.max(CategoryThreshold.threshold)).scalar() or 0,
+        db.session.query(db.func.max(StockItem.low_stock_threshold)).scalar() or 0,
+    )
+    threshold = db.func.coalesce(StockItem.low_stock_threshold, CategoryThreshold.threshold, default_threshold)
+    return db.session.query(
+        StockItem.stock_id, StockItem.name, StockItem.quantity, threshold.label('threshold')
+    ).outerjoin(
+        CategoryThreshold, CategoryThreshold.category == StockItem.category
+    ).filter(
+        StockItem.quantity < bound,
+        StockItem.quantity < threshold,
+        *stock_range_filter(StockItem.stock_id, stock_range)
+    )
+
+def check_low_stock(threshold=None, send_email=True, stock_range=None, commit=True):
+    """
+    Check for low stock items and update alerts. Returns the digest section for newly raised alerts.
 
-def check_low_stock(threshold=None):
-    """Check for low stock items and create alerts."""
+    threshold is the default for items without their own or a category
+    threshold. stock_range limits the check to a [low, high) range of stock
+    ids; with commit=False the changes are left in the caller's transaction.
+    """
     try:
         if threshold is None:
             threshold = current_app.config['ALERT_LOW_STOCK_THRESHOLD']
-        
-        print(f"Checking for low stock items (threshold: {threshold})")
-        low_stock_items = StockItem.query.filter(StockItem.quantity < threshold).all()
+
+        print(f"Checking for low stock items (default threshold: {threshold})")
+        low_stock_items = {row.stock_id: row for row in low_stock_query(threshold, stock_range)}
         print(f"Found {len(low_stock_items)} low stock items")
-        
-        for item in low_stock_items:
-            message = f"Low stock alert: {item.name} has only {item.quantity} units left."
-            alert = Alert(message=message)
-            db.session.add(alert)
-            
-            # Send email alert
-            email_subject = f"Low Stock Alert: {item.name}"
-            email_message = f"""
-            Low Stock Alert!
-            
-            Item: {item.name}
-            Current Quantity: {item.quantity}
-            Threshold: {threshold}
-            
-            Please restock this item as soon as possible.
-            """
-            send_alert_email(email_subject, email_message)
-        
-        db.session.commit()
+        jobs.add_rows_scanned(len(low_stock_items))
+
+        raised = sync_alerts('low_stock', {
+            stock_id: f"Low stock alert: {item.name} has only {item.quantity} units left."
+            for stock_id, item in low_stock_items.items()
+        }, stock_range)
+        lines = [f"{low_stock_items[stock_id].name}: {low_stock_items[stock_id].quantity} units left "
+                 f"(threshold {low_stock_items[stock_id].threshold})"
+                 for stock_id in raised]
+
+        if commit:
+            db.session.commit()
         print("Low stock check completed")
     except Exception as e:
         print(f"Error in check_low_stock: {str(e)}")
@@ -66,37 +205,39 @@ def check_low_stock(threshold=None):
         db.session.rollback()
         raise
 
-def check_expiration(days_before=None):
-    """Check for items nearing expiration and create alerts."""
+    # Alerts are committed before mailing so a mail failure cannot roll them back
+    section = ("Low stock", lines)
+    if send_email:
+        send_alert_messages(build_alert_messages([section]))
+    return section
+
+def check_expiration(days_before=None, send_email=True, stock_range=None, commit=True):
+    """Check for items nearing expiration and update alerts. Takes the same stock_range and commit as check_low_stock."""
     try:
         if days_before is None:
             days_before = current_app.config['ALERT_DAYS_BEFORE_EXPIRATION']
-        
+
         print(f"Checking for items expiring within {days_before} days")
         today = datetime.utcnow().date()
         expiration_threshold = today + timedelta(days=days_before)
-        expiring_items = StockItem.query.filter(StockItem.expiration_date <= expiration_threshold).all()
+        expiring_items = {row.stock_id: row for row in db.session.query(
+            StockItem.stock_id, StockItem.name, StockItem.expiration_date
+        ).filter(StockItem.expiration_date <= expiration_threshold, *stock_range_filter(StockItem.stock_id, stock_range))}
         print(f"Found {len(expiring_items)} items nearing expiration")
-        
-        for item in expiring_items:
-            message = f"Expiration alert: {item.name} expires on {item.expiration_date}."
-            alert = Alert(message=message)
-            db.session.add(alert)
-            
-            # Send email alert
-            email_subject = f"Expiration Alert: {item.name}"
-            email_message = f"""
-            Expiration Alert!
-            
-            Item: {item.name}
-            Expiration Date: {item.expiration_date}
-            Days Until Expiration: {(item.expiration_date - today).days}
-            
-            Please take action before this item expires.
-            """
-            send_alert_email(email_subject, email_message)
-        
-        db.session.commit()
+        jobs.add_rows_scanned(len(expiring_items))
+
+        raised = sync_alerts('expiration', {
+            stock_id: f"Expiration alert: {item.name} expires on {item.expiration_date}."
+            for stock_id, item in expiring_items.items()
+        }, stock_range)
+        lines = []
+        for stock_id in raised:
+            item = expiring_items[stock_id]
+            lines.append(f"{item.name}: expires {item.expiration_date} "
+                         f"({(item.expiration_date - today).days} days)")
+
+        if commit:
+            db.session.commit()
         print("Expiration check completed")
     except Exception as e:
         print(f"Error in check_expiration: {str(e)}")
@@ -105,4 +246,15 @@ def check_expiration(days_before=None):
         db.session.rollback()
         raise
 
-    
\ No newline at end of file
+    section = (f"Expiring within {days_before} days", lines)
+    if send_email:
+        send_alert_messages(build_alert_messages([section]))
+    return section
+
+def run_alert_checks():
+    """Run every alert check and mail the combined results as one digest per recipient."""
+    sections = [
+        check_low_stock(send_email=False),
+        check_expiration(send_email=False),
+    ]
+    return send_alert_messages(build_alert_messages(sections))
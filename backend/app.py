@@ -1,7 +1,7 @@
 from flask import Flask
 from flask_cors import CORS
 from config import Config
-from db import db 
+from db import init_db
 from routes.item_routes import item_routes
 from routes.user_routes import user_routes
 from routes.stock_routes import stock_routes
@@ -9,13 +9,24 @@ from routes.auth_routes import auth_routes
 from routes.reminder_routes import reminder_routes
 from routes.shopping_list_routes import shopping_list_routes
 from routes.dashboard_routes import dashboard_routes
-from extensions import mail
+from routes.import_routes import import_routes
+from routes.export_routes import export_routes
+from extensions import mail, reset_tokens
+from mail_outbox import outbox
+from passwords import hasher
+import identity
+import replicas
+from migrations import upgrade, check_schema_version
+import sync  # noqa: F401  registers hooks
+from scheduler import init_scheduler
 from flask_jwt_extended import JWTManager
 import os
 
-def create_app():
+def create_app(test_config=None):
     app = Flask(__name__)
     app.config.from_object(Config)
+    if test_config:
+        app.config.update(test_config)
 
     try:
         os.makedirs(app.instance_path)
@@ -26,21 +37,28 @@ def create_app():
    
     CORS(app, supports_credentials=True, origins=["http://localhost:3001"])
     # CORS(app, supports_credentials=True, origins="*")
-    CORS(app, supports_credentials=True)
+    CORS(app, supports_credentials=True, expose_headers=["X-Next-Cursor"])
 
     
 
-    db.init_app(app)
+    init_db(app)
     mail.init_app(app)
+    hasher.init_app(app)
+    reset_tokens.init_app(app)
     jwt = JWTManager(app)
+    identity.init_app(app, jwt)
+    replicas.init_app(app)
 
+    # Schema changes are applied by `python migrations.py`; workers only check the version
     with app.app_context():
-        try:
-            db.create_all()
-            print("Database tables created successfully")
-        except Exception as e:
-            print(f"Error creating database tables: {e}")
-            raise
+        if app.config['MIGRATE_ON_START']:
+            upgrade()
+        if app.config['SCHEMA_CHECK_ON_START']:
+            check_schema_version()
+
+    outbox.init_app(app)
+    if app.config['SCHEDULER_ENABLED'] and not app.testing:
+        init_scheduler(app)
 
     # Register blueprints
     app.register_blueprint(user_routes)
@@ -50,6 +68,8 @@ def create_app():
     app.register_blueprint(item_routes)
     app.register_blueprint(shopping_list_routes)
     app.register_blueprint(dashboard_routes)
+    app.register_blueprint(import_routes)
+    app.register_blueprint(export_routes)
 
     # Handle OPTIONS requests
     @app.route('/<path:path>', methods=['OPTIONS'])
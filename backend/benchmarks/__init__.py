@@ -0,0 +1,34 @@
+"""Reproducible benchmarks for the HomeStock API.
+
+Run from the backend directory:
+
+    python -m benchmarks.datagen --scale small --db /tmp/homestock-bench.db
+    python -m benchmarks.driver --db /tmp/homestock-bench.db --output results.json
+
+The driver writes to the database, so regenerate it before each run that is
+meant to be compared with another.
+"""
+import os
+
+SCALES = {
+    # users, items, stock items, reminders, shopping list items
+    'small': dict(users=100, items=10000, stock=2000, reminders=2000, shopping=2000),
+    'medium': dict(users=1000, items=100000, stock=20000, reminders=20000, shopping=20000),
+    'large': dict(users=10000, items=1000000, stock=100000, reminders=100000, shopping=100000),
+}
+
+
+def make_app(db_path, database_url=None):
+    """Create the Flask app against a local SQLite file (or database_url), without background workers."""
+    os.environ['DATABASE_URL'] = database_url or 'sqlite:///' + os.path.abspath(db_path)
+    os.environ.setdefault('MAIL_OUTBOX_WORKERS', '0')
+    os.environ.setdefault('SCHEDULER_ENABLED', '0')
+    # Benchmark databases are created on the fly
+    os.environ.setdefault('MIGRATE_ON_START', '1')
+    # Alert checks refuse to run without mail settings; mail is only queued, never sent
+    os.environ.setdefault('MAIL_USERNAME', 'benchmark')
+    os.environ.setdefault('MAIL_PASSWORD', 'benchmark')
+    os.environ.setdefault('ALERT_EMAIL_RECIPIENTS', 'benchmark@example.com')
+    from app import create_app
+
+    return create_app()
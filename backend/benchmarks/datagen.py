@@ -0,0 +1,124 @@
+"""Seeded synthetic dataset generator for the benchmarks.
+
+The same --seed and --scale always produce the same rows, so results from
+different runs are comparable.
+"""
+import argparse
+import os
+import random
+import time
+from datetime import date, datetime, time as dt_time, timedelta
+from benchmarks import SCALES, make_app
+
+CATEGORIES = ['dairy', 'produce', 'bakery', 'pantry', 'frozen', 'cleaning', 'toiletries', 'beverages']
+LOCATIONS = ['fridge', 'freezer', 'pantry', 'garage', 'bathroom', 'kitchen cabinet']
+WORDS = ['milk', 'bread', 'cheese', 'apple', 'banana', 'rice', 'pasta', 'soap', 'coffee', 'tea',
+         'butter', 'yogurt', 'flour', 'sugar', 'salt', 'juice', 'eggs', 'tomato', 'onion', 'detergent']
+ADJECTIVES = ['organic', 'whole', 'fresh', 'frozen', 'large', 'small', 'red', 'green', 'brown', 'sparkling']
+PRIORITIES = ['low', 'medium', 'high']
+BENCH_PASSWORD = 'benchmark'
+BATCH_SIZE = 10000
+
+
+def product_name(rng):
+    return f"{rng.choice(ADJECTIVES)} {rng.choice(WORDS)} {rng.randint(1, 999)}".title()
+
+
+def insert_batched(db, table, rows, label):
+    """Insert a row generator with one executemany per BATCH_SIZE rows."""
+    started, count, batch = time.perf_counter(), 0, []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= BATCH_SIZE:
+            db.session.execute(table.insert(), batch)
+            db.session.commit()
+            count += len(batch)
+            batch = []
+    if batch:
+        db.session.execute(table.insert(), batch)
+        db.session.commit()
+        count += len(batch)
+    print(f"  {label}: {count} rows in {time.perf_counter() - started:.1f}s")
+
+
+def generate(app, users, items, stock, reminders, shopping, seed=42, search_index=True):
+    from db import db
+    from werkzeug.security import generate_password_hash
+    from models.user import User
+    from models.item import Item
+    from models.stock import StockItem
+    from models.reminder import Reminder
+    from models.shopping_list import ShoppingListItem
+
+    rng = random.Random(seed)
+    today = date.today()
+    now = datetime.utcnow()
+    # Hashing is deliberately slow, so every generated user shares one hash
+    password_hash = generate_password_hash(BENCH_PASSWORD, method='pbkdf2:sha256')
+
+    with app.app_context():
+        insert_batched(db, User.__table__, (
+            {'user_id': i, 'username': f'user{i}', 'email': f'user{i}@example.com',
+             'password': password_hash, 'role': 'admin' if i == 1 else 'user'}
+            for i in range(1, users + 1)
+        ), 'users')
+        insert_batched(db, Item.__table__, (
+            {'item_id': i, 'user_id': rng.randint(1, users), 'item_name': product_name(rng),
+             'category': rng.choice(CATEGORIES), 'quantity': rng.randint(0, 50),
+             'location': rng.choice(LOCATIONS),
+             'purchase_date': today - timedelta(days=rng.randint(0, 365)),
+             'expiry_date': today + timedelta(days=rng.randint(-30, 365)) if rng.random() < 0.9 else None}
+            for i in range(1, items + 1)
+        ), 'items')
+        insert_batched(db, StockItem.__table__, (
+            {'stock_id': i, 'name': product_name(rng), 'quantity': rng.randint(0, 100),
+             'expiration_date': today + timedelta(days=rng.randint(-10, 365))}
+            for i in range(1, stock + 1)
+        ), 'stock')
+        insert_batched(db, Reminder.__table__, (
+            {'reminder_id': i, 'user_id': rng.randint(1, users), 'title': f"Restock {rng.choice(WORDS)}",
+             'reminder_text': f"Remember to buy {product_name(rng)}",
+             'due_date': today + timedelta(days=rng.randint(-30, 90)),
+             'reminder_time': dt_time(rng.randint(0, 23), rng.choice([0, 15, 30, 45])),
+             'is_completed': rng.random() < 0.3, 'created_at': now, 'updated_at': now}
+            for i in range(1, reminders + 1)
+        ), 'reminders')
+        insert_batched(db, ShoppingListItem.__table__, (
+            {'id': i, 'user_id': rng.randint(1, users), 'name': product_name(rng),
+             'quantity': rng.randint(1, 10), 'unit': 'pcs', 'category': rng.choice(CATEGORIES),
+             'priority': rng.choice(PRIORITIES), 'purchased': rng.random() < 0.5, 'notes': '',
+             'created_at': now, 'updated_at': now}
+            for i in range(1, shopping + 1)
+        ), 'shopping list')
+
+        if search_index:
+            from search import rebuild_search_index
+
+            started = time.perf_counter()
+            rebuild_search_index(batch_size=BATCH_SIZE)
+            print(f"  search index: {time.perf_counter() - started:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--db', default='homestock-bench.db', help='SQLite file to (re)create')
+    parser.add_argument('--scale', choices=sorted(SCALES), default='small')
+    parser.add_argument('--seed', type=int, default=42)
+    for name in ('users', 'items', 'stock', 'reminders', 'shopping'):
+        parser.add_argument(f'--{name}', type=int, help=f'override the number of {name} for the scale')
+    parser.add_argument('--skip-search-index', action='store_true', help='do not build the item search index')
+    args = parser.parse_args()
+
+    counts = dict(SCALES[args.scale])
+    for name in counts:
+        if getattr(args, name) is not None:
+            counts[name] = getattr(args, name)
+
+    if os.path.exists(args.db):
+        os.remove(args.db)
+    print(f"Generating {counts} with seed {args.seed} into {args.db}")
+    generate(make_app(args.db), seed=args.seed, search_index=not args.skip_search_index, **counts)
+
+
+if __name__ == '__main__':
+    main()
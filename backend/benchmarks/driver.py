@@ -0,0 +1,258 @@
+"""Benchmark driver: exercises every API route against a generated SQLite dataset.
+
+Requests go through the Flask test client, so no server or network is
+involved. For each endpoint the driver records throughput and p50/p95/p99
+latency, and writes them to a JSON file with stable key order that can be
+diffed between runs. Pass --compare with an earlier results file to print the
+change per endpoint.
+"""
+import argparse
+import json
+import platform
+import random
+import subprocess
+import time
+from datetime import date, datetime, timedelta
+from benchmarks import make_app
+from benchmarks.datagen import BENCH_PASSWORD, WORDS, product_name
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class Context:
+    """State shared by the scenarios: tokens, id ranges and a seeded RNG."""
+
+    def __init__(self, client, counts, seed):
+        self.client = client
+        self.counts = counts
+        self.rng = random.Random(seed)
+        self.today = date.today()
+        self.next_delete = {}
+        self.token = self.login('user1@example.com')
+        self.headers = {'Authorization': f'Bearer {self.token}'} if self.token else {}
+
+    def login(self, email):
+        response = self.client.post('/api/auth/login', json={'email': email, 'password': BENCH_PASSWORD})
+        return (response.get_json(silent=True) or {}).get('token')
+
+    def random_id(self, table):
+        return self.rng.randint(1, max(1, self.counts[table]))
+
+    def delete_id(self, table):
+        """Hand out existing ids from the top of the range, one per delete request."""
+        self.next_delete.setdefault(table, self.counts[table])
+        value = self.next_delete[table]
+        self.next_delete[table] -= 1
+        return value
+
+    def day(self, offset_range=(0, 60)):
+        return (self.today + timedelta(days=self.rng.randint(*offset_range))).strftime('%Y-%m-%d')
+
+
+# (name, blueprint, scenario); scenarios run in this order, so reads see the untouched dataset
+SCENARIOS = [
+    # auth_routes
+    ('POST /api/auth/login', 'auth_routes', lambda ctx: ctx.client.post(
+        '/api/auth/login', json={'email': f'user{ctx.random_id("users")}@example.com', 'password': BENCH_PASSWORD})),
+    ('GET /api/auth/verify-token', 'auth_routes', lambda ctx: ctx.client.get(
+        '/api/auth/verify-token', headers=ctx.headers)),
+    ('POST /api/auth/forgot-password', 'auth_routes', lambda ctx: ctx.client.post(
+        '/api/auth/forgot-password', json={'email': f'user{ctx.random_id("users")}@example.com'})),
+    ('POST /api/auth/reset-password (invalid token)', 'auth_routes', lambda ctx: ctx.client.post(
+        '/api/auth/reset-password', json={'token': 'not-a-token', 'password': 'whatever'})),
+    ('GET /api/auth/setup', 'auth_routes', lambda ctx: ctx.client.get('/api/auth/setup')),
+
+    # item_routes
+    ('GET /api/items', 'item_routes', lambda ctx: ctx.client.get('/api/items')),
+    ('GET /api/items?after=', 'item_routes', lambda ctx: ctx.client.get(
+        f'/api/items?after={ctx.random_id("items")}')),
+    ('GET /api/items?user_id=&expiry_to=', 'item_routes', lambda ctx: ctx.client.get(
+        f'/api/items?user_id={ctx.random_id("users")}&expiry_to={ctx.day()}')),
+    ('GET /api/items?fields=', 'item_routes', lambda ctx: ctx.client.get(
+        '/api/items?fields=item_id,item_name,expiry_date&limit=500')),
+    ('GET /api/items/search', 'item_routes', lambda ctx: ctx.client.get(
+        f'/api/items/search?q={ctx.rng.choice(WORDS)}')),
+    ('GET /api/items/search?fuzzy=1', 'item_routes', lambda ctx: ctx.client.get(
+        f'/api/items/search?q={ctx.rng.choice(WORDS)}x&fuzzy=1&user_id={ctx.random_id("users")}')),
+    ('GET /api/items/autocomplete', 'item_routes', lambda ctx: ctx.client.get(
+        f'/api/items/autocomplete?prefix={ctx.rng.choice(WORDS)[:2]}')),
+    ('POST /api/items', 'item_routes', lambda ctx: ctx.client.post('/api/items', json={
+        'item_name': product_name(ctx.rng), 'category': 'pantry', 'quantity': 3, 'location': 'pantry',
+        'user_id': ctx.random_id('users'), 'purchase_date': ctx.day((-30, 0)), 'expiry_date': ctx.day()})),
+    ('PUT /api/items/<id>', 'item_routes', lambda ctx: ctx.client.put(
+        f'/api/items/{ctx.random_id("items")}', json={'quantity': ctx.rng.randint(0, 20), 'expiry_date': ctx.day()})),
+    ('PATCH /api/items/<id>/adjust', 'item_routes', lambda ctx: ctx.client.patch(
+        f'/api/items/{ctx.random_id("items")}/adjust', json={'delta': ctx.rng.choice([-1, 1, 2])})),
+    ('PATCH /api/items/adjust (20 items)', 'item_routes', lambda ctx: ctx.client.patch('/api/items/adjust', json={
+        'adjustments': [{'item_id': ctx.random_id('items'), 'delta': ctx.rng.choice([1, 2, 3])} for _ in range(20)]})),
+    ('DELETE /api/items/<id>', 'item_routes', lambda ctx: ctx.client.delete(
+        f'/api/items/{ctx.delete_id("items")}')),
+
+    # stock_routes
+    ('GET /stock', 'stock_routes', lambda ctx: ctx.client.get('/stock')),
+    ('GET /alerts', 'stock_routes', lambda ctx: ctx.client.get('/alerts')),
+    ('POST /alerts/check', 'stock_routes', lambda ctx: ctx.client.post('/alerts/check')),
+    ('POST /stock', 'stock_routes', lambda ctx: ctx.client.post('/stock', json={
+        'name': product_name(ctx.rng), 'quantity': ctx.rng.randint(0, 50), 'expiration_date': ctx.day()})),
+    ('PUT /stock/<id>', 'stock_routes', lambda ctx: ctx.client.put(
+        f'/stock/{ctx.random_id("stock")}', json={'quantity': ctx.rng.randint(0, 50)})),
+    ('PATCH /stock/<id>/adjust', 'stock_routes', lambda ctx: ctx.client.patch(
+        f'/stock/{ctx.random_id("stock")}/adjust', json={'delta': ctx.rng.choice([-1, 1, 2])})),
+    ('PATCH /stock/adjust (20 items)', 'stock_routes', lambda ctx: ctx.client.patch('/stock/adjust', json={
+        'adjustments': [{'stock_id': ctx.random_id('stock'), 'delta': ctx.rng.choice([1, 2, 3])} for _ in range(20)]})),
+    ('DELETE /stock/<id>', 'stock_routes', lambda ctx: ctx.client.delete(f'/stock/{ctx.delete_id("stock")}')),
+
+    # dashboard_routes
+    ('GET /api/dashboard/stats', 'dashboard_routes', lambda ctx: ctx.client.get(
+        '/api/dashboard/stats', headers=ctx.headers)),
+    ('GET /api/dashboard/expiring-items', 'dashboard_routes', lambda ctx: ctx.client.get(
+        '/api/dashboard/expiring-items', headers=ctx.headers)),
+
+    # shopping_list_routes
+    ('GET /shopping-list', 'shopping_list_routes', lambda ctx: ctx.client.get('/shopping-list', headers=ctx.headers)),
+    ('POST /shopping-list', 'shopping_list_routes', lambda ctx: ctx.client.post('/shopping-list', headers=ctx.headers, json={
+        'name': product_name(ctx.rng), 'quantity': 2, 'priority': 'high'})),
+    ('PUT /shopping-list/<id>', 'shopping_list_routes', lambda ctx: ctx.client.put(
+        f'/shopping-list/{ctx.random_id("shopping")}', json={'quantity': ctx.rng.randint(1, 9)})),
+    ('PATCH /shopping-list/<id>/toggle', 'shopping_list_routes', lambda ctx: ctx.client.patch(
+        f'/shopping-list/{ctx.random_id("shopping")}/toggle', json={})),
+    ('DELETE /shopping-list/<id>', 'shopping_list_routes', lambda ctx: ctx.client.delete(
+        f'/shopping-list/{ctx.delete_id("shopping")}')),
+
+    # reminder_routes
+    ('GET /reminders', 'reminder_routes', lambda ctx: ctx.client.get('/reminders')),
+    ('GET /reminders/<id>', 'reminder_routes', lambda ctx: ctx.client.get(f'/reminders/{ctx.random_id("reminders")}')),
+    ('POST /reminders', 'reminder_routes', lambda ctx: ctx.client.post('/reminders', json={
+        'title': 'Restock', 'user_id': ctx.random_id('users'), 'reminder_text': product_name(ctx.rng),
+        'due_date': ctx.day(), 'reminder_time': '09:30:00'})),
+    ('PUT /reminders/<id>', 'reminder_routes', lambda ctx: ctx.client.put(
+        f'/reminders/{ctx.random_id("reminders")}', json={'is_completed': True})),
+    ('DELETE /reminders/<id>', 'reminder_routes', lambda ctx: ctx.client.delete(
+        f'/reminders/{ctx.delete_id("reminders")}')),
+]
+
+# Endpoints that scan whole tables or hash passwords get fewer iterations
+HEAVY = {'POST /alerts/check', 'GET /stock', 'GET /reminders', 'GET /alerts', 'POST /api/auth/login'}
+
+
+def dataset_counts(app):
+    from db import db
+    from models.user import User
+    from models.item import Item
+    from models.stock import StockItem
+    from models.reminder import Reminder
+    from models.shopping_list import ShoppingListItem
+
+    with app.app_context():
+        return {
+            'users': db.session.query(db.func.max(User.user_id)).scalar() or 0,
+            'items': db.session.query(db.func.max(Item.item_id)).scalar() or 0,
+            'stock': db.session.query(db.func.max(StockItem.stock_id)).scalar() or 0,
+            'reminders': db.session.query(db.func.max(Reminder.reminder_id)).scalar() or 0,
+            'shopping': db.session.query(db.func.max(ShoppingListItem.id)).scalar() or 0,
+        }
+
+
+def run_scenario(ctx, scenario, requests, warmup):
+    for _ in range(warmup):
+        scenario(ctx)
+
+    latencies, statuses = [], {}
+    started = time.perf_counter()
+    for _ in range(requests):
+        request_started = time.perf_counter()
+        response = scenario(ctx)
+        latencies.append((time.perf_counter() - request_started) * 1000)
+        response.close()
+        statuses[str(response.status_code)] = statuses.get(str(response.status_code), 0) + 1
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': requests,
+        'status_codes': statuses,
+        'errors': sum(count for status, count in statuses.items() if int(status) >= 500),
+        'throughput_rps': round(requests / elapsed, 2) if elapsed else None,
+        'mean_ms': round(sum(latencies) / len(latencies), 3),
+        'p50_ms': round(percentile(latencies, 0.50), 3),
+        'p95_ms': round(percentile(latencies, 0.95), 3),
+        'p99_ms': round(percentile(latencies, 0.99), 3),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True).strip()
+    except Exception:
+        return None
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)['endpoints']
+    print(f"\n{'endpoint':55} {'p50 ms':>18} {'p95 ms':>18} {'rps':>18}")
+    for name, current in results['endpoints'].items():
+        before = baseline.get(name)
+        if not before:
+            continue
+        cells = []
+        for key in ('p50_ms', 'p95_ms', 'throughput_rps'):
+            change = (current[key] - before[key]) / before[key] * 100 if before[key] else 0
+            cells.append(f"{current[key]:>9.2f} ({change:+5.0f}%)")
+        print(f"{name:55} " + ' '.join(cells))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--db', default='homestock-bench.db', help='SQLite file created by benchmarks.datagen')
+    parser.add_argument('--requests', type=int, default=200, help='measured requests per endpoint')
+    parser.add_argument('--heavy-requests', type=int, default=20, help='measured requests for heavy endpoints')
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--only', help='only run endpoints whose name contains this text')
+    parser.add_argument('--output', default='benchmark-results.json')
+    parser.add_argument('--compare', help='earlier results file to compare against')
+    args = parser.parse_args()
+
+    app = make_app(args.db)
+    counts = dataset_counts(app)
+    ctx = Context(app.test_client(), counts, args.seed)
+
+    results = {
+        'meta': {
+            'database': 'sqlite',
+            'dataset': counts,
+            'git_revision': git_revision(),
+            'python': platform.python_version(),
+            'requests': args.requests,
+            'seed': args.seed,
+            'started_at': datetime.utcnow().isoformat(timespec='seconds'),
+        },
+        'endpoints': {},
+    }
+    for name, blueprint, scenario in SCENARIOS:
+        if args.only and args.only not in name:
+            continue
+        requests = args.heavy_requests if name in HEAVY else args.requests
+        result = run_scenario(ctx, scenario, requests, min(args.warmup, requests))
+        result['blueprint'] = blueprint
+        results['endpoints'][name] = result
+        print(f"{name:55} {result['throughput_rps']:>9} rps  p50 {result['p50_ms']:>8} ms  "
+              f"p95 {result['p95_ms']:>8} ms  p99 {result['p99_ms']:>8} ms  {result['status_codes']}")
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.write('\n')
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
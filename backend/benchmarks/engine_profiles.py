@@ -0,0 +1,139 @@
+"""Compare write throughput of the database engine profiles under concurrent load.
+
+Seeds one SQLite dataset, copies it once per profile, and for each profile
+starts --processes worker processes (like the workers of an app server) that
+issue a mix of writes and reads through the Flask test client for --seconds.
+Reports writes and reads per second, write latency and the number of failed
+requests, which under the 'default' profile are mostly "database is locked".
+
+    python -m benchmarks.engine_profiles
+    python -m benchmarks.engine_profiles --profiles default,sqlite --processes 8 --seconds 20
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+from benchmarks import make_app
+from benchmarks.datagen import generate, product_name
+from benchmarks.driver import percentile
+
+DATASET = dict(users=50, items=5000, stock=1000, reminders=500, shopping=1000)
+
+WRITES = [
+    lambda ctx: ctx.client.post('/shopping-list', headers=ctx.headers, json={
+        'name': product_name(ctx.rng), 'quantity': 2, 'priority': 'high'}),
+    lambda ctx: ctx.client.put(f'/shopping-list/{ctx.random_id("shopping")}', json={
+        'quantity': ctx.rng.randint(1, 9)}),
+    lambda ctx: ctx.client.put(f'/stock/{ctx.random_id("stock")}', json={'quantity': ctx.rng.randint(0, 50)}),
+]
+
+READS = [
+    lambda ctx: ctx.client.get('/shopping-list', headers=ctx.headers),
+    lambda ctx: ctx.client.get(f'/api/items?user_id={ctx.random_id("users")}&limit=50'),
+    lambda ctx: ctx.client.get(f'/api/items?user_id={ctx.random_id("users")}&location=pantry'),
+]
+
+
+def worker(profile, db_path, index, seconds, write_fraction, seed, start, results):
+    """One app process: wait for the others, then run the request mix until the time is up."""
+    os.environ['DB_ENGINE_PROFILE'] = profile
+    os.environ.setdefault('PASSWORD_HASH_WORKERS', '0')
+    from benchmarks.driver import Context, dataset_counts
+
+    app = make_app(db_path)
+    ctx = Context(app.test_client(), dataset_counts(app), seed + index)
+    start.wait()
+
+    writes, reads, errors, write_latencies = 0, 0, 0, []
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        is_write = ctx.rng.random() < write_fraction
+        request = ctx.rng.choice(WRITES if is_write else READS)
+        started = time.perf_counter()
+        try:
+            response = request(ctx)
+            failed = response.status_code >= 500
+            response.close()
+        except Exception:
+            failed = True
+        if failed:
+            errors += 1
+        elif is_write:
+            writes += 1
+            write_latencies.append((time.perf_counter() - started) * 1000)
+        else:
+            reads += 1
+    results.put({'writes': writes, 'reads': reads, 'errors': errors, 'write_latencies': write_latencies})
+
+
+def run_profile(profile, db_path, args):
+    context = multiprocessing.get_context('spawn')
+    start = context.Barrier(args.processes)
+    results = context.Queue()
+    processes = [
+        context.Process(target=worker, args=(
+            profile, db_path, index, args.seconds, args.write_fraction, args.seed, start, results
+        ))
+        for index in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+    totals = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    latencies = sorted(latency for total in totals for latency in total['write_latencies'])
+    return {
+        'writes_per_second': round(sum(total['writes'] for total in totals) / args.seconds, 1),
+        'reads_per_second': round(sum(total['reads'] for total in totals) / args.seconds, 1),
+        'errors': sum(total['errors'] for total in totals),
+        'write_p50_ms': round(percentile(latencies, 0.50) or 0, 2),
+        'write_p95_ms': round(percentile(latencies, 0.95) or 0, 2),
+        'write_p99_ms': round(percentile(latencies, 0.99) or 0, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--profiles', default='default,sqlite', help='comma separated engine profiles to compare')
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--write-fraction', type=float, default=0.5)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='also write the results to this JSON file')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='homestock-engine-')
+    template = os.path.join(workdir, 'template.db')
+    # The template keeps SQLite's default rollback journal; WAL is switched on per copy by the profile
+    os.environ['DB_ENGINE_PROFILE'] = 'default'
+    app = make_app(template)
+    print(f"Generating {DATASET} into {template}")
+    generate(app, seed=args.seed, search_index=False, **DATASET)
+    from db import db
+    with app.app_context():
+        db.engine.dispose()
+
+    results = {}
+    try:
+        for profile in args.profiles.split(','):
+            db_path = os.path.join(workdir, f'{profile}.db')
+            shutil.copyfile(template, db_path)
+            results[profile] = result = run_profile(profile, db_path, args)
+            print(f"{profile:10} {result['writes_per_second']:>8} writes/s {result['reads_per_second']:>8} reads/s  "
+                  f"write p50 {result['write_p50_ms']:>7} ms  p95 {result['write_p95_ms']:>7} ms  "
+                  f"p99 {result['write_p99_ms']:>7} ms  {result['errors']} errors")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'processes': args.processes, 'seconds': args.seconds,
+                       'write_fraction': args.write_fraction, 'profiles': results}, f, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
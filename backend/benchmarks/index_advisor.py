@@ -0,0 +1,224 @@
+"""Check that the app's hot queries use indexes.
+
+Runs representative requests and jobs against a database, captures every
+SELECT they issue, and asks the database for its plan: EXPLAIN QUERY PLAN on
+SQLite, EXPLAIN on MySQL. Steps that read a whole table (SQLite "SCAN",
+MySQL type ALL) are flagged unless the shape is expected to scan that table,
+and the command exits with status 1 if anything was flagged.
+
+    python -m benchmarks.index_advisor                 # seeded temporary SQLite database
+    python -m benchmarks.index_advisor --db homestock-bench.db
+    python -m benchmarks.index_advisor --database-url mysql+pymysql://... --create-missing
+
+--create-missing first creates any index declared on the models that the
+database does not have yet.
+"""
+import argparse
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from benchmarks import make_app
+from benchmarks.datagen import generate, WORDS, LOCATIONS
+from benchmarks.driver import Context, dataset_counts
+
+TABLES = set()
+
+# Small enough to seed in seconds, large enough for the planner to prefer indexes
+SEED_COUNTS = dict(users=20, items=4000, stock=1000, reminders=500, shopping=500)
+
+
+def rollback_after(func):
+    """Run a job function and discard what it wrote."""
+    def run(ctx):
+        from db import db
+        try:
+            func(ctx)
+        finally:
+            db.session.rollback()
+    return run
+
+
+def since(days=1):
+    return (datetime.utcnow() - timedelta(days=days)).strftime('%Y-%m-%dT%H:%M:%S')
+
+
+def check_low_stock_shape(ctx):
+    from alerts import check_low_stock
+    check_low_stock(send_email=False, commit=False)
+
+
+def check_expiration_shape(ctx):
+    from alerts import check_expiration
+    check_expiration(send_email=False, commit=False)
+
+
+def alert_shard_shape(ctx):
+    from alerts import check_low_stock, check_expiration
+    stock_range = (0, max(1, ctx.counts['stock'] // 24))
+    check_low_stock(send_email=False, stock_range=stock_range, commit=False)
+    check_expiration(send_email=False, stock_range=stock_range, commit=False)
+
+
+def reminder_window_shape(ctx):
+    from flask import current_app
+    from scheduler import reminders
+    reminders.init_app(current_app)
+    reminders.load_window(datetime.utcnow())
+
+
+# (name, run, tables the shape may scan in full, config overrides)
+SHAPES = [
+    ('items by user', lambda ctx: ctx.client.get(
+        f'/api/items?user_id={ctx.random_id("users")}&limit=50'), set(), {}),
+    ('items by user and expiry range', lambda ctx: ctx.client.get(
+        f'/api/items?user_id={ctx.random_id("users")}&expiry_from={ctx.day((0, 5))}&expiry_to={ctx.day((20, 30))}'),
+        set(), {}),
+    ('items by user and location', lambda ctx: ctx.client.get(
+        f'/api/items?user_id={ctx.random_id("users")}&location={ctx.rng.choice(LOCATIONS)}'), set(), {}),
+    ('item search', lambda ctx: ctx.client.get(
+        f'/api/items/search?q={ctx.rng.choice(WORDS)}&user_id={ctx.random_id("users")}'), set(), {}),
+    ('item autocomplete', lambda ctx: ctx.client.get(
+        f'/api/items/autocomplete?prefix={ctx.rng.choice(WORDS)[:2]}'), set(), {}),
+    ('dashboard stats (counters)', lambda ctx: ctx.client.get(
+        '/api/dashboard/stats', headers=ctx.headers), set(), {'DASHBOARD_STATS_COUNTERS': True}),
+    ('dashboard stats (aggregate)', lambda ctx: ctx.client.get(
+        '/api/dashboard/stats', headers=ctx.headers), set(), {'DASHBOARD_STATS_COUNTERS': False}),
+    ('dashboard expiring items', lambda ctx: ctx.client.get(
+        '/api/dashboard/expiring-items', headers=ctx.headers), set(), {}),
+    ('verify token', lambda ctx: ctx.client.get(
+        '/api/auth/verify-token', headers=ctx.headers), set(), {}),
+    ('active alerts', lambda ctx: ctx.client.get('/alerts'), set(), {}),
+    ('shopping list of user', lambda ctx: ctx.client.get('/shopping-list', headers=ctx.headers), set(), {}),
+    ('shopping list changes', lambda ctx: ctx.client.get(
+        f'/shopping-list/changes?since={since()}', headers=ctx.headers), set(), {}),
+    ('reminder changes of user', lambda ctx: ctx.client.get(
+        f'/reminders/changes?since={since()}&user_id={ctx.random_id("users")}'), set(), {}),
+    # The category table is tiny and joined to every low stock candidate
+    ('low stock check', rollback_after(check_low_stock_shape), {'stock_category_thresholds'}, {}),
+    ('expiration check', rollback_after(check_expiration_shape), set(), {}),
+    ('alert shard', rollback_after(alert_shard_shape), {'stock_category_thresholds'}, {}),
+    ('reminder window', rollback_after(reminder_window_shape), set(), {}),
+]
+
+
+def sqlite_plan(connection, statement, parameters):
+    """Return (detail, scanned table or None) for each step of a SQLite query plan.
+
+    Scans of subqueries materialized by the plan itself are not table scans and are not reported.
+    """
+    steps = []
+    for row in connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters):
+        detail = row[-1]
+        table = None
+        if detail.startswith('SCAN ') and not detail.startswith('SCAN CONSTANT ROW'):
+            table = detail.split()[1]
+            if table not in TABLES:
+                table = None
+        steps.append((detail, table))
+    return steps
+
+
+def mysql_plan(connection, statement, parameters):
+    """Return (detail, scanned table or None) for each step of a MySQL query plan."""
+    result = connection.exec_driver_sql('EXPLAIN ' + statement, parameters)
+    columns = list(result.keys())
+    steps = []
+    for row in result:
+        row = dict(zip(columns, row))
+        detail = f"{row.get('table')}: type={row.get('type')} key={row.get('key')} rows={row.get('rows')}"
+        steps.append((detail, row.get('table') if row.get('type') == 'ALL' else None))
+    return steps
+
+
+def capture_selects(engine, run):
+    """Run run() and return the distinct SELECT statements (with parameters) it executed."""
+    statements = {}
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith('SELECT'):
+            statements.setdefault(statement, parameters)
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        run()
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+    return list(statements.items())
+
+
+def create_missing_indexes(db):
+    created = 0
+    for table in db.metadata.sorted_tables:
+        existing = {index['name'] for index in db.inspect(db.engine).get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(bind=db.engine)
+                print(f"Created index {index.name} on {table.name}")
+                created += 1
+    return created
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', help='SQLite file to check (default: a freshly seeded temporary database)')
+    parser.add_argument('--database-url', help='check this database instead of a SQLite file; it is not seeded')
+    parser.add_argument('--create-missing', action='store_true', help='create declared indexes the database lacks')
+    parser.add_argument('--only', help='only check shapes whose name contains this text')
+    parser.add_argument('--verbose', action='store_true', help='print every plan step, not just flagged ones')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    seed_database = not args.db and not args.database_url
+    db_path = args.db or os.path.join(tempfile.mkdtemp(prefix='homestock-advisor-'), 'advisor.db')
+    app = make_app(db_path, database_url=args.database_url)
+
+    from db import db
+    TABLES.update(db.metadata.tables)
+    with app.app_context():
+        if args.create_missing:
+            create_missing_indexes(db)
+        if seed_database:
+            generate(app, seed=args.seed, **SEED_COUNTS)
+        if db.engine.dialect.name == 'sqlite':
+            with db.engine.begin() as connection:
+                connection.exec_driver_sql('ANALYZE')
+            explain = sqlite_plan
+        elif db.engine.dialect.name in ('mysql', 'mariadb'):
+            explain = mysql_plan
+        else:
+            sys.exit(f"Unsupported database: {db.engine.dialect.name}")
+        engine = db.engine
+
+    ctx = Context(app.test_client(), dataset_counts(app), args.seed)
+    flagged = 0
+    for name, run, allowed_scans, overrides in SHAPES:
+        if args.only and args.only not in name:
+            continue
+        saved = {key: app.config[key] for key in overrides}
+        app.config.update(overrides)
+        try:
+            with app.app_context():
+                statements = capture_selects(engine, lambda: run(ctx))
+        finally:
+            app.config.update(saved)
+
+        print(f"\n{name}: {len(statements)} statement(s)")
+        with engine.connect() as connection:
+            for statement, parameters in statements:
+                steps = explain(connection, statement, parameters)
+                scans = [table for _, table in steps if table and table not in allowed_scans]
+                if not scans and not args.verbose:
+                    continue
+                flagged += bool(scans)
+                print(f"  {'FULL SCAN of ' + ', '.join(scans) if scans else 'ok'}: {' '.join(statement.split())[:200]}")
+                for detail, _ in steps:
+                    print(f"      {detail}")
+
+    print(f"\n{flagged} statement(s) with unexpected full scans")
+    sys.exit(1 if flagged else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+"""Collection version counters for conditional GETs.
+
+Every transaction that writes to a tracked table bumps a version row in
+collection_versions, inside the same transaction. Rows are kept per
+collection and user: a write to a user's shopping list or reminders only
+bumps that user's row, so other users' ETags stay valid and concurrent
+writers of different users do not queue on one row. Tables without a
+user_id (stock, alerts) use the row of user 0.
+
+ORM writes are picked up in after_flush and bulk Core statements run through
+db.session.execute in do_orm_execute, so import and alert sync paths need no
+extra calls. A bulk statement cannot tell which users it touched, so it bumps
+the collection's user 0 row, which is part of every user's version. Each row
+is bumped at most once per transaction, with an upsert that creates it on the
+first write.
+
+List endpoints turn the version into an ETag with conditional_list(); a
+request whose If-None-Match still matches gets a 304 after a single indexed
+lookup, without loading or serializing any rows.
+"""
+from flask import request, current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import get_history
+from db import db, upsert
+from models.collection_version import CollectionVersion
+
+version_table = CollectionVersion.__table__
+
+# Row for tables without a user_id and for bulk statements
+SHARED = 0
+
+# Tracked table name -> collection
+TRACKED_TABLES = {
+    'stock_item': 'stock',
+    'alert': 'alerts',
+    'reminders': 'reminders',
+    'shopping_list_items': 'shopping_list',
+}
+
+# Deleting stock also deletes its alerts; where that is left to the database cascade
+# (MySQL; SQLite does not enforce foreign keys) no hook sees it
+CASCADES = {
+    'stock': ['alerts'],
+}
+
+
+def collection_version(collection, user_id=None):
+    """
+    Version token of one user's view of a collection, or of the whole collection.
+
+    A user's view changes with their own row and the shared row. Counters only
+    grow, so the sum over all rows changes whenever any of them is bumped.
+    """
+    if user_id is None:
+        total = db.session.execute(
+            db.select(db.func.sum(version_table.c.version)).where(version_table.c.collection == collection)
+        ).scalar()
+        return str(total or 0)
+    versions = dict(db.session.execute(
+        db.select(version_table.c.user_id, version_table.c.version).where(
+            version_table.c.collection == collection,
+            version_table.c.user_id.in_([user_id, SHARED])
+        )
+    ).all())
+    return f"{versions.get(user_id, 0)}.{versions.get(SHARED, 0)}"
+
+
+def bump_versions(session, keys):
+    """Bump each (collection, user_id) row not already bumped in the session's current transaction."""
+    bumped = session.info.setdefault('bumped_collections', set())
+    keys = set(keys) - bumped
+    if not keys:
+        return
+    bumped.update(keys)
+    connection = session.connection()
+    statement = upsert(connection.dialect.name, version_table, ['collection', 'user_id'], {
+        'version': lambda new: version_table.c.version + 1
+    })
+    # Sorted so concurrent transactions lock rows in the same order
+    connection.execute(statement, [
+        {'collection': collection, 'user_id': user_id, 'version': 1} for collection, user_id in sorted(keys)
+    ])
+
+
+def conditional_list(collection, build_response, user_id=None):
+    """
+    Serve a list endpoint with a weak ETag built from the collection version.
+
+    Pass user_id when the list only shows that user's rows; otherwise the tag
+    covers the whole collection. build_response is only called when the
+    client's copy is out of date.
+    """
+    scope = 'all' if user_id is None else f"user{user_id}"
+    tag = f"{collection}-{scope}-{collection_version(collection, user_id)}"
+    if request.if_none_match.contains_weak(tag):
+        response = current_app.response_class(status=304)
+    else:
+        response = build_response()
+    response.set_etag(tag, weak=True)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def _owners(obj, table):
+    """The users whose view obj is part of, before and after this flush."""
+    if 'user_id' not in table.c:
+        return {SHARED}
+    history = get_history(obj, 'user_id')
+    owners = set(history.added) | set(history.deleted) | set(history.unchanged)
+    if not owners:
+        owners = {getattr(obj, 'user_id', None)}
+    return {SHARED if owner is None else owner for owner in owners}
+
+
+def _object_keys(obj, deleting=False):
+    table = getattr(type(obj), '__table__', None)
+    collections = _table_collections(getattr(table, 'name', None), deleting)
+    if not collections:
+        return []
+    owners = _owners(obj, table)
+    return [(collection, owner) for collection in collections for owner in owners]
+
+
+def _table_collections(table_name, deleting=False):
+    collection = TRACKED_TABLES.get(table_name)
+    if collection is None:
+        return []
+    return [collection] + (CASCADES.get(collection, []) if deleting else [])
+
+
+@event.listens_for(Session, 'after_flush')
+def track_flushed_collections(session, flush_context):
+    keys = set()
+    for obj in session.new:
+        keys.update(_object_keys(obj))
+    for obj in session.dirty:
+        if session.is_modified(obj, include_collections=False):
+            keys.update(_object_keys(obj))
+    for obj in session.deleted:
+        keys.update(_object_keys(obj, deleting=True))
+    if keys:
+        bump_versions(session, keys)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def track_bulk_statements(orm_execute_state):
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    table = getattr(orm_execute_state.statement, 'table', None)
+    collections = _table_collections(getattr(table, 'name', None), deleting=orm_execute_state.is_delete)
+    if collections:
+        bump_versions(orm_execute_state.session, [(collection, SHARED) for collection in collections])
+
+
+@event.listens_for(Session, 'after_commit')
+def reset_bumped_collections(session):
+    session.info.pop('bumped_collections', None)
+
+
+@event.listens_for(Session, 'after_rollback')
+def discard_bumped_collections(session):
+    session.info.pop('bumped_collections', None)
@@ -11,6 +11,10 @@ class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 
         'sqlite:///' + os.path.join(basedir, 'instance', 'homestock.db'))
+    # Optional read replica for GET requests; reads stick to the primary for a while after a client writes
+    DATABASE_REPLICA_URL = os.getenv('DATABASE_REPLICA_URL', '')
+    SQLALCHEMY_BINDS = {'replica': DATABASE_REPLICA_URL} if DATABASE_REPLICA_URL else {}
+    READ_YOUR_WRITES_SECONDS = int(os.getenv('READ_YOUR_WRITES_SECONDS', 5))
     
     # JWT Configuration
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY', 'your-jwt-secret-key')
@@ -19,6 +23,62 @@ class Config:
     JWT_HEADER_NAME = 'Authorization'
     JWT_HEADER_TYPE = 'Bearer'
     
+    # Engine tuning profile: 'auto' (from the database URL), 'sqlite', 'mysql' or 'default' (see db.py)
+    DB_ENGINE_PROFILE = os.getenv('DB_ENGINE_PROFILE', 'auto')
+    SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    SQLITE_CACHE_SIZE_KB = int(os.getenv('SQLITE_CACHE_SIZE_KB', 65536))
+    SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 10))
+    DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 20))
+    DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', 30))
+    DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 280))  # Shorter than server and proxy idle timeouts
+    DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'True').lower() in ['true', '1', 't']
+
+    # Schema migrations (see migrations.py); MIGRATE_ON_START is meant for single-process setups
+    MIGRATE_ON_START = os.getenv('MIGRATE_ON_START', 'False').lower() in ['true', '1', 't']
+    SCHEMA_CHECK_ON_START = os.getenv('SCHEMA_CHECK_ON_START', 'True').lower() in ['true', '1', 't']
+    MIGRATION_BATCH_SIZE = int(os.getenv('MIGRATION_BATCH_SIZE', 1000))
+
+    # Users resolved from JWTs are cached per process for up to USER_CACHE_TTL seconds
+    USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', 1024))
+    USER_CACHE_TTL = int(os.getenv('USER_CACHE_TTL', 60))
+    # Verified bearer tokens are remembered (by hash) until they expire, at most this long
+    JWT_DECODE_CACHE_SIZE = int(os.getenv('JWT_DECODE_CACHE_SIZE', 4096))
+    JWT_DECODE_CACHE_TTL = int(os.getenv('JWT_DECODE_CACHE_TTL', 300))
+
+    # Background jobs (alert checks and the reminder dispatcher)
+    SCHEDULER_ENABLED = os.getenv('SCHEDULER_ENABLED', 'True').lower() in ['true', '1', 't']
+    REMINDER_DEFAULT_TIME = os.getenv('REMINDER_DEFAULT_TIME', '09:00')  # For reminders without a time
+    REMINDER_WINDOW_MINUTES = int(os.getenv('REMINDER_WINDOW_MINUTES', 60))
+    REMINDER_CATCHUP_HOURS = int(os.getenv('REMINDER_CATCHUP_HOURS', 24))
+    REMINDER_VERSION_CHECK_SECONDS = int(os.getenv('REMINDER_VERSION_CHECK_SECONDS', 30))
+
+    # Only the worker holding the scheduler lease runs jobs; others take over when it expires
+    JOB_LEASE_SECONDS = int(os.getenv('JOB_LEASE_SECONDS', 60))
+    JOB_LEASE_RENEW_SECONDS = int(os.getenv('JOB_LEASE_RENEW_SECONDS', 15))
+    JOB_TICK_SECONDS = int(os.getenv('JOB_TICK_SECONDS', 60))
+    JOB_HISTORY_DAYS = int(os.getenv('JOB_HISTORY_DAYS', 30))
+
+    # Delta sync: deletions are remembered this long; older cursors must resync in full
+    SYNC_TOMBSTONE_RETENTION_DAYS = int(os.getenv('SYNC_TOMBSTONE_RETENTION_DAYS', 30))
+    SYNC_CURSOR_OVERLAP_SECONDS = int(os.getenv('SYNC_CURSOR_OVERLAP_SECONDS', 2))
+
+    # Password reset tokens: 'database' (shared by all workers) or 'memory'
+    RESET_TOKEN_STORE = os.getenv('RESET_TOKEN_STORE', 'database')
+    RESET_TOKEN_SWEEP_SECONDS = int(os.getenv('RESET_TOKEN_SWEEP_SECONDS', 300))
+
+    # Password hashing runs in a process pool (0 workers hashes on the request thread)
+    PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'pbkdf2:sha256')
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', 2))
+    PASSWORD_HASH_MAX_PENDING = int(os.getenv('PASSWORD_HASH_MAX_PENDING', 0))  # 0 means 4 per worker
+    PASSWORD_HASH_QUEUE_TIMEOUT = float(os.getenv('PASSWORD_HASH_QUEUE_TIMEOUT', 2))
+    PASSWORD_HASH_TIMEOUT = float(os.getenv('PASSWORD_HASH_TIMEOUT', 10))
+
+    # Login admission limits
+    LOGIN_ATTEMPT_WINDOW_SECONDS = int(os.getenv('LOGIN_ATTEMPT_WINDOW_SECONDS', 300))
+    LOGIN_MAX_ATTEMPTS_PER_ACCOUNT = int(os.getenv('LOGIN_MAX_ATTEMPTS_PER_ACCOUNT', 10))
+    LOGIN_MAX_ATTEMPTS_PER_IP = int(os.getenv('LOGIN_MAX_ATTEMPTS_PER_IP', 50))
+
     # Email configuration
     MAIL_SERVER = os.getenv('MAIL_SERVER', 'smtp.gmail.com')
     MAIL_PORT = int(os.getenv('MAIL_PORT', 587))
@@ -26,8 +86,52 @@ class Config:
     MAIL_USERNAME = os.getenv('MAIL_USERNAME', '')
     MAIL_PASSWORD = os.getenv('MAIL_PASSWORD', '')
     MAIL_DEFAULT_SENDER = os.getenv('MAIL_DEFAULT_SENDER', '')
+
+    # Mail outbox worker pool (0 workers disables background delivery)
+    MAIL_OUTBOX_WORKERS = int(os.getenv('MAIL_OUTBOX_WORKERS', 2))
+    MAIL_OUTBOX_BATCH_SIZE = int(os.getenv('MAIL_OUTBOX_BATCH_SIZE', 50))
+    MAIL_OUTBOX_POLL_SECONDS = int(os.getenv('MAIL_OUTBOX_POLL_SECONDS', 5))
+    MAIL_OUTBOX_LEASE_SECONDS = int(os.getenv('MAIL_OUTBOX_LEASE_SECONDS', 300))
+    MAIL_OUTBOX_MAX_ATTEMPTS = int(os.getenv('MAIL_OUTBOX_MAX_ATTEMPTS', 5))
+    MAIL_OUTBOX_BACKOFF_SECONDS = int(os.getenv('MAIL_OUTBOX_BACKOFF_SECONDS', 30))
+    # Sent messages are deleted after this many days
+    MAIL_OUTBOX_RETENTION_DAYS = int(os.getenv('MAIL_OUTBOX_RETENTION_DAYS', 7))
     
+    # Largest batch accepted by the PATCH .../adjust endpoints
+    QUANTITY_ADJUST_MAX_BATCH = int(os.getenv('QUANTITY_ADJUST_MAX_BATCH', 1000))
+
     # Alert configuration
     ALERT_DAYS_BEFORE_EXPIRATION = int(os.getenv('ALERT_DAYS_BEFORE_EXPIRATION', 7))
     ALERT_LOW_STOCK_THRESHOLD = int(os.getenv('ALERT_LOW_STOCK_THRESHOLD', 5))
     ALERT_EMAIL_RECIPIENTS = os.getenv('ALERT_EMAIL_RECIPIENTS', '').split(',')
+    # Send one grouped email per recipient per run instead of one email per item
+    ALERT_DIGEST = os.getenv('ALERT_DIGEST', 'True').lower() in ['true', '1', 't']
+    # Scheduled checks evaluate stock in ALERT_SHARDS id ranges spread over ALERT_WINDOW_HOURS
+    ALERT_SHARDS = int(os.getenv('ALERT_SHARDS', 24))
+    ALERT_WINDOW_HOURS = int(os.getenv('ALERT_WINDOW_HOURS', 24))
+    ALERT_JITTER_MINUTES = int(os.getenv('ALERT_JITTER_MINUTES', 10))
+    ALERT_SHARD_POLL_MINUTES = int(os.getenv('ALERT_SHARD_POLL_MINUTES', 5))
+    # Overdue shards (e.g. after downtime) are caught up at most this many per poll
+    ALERT_MAX_SHARDS_PER_POLL = int(os.getenv('ALERT_MAX_SHARDS_PER_POLL', 2))
+    # A shard that keeps failing is skipped for the rest of the cycle after this many attempts
+    ALERT_SHARD_MAX_ATTEMPTS = int(os.getenv('ALERT_SHARD_MAX_ATTEMPTS', 3))
+
+    # Serve dashboard stats from incrementally maintained per-user counters
+    DASHBOARD_STATS_COUNTERS = os.getenv('DASHBOARD_STATS_COUNTERS', 'True').lower() in ['true', '1', 't']
+
+    # Pagination
+    ITEMS_PAGE_SIZE = int(os.getenv('ITEMS_PAGE_SIZE', 100))
+    ITEMS_MAX_PAGE_SIZE = int(os.getenv('ITEMS_MAX_PAGE_SIZE', 1000))
+
+    # Bulk import
+    IMPORT_BATCH_SIZE = int(os.getenv('IMPORT_BATCH_SIZE', 5000))
+    IMPORT_BATCHES_PER_TRANSACTION = int(os.getenv('IMPORT_BATCHES_PER_TRANSACTION', 10))
+    IMPORT_MAX_ERRORS = int(os.getenv('IMPORT_MAX_ERRORS', 1000))
+
+    # Streaming export
+    EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', 1000))
+
+    # Item search
+    SEARCH_PAGE_SIZE = int(os.getenv('SEARCH_PAGE_SIZE', 20))
+    SEARCH_MIN_SIMILARITY = float(os.getenv('SEARCH_MIN_SIMILARITY', 0.5))
+    AUTOCOMPLETE_LIMIT = int(os.getenv('AUTOCOMPLETE_LIMIT', 10))
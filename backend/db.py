@@ -1,4 +1,136 @@
-""" Manages the creation of a database connection"""
+""" Manages the creation of a database connection
+
+The engine is tuned by a named profile, selected with DB_ENGINE_PROFILE:
+
+- 'sqlite': WAL journal (readers no longer block the writer), synchronous=NORMAL,
+  a busy timeout so writers wait for the lock instead of failing with
+  "database is locked", and a larger page cache and memory-mapped I/O;
+- 'mysql': a sized connection pool whose connections are recycled before the
+  server drops them and checked before use, with the session time zone set
+  to UTC;
+- 'default': SQLAlchemy's defaults.
+
+'auto' (the default) picks the profile matching the database URL.
+SQLALCHEMY_ENGINE_OPTIONS set in the config take precedence over the profile.
+The profile also applies to the read replica bind, if one is configured.
+"""
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.engine import make_url
+from sqlalchemy.sql.dml import UpdateBase
+from sqlalchemy.sql.selectable import SelectBase
+
+REPLICA_BIND = 'replica'
+
+
+class RoutingSession(Session):
+    """
+    Session that sends plain SELECTs to the read replica while info['read_replica'] is set.
+
+    Connections requested without a statement (flushes, and session.connection(),
+    which this app uses for writes) and INSERT/UPDATE/DELETE statements always
+    use the primary and count as writes. Any other statement that is not a
+    SELECT (e.g. textual SQL) also goes to the primary. After the first write
+    the session stays on the primary, so a request reads back what it wrote.
+    See replicas.py for when requests read from the replica.
+
+    Only the public get_bind arguments are used: the unit of work asks for a
+    bind with the mapper and no clause.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            if clause is None or isinstance(clause, UpdateBase):
+                self.info['wrote'] = True
+                self.info['read_replica'] = False
+            elif self.info.get('read_replica') and isinstance(clause, SelectBase):
+                return self._db.engines[REPLICA_BIND]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+
+def upsert(dialect, table, keys, updates):
+    """
+    Build an INSERT that updates the existing row instead when the keys are taken.
+
+    updates maps column names to functions of the proposed row's columns
+    (inserted / excluded) returning the new value. A single statement, so
+    concurrent writers cannot both miss the row and collide on the insert.
+    """
+    if dialect in ('mysql', 'mariadb'):
+        statement = mysql.insert(table)
+        return statement.on_duplicate_key_update(
+            **{name: value(statement.inserted) for name, value in updates.items()}
+        )
+    statement = (postgresql if dialect == 'postgresql' else sqlite).insert(table)
+    return statement.on_conflict_do_update(
+        index_elements=[table.c[key] for key in keys],
+        set_={name: value(statement.excluded) for name, value in updates.items()}
+    )
+
+
+def sqlite_profile(config):
+    """Engine options and per-connection pragmas for SQLite."""
+    pragmas = [
+        ('journal_mode', 'WAL'),
+        ('synchronous', 'NORMAL'),
+        ('busy_timeout', config['SQLITE_BUSY_TIMEOUT_MS']),
+        ('cache_size', -config['SQLITE_CACHE_SIZE_KB']),  # Negative means KiB rather than pages
+        ('mmap_size', config['SQLITE_MMAP_SIZE']),
+    ]
+    return {'connect_args': {'timeout': config['SQLITE_BUSY_TIMEOUT_MS'] / 1000}}, pragmas
+
+
+def mysql_profile(config):
+    """Engine options for MySQL."""
+    return {
+        # CURRENT_TIMESTAMP and TIMESTAMP columns then agree with datetime.utcnow()
+        'connect_args': {'init_command': "SET time_zone = '+00:00'"},
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': config['DB_POOL_PRE_PING'],
+    }, []
+
+
+ENGINE_PROFILES = {
+    'default': lambda config: ({}, []),
+    'sqlite': sqlite_profile,
+    'mysql': mysql_profile,
+}
+
+
+def engine_profile_name(config):
+    name = config['DB_ENGINE_PROFILE']
+    if name == 'auto':
+        backend = make_url(config['SQLALCHEMY_DATABASE_URI']).get_backend_name()
+        name = backend if backend in ENGINE_PROFILES else 'default'
+    if name not in ENGINE_PROFILES:
+        raise ValueError(f"Unknown DB_ENGINE_PROFILE: {name}")
+    return name
+
+
+def init_db(app):
+    """Apply the engine profile and initialize db for the app."""
+    name = engine_profile_name(app.config)
+    options, pragmas = ENGINE_PROFILES[name](app.config)
+    options.update(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+    app.extensions['db_engine_profile'] = name
+    db.init_app(app)
+
+    if pragmas:
+        def set_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for pragma, value in pragmas:
+                cursor.execute(f"PRAGMA {pragma}={value}")
+            cursor.close()
 
-db = SQLAlchemy()
+        with app.app_context():
+            for engine in db.engines.values():
+                event.listen(engine, 'connect', set_pragmas)
@@ -1,8 +1,9 @@
 from flask_mail import Mail
 from flask_apscheduler import APScheduler
+from token_store import ResetTokenStore
 
 mail = Mail()
 scheduler = APScheduler()
 
-# Dictionary to store reset tokens (in production, use a database)
-reset_tokens = {} 
\ No newline at end of file
+# Password reset tokens; the backend is chosen by RESET_TOKEN_STORE
+reset_tokens = ResetTokenStore()
@@ -0,0 +1,117 @@
+"""Resolving the user behind a JWT.
+
+Tokens carry the user id as a string subject. The user lookup hooks of
+flask_jwt_extended load the user once per request (available afterwards as
+flask_jwt_extended.current_user) from a small TTL'd LRU of user records, so
+authorization checks normally cost no database round-trip. Cached records
+are dropped when a commit updates or deletes the user.
+
+Routes that authenticate optionally (the shopping list) decode bearer tokens
+with decode_bearer_token(), which remembers already-verified tokens by their
+SHA-256 until they expire.
+"""
+import hashlib
+import time
+from collections import namedtuple
+from flask import jsonify
+from flask_jwt_extended import decode_token
+from flask_jwt_extended.exceptions import JWTExtendedException
+from jwt import InvalidTokenError
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from cache import TTLCache
+from db import db
+from models.user import User
+from replicas import use_primary
+
+# Plain snapshot of the fields authorization and profile responses need
+UserRecord = namedtuple('UserRecord', ['user_id', 'username', 'email', 'role'])
+
+user_cache = TTLCache()
+token_cache = TTLCache(maxsize=4096, ttl=300)
+
+
+def load_user(user_id):
+    """Return the UserRecord for user_id, or None if the user does not exist."""
+    record = user_cache.get(user_id)
+    if record is None:
+        # A replica may still hold a user that was just changed or deleted, and the record is cached
+        use_primary()
+        row = db.session.execute(
+            db.select(User.user_id, User.username, User.email, User.role).where(User.user_id == user_id)
+        ).first()
+        if row is None:
+            return None
+        record = UserRecord(*row)
+        user_cache.set(user_id, record)
+    return record
+
+
+def invalidate_user(user_id):
+    user_cache.pop(user_id)
+
+
+def decode_bearer_token(token):
+    """
+    Verify a JWT with the app's JWT settings and return its claims, or None if it is invalid.
+
+    Verified claims are cached under the token's hash, never past the token's exp.
+    """
+    key = hashlib.sha256(token.encode('utf-8')).digest()
+    claims = token_cache.get(key)
+    if claims is not None:
+        if claims.get('exp') is None or claims['exp'] > time.time():
+            return claims
+        token_cache.pop(key)
+    try:
+        claims = decode_token(token)
+    except (InvalidTokenError, JWTExtendedException):
+        return None
+    ttl = token_cache.ttl
+    if claims.get('exp') is not None:
+        ttl = min(ttl, claims['exp'] - time.time())
+    if ttl > 0:
+        token_cache.set(key, claims, ttl=ttl)
+    return claims
+
+
+def init_app(app, jwt):
+    """Size the caches from config and register the JWT identity hooks."""
+    user_cache.maxsize = app.config['USER_CACHE_SIZE']
+    user_cache.ttl = app.config['USER_CACHE_TTL']
+    token_cache.maxsize = app.config['JWT_DECODE_CACHE_SIZE']
+    token_cache.ttl = app.config['JWT_DECODE_CACHE_TTL']
+
+    @jwt.user_identity_loader
+    def user_identity(user_id):
+        return str(user_id)
+
+    @jwt.user_lookup_loader
+    def user_lookup(jwt_header, jwt_data):
+        try:
+            return load_user(int(jwt_data['sub']))
+        except (TypeError, ValueError):
+            return None
+
+    @jwt.user_lookup_error_loader
+    def user_lookup_error(jwt_header, jwt_data):
+        return jsonify({"message": "User not found"}), 404
+
+
+@event.listens_for(Session, 'after_flush')
+def track_user_changes(session, flush_context):
+    changed = {obj.user_id for obj in list(session.dirty) + list(session.deleted) if isinstance(obj, User)}
+    if changed:
+        session.info.setdefault('changed_user_ids', set()).update(changed)
+
+
+@event.listens_for(Session, 'after_commit')
+def forget_changed_users(session):
+    """Drop cached records of users changed in this transaction once it commits."""
+    for user_id in session.info.pop('changed_user_ids', ()):
+        invalidate_user(user_id)
+
+
+@event.listens_for(Session, 'after_rollback')
+def discard_changed_users(session):
+    session.info.pop('changed_user_ids', None)
@@ -0,0 +1,303 @@
+"""Dashboard statistics for a user's items.
+
+Stats are served from per-user counters in the item_stats table. The counters
+are adjusted on every flush that inserts, updates or deletes an Item, so the
+dashboard never has to scan the Items table. A user without counters (new
+deployment, or counters dropped after an inconsistency) is rebuilt with a
+single aggregate query the first time their stats are read.
+
+Expiry dates are counted in one bucket per day. Once a day has passed its
+bucket can only ever count as expired, so reads fold past buckets into the
+user's 'expired' row, whose key records the last folded day. Later writes
+to folded days go to that row, and reads only touch the buckets from today
+up to the end of the "expiring soon" window.
+"""
+from collections import defaultdict
+from datetime import date, timedelta
+from sqlalchemy import event, case, func
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import get_history
+from db import db, upsert
+from models.item import Item
+from models.item_stats import ItemStat
+from replicas import use_primary
+
+EXPIRING_SOON_DAYS = 7
+
+stats_table = ItemStat.__table__
+
+
+def _date_key(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else str(value)
+
+
+def counter_keys(user_id, location, expiry_date):
+    """Return the counter keys an item with these values contributes to."""
+    keys = [(user_id, 'total', ''), (user_id, 'location', location)]
+    if expiry_date is not None:
+        keys.append((user_id, 'expiry', _date_key(expiry_date)))
+    return keys
+
+
+def _committed_value(obj, attr):
+    """Value of an attribute as it was before the current flush."""
+    history = get_history(obj, attr)
+    if history.deleted:
+        return history.deleted[0]
+    if history.unchanged:
+        return history.unchanged[0]
+    return getattr(obj, attr)
+
+
+def _item_keys(obj, committed=False):
+    value = _committed_value if committed else getattr
+    return counter_keys(value(obj, 'user_id'), value(obj, 'location'), value(obj, 'expiry_date'))
+
+
+def upsert_counters(connection, rows, replace=False):
+    """
+    Insert counter rows in one statement, adding their count to rows that already exist.
+
+    With replace the existing count is overwritten instead. Unlike a separate
+    UPDATE and INSERT, concurrent writers cannot both try to insert the same row.
+    """
+    if not rows:
+        return
+    statement = upsert(connection.dialect.name, stats_table, ['user_id', 'kind', 'key'], {
+        'count': lambda new: new.count if replace else stats_table.c.count + new.count
+    })
+    connection.execute(statement, rows)
+
+
+def apply_deltas(connection, deltas):
+    """
+    Apply {(user_id, kind, key): delta} to the counters.
+
+    Users that have not been seeded yet are skipped; their counters are built
+    from scratch on the next read. If a decrement hits a missing row the user's
+    counters are dropped so they get rebuilt instead of drifting. Decrements and
+    then increments are written in key order, so concurrent transactions lock
+    rows in the same order.
+    """
+    deltas = {key: delta for key, delta in deltas.items() if delta and key[0] is not None}
+    if not deltas:
+        return
+
+    user_ids = {user_id for user_id, _, _ in deltas}
+    seeded, folded_through = set(), {}
+    for row in connection.execute(
+        db.select(stats_table.c.user_id, stats_table.c.kind, stats_table.c.key).where(
+            stats_table.c.kind.in_(['total', 'expired']),
+            stats_table.c.user_id.in_(user_ids)
+        )
+    ):
+        if row.kind == 'total':
+            seeded.add(row.user_id)
+        else:
+            folded_through[row.user_id] = row.key
+    deltas = _fold_deltas(deltas, folded_through)
+
+    invalid = set()
+    increments = []
+    for (user_id, kind, key), delta in sorted(deltas.items()):
+        if user_id not in seeded:
+            continue
+        if delta > 0:
+            increments.append({'user_id': user_id, 'kind': kind, 'key': key, 'count': delta})
+            continue
+        result = connection.execute(
+            stats_table.update()
+            .where(stats_table.c.user_id == user_id, stats_table.c.kind == kind, stats_table.c.key == key)
+            .values(count=stats_table.c.count + delta)
+        )
+        if not result.rowcount:
+            invalid.add(user_id)
+    upsert_counters(connection, [row for row in increments if row['user_id'] not in invalid])
+
+    if invalid:
+        connection.execute(stats_table.delete().where(stats_table.c.user_id.in_(invalid)))
+
+    # Drop buckets that have emptied out so reads stay small
+    connection.execute(
+        stats_table.delete().where(
+            stats_table.c.user_id.in_(seeded - invalid),
+            stats_table.c.kind != 'total',
+            stats_table.c.count <= 0
+        )
+    )
+
+
+def _fold_deltas(deltas, folded_through):
+    """Move deltas for expiry days that were already folded onto the users' expired rows."""
+    if not folded_through:
+        return deltas
+    folded = defaultdict(int)
+    for (user_id, kind, key), delta in deltas.items():
+        through = folded_through.get(user_id)
+        if kind == 'expiry' and through is not None and key <= through:
+            kind, key = 'expired', through
+        folded[(user_id, kind, key)] += delta
+    return {key: delta for key, delta in folded.items() if delta}
+
+
+def fold_expired_buckets(user_id, today):
+    """Add the user's expiry buckets before today to their expired row and delete them."""
+    use_primary()
+    through = (today - timedelta(days=1)).isoformat()
+    connection = db.session.connection()
+    # Locked so concurrent folds cannot both count the same buckets
+    rows = connection.execute(
+        db.select(stats_table.c.kind, stats_table.c.key, stats_table.c.count).where(
+            stats_table.c.user_id == user_id,
+            db.or_(
+                stats_table.c.kind == 'expired',
+                db.and_(stats_table.c.kind == 'expiry', stats_table.c.key <= through)
+            )
+        ).with_for_update()
+    ).all()
+    buckets = [(key, count) for kind, key, count in rows if kind == 'expiry']
+    if buckets:
+        expired = [(key, count) for kind, key, count in rows if kind == 'expired']
+        total = sum(count for _, count in buckets + expired)
+        if expired:
+            connection.execute(stats_table.update().where(
+                stats_table.c.user_id == user_id, stats_table.c.kind == 'expired'
+            ).values(key=max(through, expired[0][0]), count=total))
+        else:
+            connection.execute(stats_table.insert().values(user_id=user_id, kind='expired', key=through, count=total))
+        connection.execute(stats_table.delete().where(
+            stats_table.c.user_id == user_id,
+            stats_table.c.kind == 'expiry',
+            stats_table.c.key.in_([key for key, _ in buckets])
+        ))
+    db.session.commit()
+
+
+def deltas_for_rows(rows, sign=1):
+    """Build counter deltas for plain (user_id, location, expiry_date) rows, e.g. from bulk inserts."""
+    deltas = defaultdict(int)
+    for user_id, location, expiry_date in rows:
+        if user_id is None:
+            continue
+        for key in counter_keys(user_id, location, expiry_date):
+            deltas[key] += sign
+    return deltas
+
+
+def _keep_value(target, value, oldvalue, initiator):
+    return value
+
+
+# Assigning to an expired attribute (e.g. after a commit) only records the old
+# value, which the counters need to decrement, when a listener asks for it
+for _attribute in (Item.user_id, Item.location, Item.expiry_date):
+    event.listen(_attribute, 'set', _keep_value, active_history=True)
+
+
+@event.listens_for(Session, 'before_flush')
+def track_item_changes(session, flush_context, instances):
+    """Turn Item inserts, updates and deletes from this flush into counter deltas."""
+    deltas = defaultdict(int)
+    for obj in session.new:
+        if isinstance(obj, Item):
+            for key in _item_keys(obj):
+                deltas[key] += 1
+    for obj in session.deleted:
+        if isinstance(obj, Item):
+            for key in _item_keys(obj, committed=True):
+                deltas[key] -= 1
+    for obj in session.dirty:
+        if isinstance(obj, Item) and session.is_modified(obj, include_collections=False):
+            old_keys = _item_keys(obj, committed=True)
+            new_keys = _item_keys(obj)
+            if old_keys != new_keys:
+                for key in old_keys:
+                    deltas[key] -= 1
+                for key in new_keys:
+                    deltas[key] += 1
+
+    if deltas:
+        apply_deltas(session.connection(), deltas)
+
+
+def aggregate_item_stats(user_id, today=None):
+    """Compute the dashboard stats with one conditional-aggregate query over the user's items."""
+    today = today or date.today()
+    week_later = today + timedelta(days=EXPIRING_SOON_DAYS)
+
+    rows = db.session.query(
+        Item.location,
+        func.count(Item.item_id),
+        func.sum(case((Item.expiry_date.between(today, week_later), 1), else_=0)),
+        func.sum(case((Item.expiry_date < today, 1), else_=0))
+    ).filter(Item.user_id == user_id).group_by(Item.location).all()
+
+    return {
+        'total_items': sum(row[1] for row in rows),
+        'expiring_soon': sum(row[2] or 0 for row in rows),
+        'expired_items': sum(row[3] or 0 for row in rows),
+        'items_by_location': {row[0]: row[1] for row in rows}
+    }
+
+
+def rebuild_item_stats(user_id):
+    """Recount a user's items in a single grouped query and replace their counters."""
+    use_primary()
+    rows = db.session.query(
+        Item.location, Item.expiry_date, func.count(Item.item_id)
+    ).filter(Item.user_id == user_id).group_by(Item.location, Item.expiry_date).all()
+
+    counters = defaultdict(int)
+    counters[(user_id, 'total', '')] = 0
+    for location, expiry_date, count in rows:
+        for key in counter_keys(user_id, location, expiry_date):
+            counters[key] += count
+
+    # Overwritten in place rather than deleted and re-inserted, so concurrent rebuilds
+    # of the same user cannot collide on the primary key
+    connection = db.session.connection()
+    connection.execute(stats_table.update().where(stats_table.c.user_id == user_id).values(count=0))
+    upsert_counters(connection, [
+        {'user_id': uid, 'kind': kind, 'key': key, 'count': count}
+        for (uid, kind, key), count in sorted(counters.items())
+    ], replace=True)
+    connection.execute(stats_table.delete().where(
+        stats_table.c.user_id == user_id, stats_table.c.kind != 'total', stats_table.c.count <= 0
+    ))
+    db.session.commit()
+
+
+def get_item_stats(user_id, today=None):
+    """Read the dashboard stats from the user's counters, seeding them and folding past days as needed."""
+    today = today or date.today()
+    week_later = today + timedelta(days=EXPIRING_SOON_DAYS)
+
+    # Expiry buckets past the "soon" window never contribute, so leave them in the table
+    query = db.session.query(ItemStat.kind, ItemStat.key, ItemStat.count).filter(
+        ItemStat.user_id == user_id,
+        db.or_(ItemStat.kind != 'expiry', ItemStat.key <= week_later.isoformat())
+    )
+    today_key = today.isoformat()
+    rows = query.all()
+    if not any(kind == 'total' for kind, _, _ in rows):
+        # The counters may only be missing on a lagging replica; never seed them from its data
+        use_primary()
+        rows = query.all()
+        if not any(kind == 'total' for kind, _, _ in rows):
+            rebuild_item_stats(user_id)
+            rows = query.all()
+    if any(kind == 'expiry' and key < today_key for kind, key, _ in rows):
+        fold_expired_buckets(user_id, today)
+        rows = query.all()
+
+    stats = {'total_items': 0, 'expiring_soon': 0, 'expired_items': 0, 'items_by_location': {}}
+    for kind, key, count in rows:
+        if kind == 'total':
+            stats['total_items'] = count
+        elif kind == 'location':
+            stats['items_by_location'][key] = count
+        elif kind == 'expired' or key < today_key:
+            stats['expired_items'] += count
+        else:
+            stats['expiring_soon'] += count
+    return stats
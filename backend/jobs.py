@@ -0,0 +1,210 @@
+"""Leader election and run history for scheduled jobs.
+
+Every worker process runs APScheduler, but only the holder of the
+'scheduler' lease in job_leases runs jobs. Each worker tries to take or renew
+the lease every JOB_LEASE_RENEW_SECONDS. The lease lasts JOB_LEASE_SECONDS,
+so when the leader dies another worker takes over once it expires. A worker
+only starts a job while the expiry it last wrote is still in the future, so a
+leader that could not renew (database unreachable, process stalled) stops
+starting jobs before anyone else can take over.
+
+Jobs are registered with an interval and run when the last recorded start in
+job_runs is at least that long ago. The run history is shared, so a new
+leader picks up the schedule where the old one left off instead of running
+everything again. Each run records its start, duration, outcome and the
+number of rows it scanned (reported by the job through add_rows_scanned).
+
+`python jobs.py` prints the recent run history.
+"""
+import os
+import socket
+import threading
+import time
+import traceback
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+from db import db
+from models.job import JobLease, JobRun
+
+lease_table = JobLease.__table__
+run_table = JobRun.__table__
+
+LEADER_LEASE = 'scheduler'
+
+
+class JobRunner:
+    def __init__(self, app=None):
+        self.app = None
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.is_leader = False
+        self._lease_expiry = {}  # Lease name -> expires_at of the lease this process last took or renewed
+        self._jobs = {}
+        self._leadership_callbacks = []
+        self._run_lock = threading.Lock()
+        self._local = threading.local()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['job_runner'] = self
+
+    def register(self, name, func, interval):
+        """Run func at most once per interval (a timedelta) across all workers."""
+        self._jobs[name] = (func, interval)
+
+    def on_leadership_change(self, callback):
+        """Call callback(is_leader) whenever this process gains or loses the lease."""
+        self._leadership_callbacks.append(callback)
+
+    # -- leases ------------------------------------------------------------
+
+    def acquire(self, name, seconds):
+        """Take or renew a lease; returns True if this process holds it afterwards."""
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=seconds)
+        renewed = db.session.execute(
+            lease_table.update()
+            .where(lease_table.c.name == name)
+            .where(or_(lease_table.c.owner == self.owner, lease_table.c.expires_at < now))
+            .values(owner=self.owner, expires_at=expires_at)
+        ).rowcount
+        if not renewed:
+            exists = db.session.query(JobLease.name).filter(JobLease.name == name).first()
+            if exists:
+                db.session.rollback()
+                return False
+            try:
+                db.session.execute(lease_table.insert().values(
+                    name=name, owner=self.owner, acquired_at=now, expires_at=expires_at
+                ))
+            except IntegrityError:
+                db.session.rollback()
+                return False
+        db.session.commit()
+        # now was taken before the write, so the lease cannot end earlier than this
+        self._lease_expiry[name] = expires_at
+        return True
+
+    def holds_lease(self, name=LEADER_LEASE):
+        """True while a lease this process took or renewed has not expired yet."""
+        expires_at = self._lease_expiry.get(name)
+        return expires_at is not None and datetime.utcnow() < expires_at
+
+    def release(self, name):
+        self._lease_expiry.pop(name, None)
+        db.session.execute(
+            lease_table.update()
+            .where(lease_table.c.name == name, lease_table.c.owner == self.owner)
+            .values(expires_at=datetime.utcnow())
+        )
+        db.session.commit()
+
+    def elect(self):
+        """Try to become or stay the leader and notify listeners when that changes."""
+        try:
+            leader = self.acquire(LEADER_LEASE, self.app.config['JOB_LEASE_SECONDS'])
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error renewing scheduler lease: {str(e)}")
+            leader = False
+        if leader != self.is_leader:
+            self.is_leader = leader
+            print(f"{self.owner} {'is now' if leader else 'is no longer'} the scheduler leader")
+            for callback in self._leadership_callbacks:
+                callback(leader)
+        return leader
+
+    def resign(self):
+        """Give up the lease so another worker can take over without waiting for it to expire."""
+        if self.is_leader:
+            try:
+                self.release(LEADER_LEASE)
+            except Exception as e:
+                print(f"Error releasing scheduler lease: {str(e)}")
+            self.is_leader = False
+            for callback in self._leadership_callbacks:
+                callback(False)
+
+    # -- running -----------------------------------------------------------
+
+    def run_due(self):
+        """Run every registered job whose interval has passed since its last recorded start."""
+        if not self.is_leader or not self.holds_lease():
+            return
+        # Ticks can overlap while a long job runs; only one of them may start jobs
+        if not self._run_lock.acquire(blocking=False):
+            return
+        try:
+            now = datetime.utcnow()
+            for name, (func, interval) in self._jobs.items():
+                last_start = db.session.query(db.func.max(JobRun.started_at)).filter(JobRun.job == name).scalar()
+                db.session.rollback()
+                if last_start is None or now - last_start >= interval:
+                    # The lease may have run out during an earlier job
+                    if not self.holds_lease():
+                        print(f"{self.owner} lost the scheduler lease, not starting {name}")
+                        break
+                    self.run(name)
+        finally:
+            self._run_lock.release()
+
+    def run(self, name):
+        """Run one job now and record it in job_runs."""
+        func, _ = self._jobs[name]
+        started_at = datetime.utcnow()
+        run_id = db.session.execute(run_table.insert().values(
+            job=name, owner=self.owner, status='running', started_at=started_at
+        )).inserted_primary_key[0]
+        db.session.commit()
+
+        self._local.rows_scanned = 0
+        began = time.perf_counter()
+        status, error = 'succeeded', None
+        try:
+            func()
+        except Exception:
+            db.session.rollback()
+            status, error = 'failed', traceback.format_exc()
+            print(f"Job {name} failed:\n{error}")
+        rows_scanned, self._local.rows_scanned = self._local.rows_scanned, None
+
+        db.session.execute(run_table.update().where(run_table.c.run_id == run_id).values(
+            status=status,
+            finished_at=datetime.utcnow(),
+            duration_ms=int((time.perf_counter() - began) * 1000),
+            rows_scanned=rows_scanned,
+            error=error,
+        ))
+        # Trim this job's history while we are here
+        retention = timedelta(days=self.app.config['JOB_HISTORY_DAYS'])
+        db.session.execute(run_table.delete().where(
+            run_table.c.job == name, run_table.c.started_at < started_at - retention
+        ))
+        db.session.commit()
+        return status
+
+    def add_rows_scanned(self, count):
+        """Called by jobs to report how many rows they read; ignored outside a recorded run."""
+        if getattr(self._local, 'rows_scanned', None) is not None:
+            self._local.rows_scanned += count
+
+
+jobs = JobRunner()
+
+
+if __name__ == '__main__':
+    os.environ.setdefault('SCHEDULER_ENABLED', '0')
+    os.environ.setdefault('MAIL_OUTBOX_WORKERS', '0')
+    from app import create_app
+
+    app = create_app()
+    with app.app_context():
+        lease = JobLease.query.get(LEADER_LEASE)
+        if lease:
+            print(f"Leader: {lease.owner} (lease expires {lease.expires_at})")
+        for run in JobRun.query.order_by(JobRun.started_at.desc()).limit(20):
+            print(f"{run.started_at}  {run.job:<20} {run.status:<10} "
+                  f"{run.duration_ms or 0:>8} ms  {run.rows_scanned or 0:>8} rows  {run.owner}")
@@ -0,0 +1,274 @@
+"""Durable, asynchronous email delivery.
+
+Request handlers and jobs call outbox.enqueue(), which only adds a row to the
+mail_outbox table inside the caller's transaction. A dispatcher thread claims
+due rows in batches and hands them to a bounded pool of worker threads. Each
+worker keeps its own SMTP connection open between messages. Failed sends are
+retried with exponential backoff until MAIL_OUTBOX_MAX_ATTEMPTS is reached.
+
+Rows are claimed with a lease, so several processes can share the table and a
+row left in 'sending' by a crashed process is picked up again when its lease
+runs out. Sent rows are deleted by the dispatcher once they are older than
+MAIL_OUTBOX_RETENTION_DAYS; failed rows are kept for inspection.
+
+To try it against a local SMTP stand-in, run one (for example
+`python -m aiosmtpd -n -l localhost:1025`) and set MAIL_SERVER=localhost,
+MAIL_PORT=1025, MAIL_USE_TLS=False. `python mail_outbox.py` drains the queue
+once in the foreground and deletes old sent messages.
+"""
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from flask_mail import Message
+from sqlalchemy import event, or_, and_
+from sqlalchemy.orm import Session
+from db import db
+from extensions import mail
+from models.outbox import OutboxMessage
+
+outbox_table = OutboxMessage.__table__
+
+SUBJECT_LENGTH = outbox_table.c.subject.type.length
+PURGE_BATCH_SIZE = 1000
+
+
+class MailOutbox:
+    """Queue emails in the database and deliver them from a background worker pool."""
+
+    def __init__(self, app=None):
+        self.app = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._dispatcher = None
+        self._pool = None
+        self._local = threading.local()
+        self._last_purge = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['mail_outbox'] = self
+        if app.config['MAIL_OUTBOX_WORKERS'] > 0 and not app.testing:
+            self.start()
+
+    # -- producing ---------------------------------------------------------
+
+    def enqueue(self, subject, recipients, body, sender=None):
+        """
+        Add an email to the outbox in the current session.
+
+        The message becomes visible to the workers when the caller commits;
+        the workers are woken up right after that commit.
+        """
+        if isinstance(recipients, str):
+            recipients = [recipients]
+        # Subjects are built from item names; an overlong one would fail the caller's whole transaction
+        if len(subject) > SUBJECT_LENGTH:
+            subject = subject[:SUBJECT_LENGTH - 3] + '...'
+        message = OutboxMessage(
+            subject=subject,
+            sender=sender,
+            recipients=','.join(recipients),
+            body=body,
+        )
+        db.session.add(message)
+        db.session.info['mail_outbox_pending'] = True
+        return message
+
+    def wake(self):
+        self._wake.set()
+
+    # -- consuming ---------------------------------------------------------
+
+    def start(self):
+        """Start the dispatcher thread and the worker pool."""
+        if self._dispatcher is not None:
+            return
+        self._stop.clear()
+        self._pool = ThreadPoolExecutor(
+            max_workers=self.app.config['MAIL_OUTBOX_WORKERS'],
+            thread_name_prefix='mail-outbox'
+        )
+        self._dispatcher = threading.Thread(target=self._run, name='mail-outbox-dispatcher', daemon=True)
+        self._dispatcher.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._dispatcher is not None:
+            self._dispatcher.join()
+            self._dispatcher = None
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+    def _run(self):
+        workers = self.app.config['MAIL_OUTBOX_WORKERS']
+        while not self._stop.is_set():
+            try:
+                with self.app.app_context():
+                    # At most once an hour per process
+                    if time.monotonic() - self._last_purge >= 3600:
+                        self._last_purge = time.monotonic()
+                        self.purge_sent()
+                    message_ids = self.claim(self.app.config['MAIL_OUTBOX_BATCH_SIZE'])
+                if message_ids:
+                    # Split the batch across the pool and wait for it before claiming more
+                    chunks = [message_ids[i::workers] for i in range(workers)]
+                    futures = [self._pool.submit(self._deliver_in_context, chunk) for chunk in chunks if chunk]
+                    for future in futures:
+                        future.result()
+                    continue
+            except Exception as e:
+                print(f"Error in mail outbox dispatcher: {str(e)}")
+            self._wake.wait(self.app.config['MAIL_OUTBOX_POLL_SECONDS'])
+            self._wake.clear()
+
+    def claim(self, limit):
+        """Lease up to limit due messages to this process and return their ids."""
+        now = datetime.utcnow()
+        token = uuid.uuid4().hex
+        due = db.session.query(OutboxMessage.message_id).filter(or_(
+            and_(OutboxMessage.status == 'pending', OutboxMessage.next_attempt_at <= now),
+            and_(OutboxMessage.status == 'sending', OutboxMessage.locked_until < now),
+        )).order_by(OutboxMessage.next_attempt_at).limit(limit)
+        due_ids = [message_id for message_id, in due]
+        if not due_ids:
+            db.session.rollback()
+            return []
+
+        lease = timedelta(seconds=self.app.config['MAIL_OUTBOX_LEASE_SECONDS'])
+        # The status condition is re-checked so a row claimed meanwhile by another process is skipped
+        db.session.execute(
+            outbox_table.update()
+            .where(outbox_table.c.message_id.in_(due_ids))
+            .where(or_(
+                outbox_table.c.status == 'pending',
+                and_(outbox_table.c.status == 'sending', outbox_table.c.locked_until < now),
+            ))
+            .values(status='sending', claimed_by=token, locked_until=now + lease)
+        )
+        db.session.commit()
+        return [message_id for message_id, in db.session.query(OutboxMessage.message_id).filter_by(
+            claimed_by=token, status='sending'
+        )]
+
+    def purge_sent(self, now=None):
+        """Delete sent messages older than MAIL_OUTBOX_RETENTION_DAYS, in batches. Returns how many."""
+        before = (now or datetime.utcnow()) - timedelta(days=self.app.config['MAIL_OUTBOX_RETENTION_DAYS'])
+        purged = 0
+        while True:
+            ids = [message_id for message_id, in db.session.query(OutboxMessage.message_id).filter(
+                OutboxMessage.status == 'sent', OutboxMessage.sent_at < before
+            ).limit(PURGE_BATCH_SIZE)]
+            if not ids:
+                db.session.rollback()
+                return purged
+            purged += db.session.execute(outbox_table.delete().where(outbox_table.c.message_id.in_(ids))).rowcount
+            db.session.commit()
+
+    def _deliver_in_context(self, message_ids):
+        with self.app.app_context():
+            try:
+                self.deliver(message_ids)
+            finally:
+                db.session.remove()
+
+    def deliver(self, message_ids):
+        """Send the given claimed messages, recording the outcome of each one."""
+        for message_id in message_ids:
+            message = db.session.get(OutboxMessage, message_id)
+            if message is None or message.status != 'sending':
+                continue
+            try:
+                self._send(Message(
+                    subject=message.subject,
+                    sender=message.sender or self.app.config['MAIL_DEFAULT_SENDER'],
+                    recipients=message.recipients.split(','),
+                    body=message.body,
+                ))
+                message.status = 'sent'
+                message.sent_at = datetime.utcnow()
+                message.last_error = None
+            except Exception as e:
+                self._close_connection()
+                message.attempts += 1
+                message.last_error = str(e)
+                if message.attempts >= self.app.config['MAIL_OUTBOX_MAX_ATTEMPTS']:
+                    message.status = 'failed'
+                    print(f"Giving up on outbox message {message_id}: {str(e)}")
+                else:
+                    message.status = 'pending'
+                    backoff = self.app.config['MAIL_OUTBOX_BACKOFF_SECONDS'] * 2 ** (message.attempts - 1)
+                    message.next_attempt_at = datetime.utcnow() + timedelta(seconds=backoff)
+            message.claimed_by = None
+            message.locked_until = None
+            db.session.commit()
+
+    def drain(self, limit=None):
+        """Claim and deliver due messages in the calling thread. Returns how many were processed."""
+        processed = 0
+        batch_size = self.app.config['MAIL_OUTBOX_BATCH_SIZE']
+        try:
+            while limit is None or processed < limit:
+                message_ids = self.claim(batch_size if limit is None else min(batch_size, limit - processed))
+                if not message_ids:
+                    break
+                self.deliver(message_ids)
+                processed += len(message_ids)
+        finally:
+            self._close_connection()
+        return processed
+
+    # -- SMTP connections, one per worker thread ---------------------------
+
+    def _send(self, msg):
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            try:
+                connection.send(msg)
+                return
+            except Exception:
+                # The server may have dropped an idle connection; retry once on a fresh one
+                self._close_connection()
+        connection = mail.connect()
+        connection.__enter__()
+        self._local.connection = connection
+        connection.send(msg)
+
+    def _close_connection(self):
+        connection = getattr(self._local, 'connection', None)
+        self._local.connection = None
+        if connection is not None:
+            try:
+                connection.__exit__(None, None, None)
+            except Exception:
+                pass
+
+
+outbox = MailOutbox()
+
+
+@event.listens_for(Session, 'after_commit')
+def wake_outbox(session):
+    """Wake the dispatcher once messages queued in this session are committed."""
+    if session.info.pop('mail_outbox_pending', False):
+        outbox.wake()
+
+
+@event.listens_for(Session, 'after_rollback')
+def forget_outbox(session):
+    session.info.pop('mail_outbox_pending', None)
+
+
+if __name__ == '__main__':
+    from app import create_app
+
+    app = create_app()
+    outbox.stop()
+    with app.app_context():
+        print(f"Processed {outbox.drain()} outbox messages")
+        print(f"Deleted {outbox.purge_sent()} old sent messages")
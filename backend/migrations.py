@@ -0,0 +1,309 @@
+"""Versioned schema migrations.
+
+The schema version is the highest version recorded in schema_version. On boot
+create_app only compares it with the latest migration below (one primary key
+lookup) and refuses to start when the database is behind; migrations are
+applied once, explicitly, before the new code is started:
+
+    python migrations.py            # apply pending migrations
+    python migrations.py status     # show applied and pending migrations
+
+MIGRATE_ON_START applies them from create_app instead, which is convenient
+for a single local process but should stay off when several workers boot at
+once.
+
+Migrations are applied in order and each one is recorded as soon as it has
+run. They check what already exists before changing anything, so a database
+created before migrations existed (by db.create_all) is brought up to date by
+the same steps as an empty one, and a run that was interrupted can simply be
+started again. To keep locks on large tables short:
+
+- columns are only ever added as nullable, and indexes are created one at a
+  time, all with ALGORITHM=INPLACE, LOCK=NONE on MySQL so writes continue,
+  including the foreign keys of added columns;
+- data changes walk the table in primary key order in batches of
+  MIGRATION_BATCH_SIZE rows, committing after each batch.
+"""
+import sys
+from datetime import datetime
+from flask import current_app
+from sqlalchemy.exc import IntegrityError, OperationalError, ProgrammingError
+from sqlalchemy.schema import AddConstraint, CreateIndex
+from db import db
+from models.alert_cycle import AlertCycle
+from models.collection_version import CollectionVersion
+from models.item import Item
+from models.reminder import Reminder
+from models.schema_version import SchemaVersion
+from models.shopping_list import ShoppingListItem
+from models.stock import StockItem, Alert
+
+MIGRATIONS = []
+
+
+def migration(version, name):
+    """Register a migration function under the next schema version."""
+    def register(func):
+        assert not MIGRATIONS or MIGRATIONS[-1][0] == version - 1, "migration versions must be consecutive"
+        MIGRATIONS.append((version, name, func))
+        return func
+    return register
+
+
+def latest_version():
+    return MIGRATIONS[-1][0]
+
+
+def current_version():
+    """The schema version of the database; 0 for a database that has never been migrated."""
+    try:
+        return db.session.execute(db.select(db.func.max(SchemaVersion.version))).scalar() or 0
+    except (OperationalError, ProgrammingError):
+        # No schema_version table yet
+        db.session.rollback()
+        return 0
+
+
+# -- schema helpers ----------------------------------------------------------
+
+def online_ddl(separator=' ', dialect=None):
+    """DDL suffix asking MySQL to keep the table writable while it is changed."""
+    if (dialect or db.engine.dialect).name in ('mysql', 'mariadb'):
+        return f"{separator}ALGORITHM=INPLACE{separator}LOCK=NONE"
+    return ''
+
+
+def add_column(model, name):
+    """Add a model column to its existing table unless it is already there."""
+    table = model.__table__
+    column = table.c[name]
+    if name in {c['name'] for c in db.inspect(db.engine).get_columns(table.name)}:
+        return False
+    assert column.nullable, "columns added to existing tables must be nullable"
+    dialect = db.engine.dialect
+    spec = dialect.ddl_compiler(dialect, None).get_column_specification(column)
+    quote = dialect.identifier_preparer.quote
+    with db.engine.begin() as connection:
+        if dialect.name == 'sqlite':
+            # SQLite cannot add constraints later, so foreign keys go in the column definition
+            for fk in column.foreign_keys:
+                spec += f" REFERENCES {quote(fk.column.table.name)} ({quote(fk.column.name)})"
+                if fk.ondelete:
+                    spec += f" ON DELETE {fk.ondelete}"
+            connection.exec_driver_sql(f"ALTER TABLE {quote(table.name)} ADD COLUMN {spec}")
+        else:
+            connection.exec_driver_sql(f"ALTER TABLE {quote(table.name)} ADD COLUMN {spec}{online_ddl(', ')}")
+            for fk in column.foreign_keys:
+                add_foreign_key(connection, fk.constraint)
+    print(f"Added column {table.name}.{name}")
+    return True
+
+
+def add_foreign_key(connection, constraint):
+    """
+    Add a foreign key constraint to an existing table.
+
+    MySQL only adds foreign keys in place, without copying the table, while
+    foreign_key_checks is off; existing rows are then not checked, which is
+    fine for a column that was just added and is still all NULL.
+    """
+    dialect = connection.dialect
+    ddl = str(AddConstraint(constraint).compile(dialect=dialect))
+    if dialect.name not in ('mysql', 'mariadb'):
+        connection.exec_driver_sql(ddl)
+        return
+    connection.exec_driver_sql("SET foreign_key_checks = 0")
+    try:
+        connection.exec_driver_sql(ddl + online_ddl(', ', dialect))
+    finally:
+        connection.exec_driver_sql("SET foreign_key_checks = 1")
+
+
+def create_index(model, name, columns=None, unique=False):
+    """
+    Create an index declared on a model unless the table already has it.
+
+    Indexes that are declared as constraints instead (unique constraints) are
+    created from columns.
+    """
+    table = model.__table__
+    inspector = db.inspect(db.engine)
+    existing = {index['name'] for index in inspector.get_indexes(table.name)}
+    existing.update(constraint['name'] for constraint in inspector.get_unique_constraints(table.name))
+    if name in existing:
+        return False
+    dialect = db.engine.dialect
+    if columns is None:
+        index = next(index for index in table.indexes if index.name == name)
+        ddl = str(CreateIndex(index).compile(dialect=dialect))
+    else:
+        quote = dialect.identifier_preparer.quote
+        ddl = (f"CREATE {'UNIQUE ' if unique else ''}INDEX {quote(name)} ON {quote(table.name)} "
+               f"({', '.join(quote(column) for column in columns)})")
+    with db.engine.begin() as connection:
+        connection.exec_driver_sql(ddl + online_ddl())
+    print(f"Created index {name} on {table.name}")
+    return True
+
+
+def update_in_batches(model, condition, values):
+    """Apply an UPDATE to the rows matching condition one primary key range at a time."""
+    key = model.__mapper__.primary_key[0]
+    table = model.__table__
+    batch_size = current_app.config['MIGRATION_BATCH_SIZE']
+    last_id, updated = None, 0
+    while True:
+        query = db.select(key).where(condition).order_by(key).limit(batch_size)
+        if last_id is not None:
+            query = query.where(key > last_id)
+        ids = list(db.session.execute(query).scalars())
+        if not ids:
+            return updated
+        updated += db.session.execute(
+            table.update().where(table.c[key.key].in_(ids)).values(**values)
+        ).rowcount
+        db.session.commit()
+        last_id = ids[-1]
+
+
+# -- migrations --------------------------------------------------------------
+
+@migration(1, 'create tables')
+def create_tables():
+    # Only creates tables that do not exist; existing ones are changed by the migrations below.
+    # The replica bind gets its schema by replication.
+    db.create_all(bind_key=None)
+
+
+@migration(2, 'alert stock, kind and resolution columns')
+def alert_columns():
+    for name in ('stock_id', 'kind', 'resolved_at'):
+        add_column(Alert, name)
+    create_index(Alert, 'uq_alert_stock_kind', columns=['stock_id', 'kind'], unique=True)
+
+
+@migration(3, 'stock category and low stock threshold columns')
+def stock_threshold_columns():
+    add_column(StockItem, 'category')
+    add_column(StockItem, 'low_stock_threshold')
+
+
+@migration(4, 'indexes for list, sync, search and alert queries')
+def hot_query_indexes():
+    for model, names in [
+        (Item, ['ix_items_user_expiry', 'ix_items_user_location']),
+        (StockItem, ['ix_stock_item_quantity', 'ix_stock_item_expiration_date',
+                     'ix_stock_item_low_stock_threshold', 'ix_stock_item_category']),
+        (Alert, ['ix_alert_active', 'ix_alert_kind_active_stock']),
+        (Reminder, ['ix_reminders_user_updated', 'ix_reminders_due_date']),
+        (ShoppingListItem, ['ix_shopping_list_items_user_updated']),
+    ]:
+        for name in names:
+            create_index(model, name)
+
+
+@migration(5, 'resolve alerts raised before alerts had a kind')
+def resolve_untyped_alerts():
+    # The alert checks only manage alerts of a known kind; they raise these again if they still apply
+    resolved = update_in_batches(
+        Alert, db.and_(Alert.kind.is_(None), Alert.is_active == True),
+        {'is_active': False, 'resolved_at': datetime.utcnow()}
+    )
+    print(f"Resolved {resolved} untyped alerts")
+
+
+@migration(6, 'collection version counters')
+def collection_versions():
+    # Version rows are created by the first write to each collection since migration 10
+    pass
+
+
+@migration(7, 'item search index')
+def item_search_index():
+    from search import rebuild_search_index
+    print(f"Indexed {rebuild_search_index(batch_size=current_app.config['MIGRATION_BATCH_SIZE'])} items")
+
+
+@migration(8, 'delete alerts of deleted stock items')
+def delete_orphaned_alerts():
+    # SQLite never enforced the ON DELETE CASCADE, so deleting stock left its alerts behind
+    table = Alert.__table__
+    orphaned = db.and_(
+        table.c.stock_id.isnot(None),
+        ~db.exists().where(StockItem.__table__.c.stock_id == table.c.stock_id),
+    )
+    deleted = db.session.execute(table.delete().where(orphaned)).rowcount
+    db.session.commit()
+    print(f"Deleted {deleted} alerts of deleted stock items")
+
+
+@migration(9, 'alert cycle failed attempts column')
+def alert_cycle_attempts_column():
+    add_column(AlertCycle, 'failed_attempts')
+
+
+@migration(10, 'collection versions per user')
+def collection_versions_per_user():
+    # The rows are only ETag counters: the old single-row-per-collection table is
+    # replaced, and the new ETags have a different format, so no client gets a stale 304
+    table = CollectionVersion.__table__
+    if 'user_id' in {c['name'] for c in db.inspect(db.engine).get_columns(table.name)}:
+        return
+    table.drop(bind=db.engine)
+    table.create(bind=db.engine)
+    print(f"Recreated {table.name} with a row per collection and user")
+
+
+# -- running -----------------------------------------------------------------
+
+def upgrade():
+    """Apply every pending migration in order; returns the number applied."""
+    SchemaVersion.__table__.create(bind=db.engine, checkfirst=True)
+    applied = 0
+    for version, name, func in MIGRATIONS:
+        if db.session.get(SchemaVersion, version) is not None:
+            continue
+        db.session.rollback()
+        print(f"Applying migration {version}: {name}")
+        func()
+        try:
+            db.session.add(SchemaVersion(version=version, name=name))
+            db.session.commit()
+        except IntegrityError:
+            # Another runner recorded it first; the steps are safe to repeat
+            db.session.rollback()
+        applied += 1
+    return applied
+
+
+def check_schema_version():
+    """Refuse to start on a database that is missing migrations this code needs."""
+    version = current_version()
+    if version < latest_version():
+        raise RuntimeError(
+            f"Database schema is at version {version} but this code needs version {latest_version()}; "
+            "run `python migrations.py` to apply the pending migrations"
+        )
+    if version > latest_version():
+        print(f"Database schema version {version} is newer than this code ({latest_version()})")
+    return version
+
+
+if __name__ == '__main__':
+    import os
+    os.environ.setdefault('SCHEDULER_ENABLED', '0')
+    os.environ.setdefault('MAIL_OUTBOX_WORKERS', '0')
+    os.environ['MIGRATE_ON_START'] = '0'
+    os.environ['SCHEMA_CHECK_ON_START'] = '0'
+    from app import create_app
+
+    app = create_app()
+    with app.app_context():
+        if sys.argv[1:] == ['status']:
+            version = current_version()
+            for number, name, _ in MIGRATIONS:
+                print(f"{'applied' if number <= version else 'pending':<8} {number:>3}  {name}")
+        elif not sys.argv[1:] or sys.argv[1:] == ['upgrade']:
+            print(f"Applied {upgrade()} migration(s); schema is at version {current_version()}")
+        else:
+            sys.exit("usage: python migrations.py [upgrade|status]")
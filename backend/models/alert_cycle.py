@@ -0,0 +1,17 @@
+"""This file defines the AlertCycle model"""
+from db import db
+
+# One pass of sharded alert evaluation; next_shard is the checkpoint a restarted leader resumes from
+class AlertCycle(db.Model):
+    __tablename__ = 'alert_cycles'
+
+    cycle_id = db.Column(db.Integer, primary_key=True)
+    started_at = db.Column(db.DateTime, nullable=False)
+    shard_count = db.Column(db.Integer, nullable=False)
+    shard_size = db.Column(db.Integer, nullable=False)  # Stock ids per shard; the last shard is open-ended
+    next_shard = db.Column(db.Integer, nullable=False, default=0)
+    completed_at = db.Column(db.DateTime, nullable=True)
+    failed_attempts = db.Column(db.Integer, nullable=True, default=0)  # Failed runs of next_shard so far
+
+    def __repr__(self):
+        return f"<AlertCycle {self.cycle_id} {self.next_shard}/{self.shard_count}>"
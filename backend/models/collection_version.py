@@ -0,0 +1,13 @@
+"""This file defines the CollectionVersion model"""
+from db import db
+
+# One counter per list collection and user, bumped by every transaction that writes to their rows
+class CollectionVersion(db.Model):
+    __tablename__ = 'collection_versions'
+
+    collection = db.Column(db.String(50), primary_key=True)
+    user_id = db.Column(db.Integer, primary_key=True, default=0, autoincrement=False)  # 0: shared row
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<CollectionVersion {self.collection}/{self.user_id}={self.version}>"
@@ -4,6 +4,11 @@ from db import db
 # Item model
 class Item(db.Model):
     __tablename__ = 'Items'  # Ensure this matches the table name in the database
+    # Per-user expiry range filters and per-user location grouping
+    __table_args__ = (
+        db.Index('ix_items_user_expiry', 'user_id', 'expiry_date'),
+        db.Index('ix_items_user_location', 'user_id', 'location'),
+    )
 
     item_id = db.Column(db.Integer, primary_key=True, autoincrement=True)  # Primary key with auto-increment
     item_name = db.Column(db.String(255), nullable=False)  # String with max 255 characters
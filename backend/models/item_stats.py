@@ -0,0 +1,14 @@
+"""This file defines the ItemStat model"""
+from db import db
+
+# Per-user item counters kept up to date by item_stats.py
+class ItemStat(db.Model):
+    __tablename__ = 'item_stats'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), primary_key=True)
+    kind = db.Column(db.String(20), primary_key=True)  # 'total', 'location' or 'expiry'
+    key = db.Column(db.String(255), primary_key=True, default='')  # location name or YYYY-MM-DD expiry date
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<ItemStat {self.user_id} {self.kind}:{self.key}={self.count}>"
@@ -4,6 +4,10 @@ from models.user import User
 
 class Reminder(db.Model):
     __tablename__ = 'reminders'
+    __table_args__ = (
+        db.Index('ix_reminders_user_updated', 'user_id', 'updated_at'),
+        db.Index('ix_reminders_due_date', 'due_date'),
+    )
     reminder_id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=False)  # Corrected reference here
     title = db.Column(db.String(100), nullable=False)
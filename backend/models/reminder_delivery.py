@@ -0,0 +1,14 @@
+"""This file defines the ReminderDelivery model"""
+from db import db
+from datetime import datetime
+
+# One row per reminder notification sent; keyed by the fire time so a rescheduled reminder fires again
+class ReminderDelivery(db.Model):
+    __tablename__ = 'reminder_deliveries'
+
+    reminder_id = db.Column(db.Integer, db.ForeignKey('reminders.reminder_id', ondelete='CASCADE'), primary_key=True)
+    fire_at = db.Column(db.DateTime, primary_key=True, index=True)
+    delivered_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<ReminderDelivery {self.reminder_id} at {self.fire_at}>"
@@ -0,0 +1,13 @@
+"""This file defines the ResetToken model"""
+from db import db
+
+# Outstanding password reset tokens; only a SHA-256 of each token is stored
+class ResetToken(db.Model):
+    __tablename__ = 'password_reset_tokens'
+
+    token_hash = db.Column(db.String(64), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.user_id', ondelete='CASCADE'), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<ResetToken user={self.user_id} expires={self.expires_at}>"
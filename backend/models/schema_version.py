@@ -0,0 +1,14 @@
+"""This file defines the SchemaVersion model"""
+from db import db
+from datetime import datetime
+
+# One row per migration applied to the database (see migrations.py)
+class SchemaVersion(db.Model):
+    __tablename__ = 'schema_version'
+
+    version = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    name = db.Column(db.String(100), nullable=False)
+    applied_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<SchemaVersion {self.version} {self.name}>"
@@ -0,0 +1,21 @@
+"""This file defines the item search index models"""
+from db import db
+
+# One row per distinct trigram of an item's name, category and location
+class ItemTrigram(db.Model):
+    __tablename__ = 'item_trigrams'
+
+    trigram = db.Column(db.String(3), primary_key=True)
+    user_id = db.Column(db.Integer, primary_key=True)
+    item_id = db.Column(db.Integer, primary_key=True, index=True)  # No FK: rows are cleaned up by search.py
+
+# One row per word of an item's name, used for prefix autocomplete
+class ItemTerm(db.Model):
+    __tablename__ = 'item_terms'
+    __table_args__ = (
+        db.Index('ix_item_terms_user_term', 'user_id', 'term'),
+    )
+
+    term = db.Column(db.String(255), primary_key=True)
+    user_id = db.Column(db.Integer, primary_key=True)
+    item_id = db.Column(db.Integer, primary_key=True, index=True)
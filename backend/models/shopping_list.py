@@ -3,6 +3,9 @@ from datetime import datetime
 
 class ShoppingListItem(db.Model):
     __tablename__ = 'shopping_list_items'
+    __table_args__ = (
+        db.Index('ix_shopping_list_items_user_updated', 'user_id', 'updated_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
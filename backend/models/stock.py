@@ -2,19 +2,49 @@ from db import db
 from datetime import datetime
 
 class StockItem(db.Model):
+    # quantity and low_stock_threshold are indexed so the low stock check can bound its range scan
+    __table_args__ = (
+        db.Index('ix_stock_item_quantity', 'quantity'),
+        db.Index('ix_stock_item_expiration_date', 'expiration_date'),
+        db.Index('ix_stock_item_low_stock_threshold', 'low_stock_threshold'),
+        db.Index('ix_stock_item_category', 'category'),
+    )
+
     stock_id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(255), nullable=False)
     quantity = db.Column(db.Integer, nullable=False)
     expiration_date = db.Column(db.Date, nullable=False)
+    category = db.Column(db.String(50), nullable=True)
+    low_stock_threshold = db.Column(db.Integer, nullable=True)  # Overrides the category and global thresholds
 
     def __repr__(self):
         return f"<StockItem {self.name}>"
 
+# Default low stock threshold for every stock item in a category
+class CategoryThreshold(db.Model):
+    __tablename__ = 'stock_category_thresholds'
+
+    category = db.Column(db.String(50), primary_key=True)
+    threshold = db.Column(db.Integer, nullable=False)
+
+    def __repr__(self):
+        return f"<CategoryThreshold {self.category}={self.threshold}>"
+
 class Alert(db.Model):
+    # At most one alert row per stock item and kind; it is re-activated instead of duplicated
+    __table_args__ = (
+        db.UniqueConstraint('stock_id', 'kind', name='uq_alert_stock_kind'),
+        db.Index('ix_alert_active', 'is_active', 'alert_id'),
+        db.Index('ix_alert_kind_active_stock', 'kind', 'is_active', 'stock_id'),
+    )
+
     alert_id = db.Column(db.Integer, primary_key=True)
+    stock_id = db.Column(db.Integer, db.ForeignKey('stock_item.stock_id', ondelete='CASCADE'), nullable=True)
+    kind = db.Column(db.String(20), nullable=True)  # 'low_stock' or 'expiration'
     message = db.Column(db.String(255), nullable=False)
     is_active = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    resolved_at = db.Column(db.DateTime, nullable=True)
 
     def __repr__(self):
         return f"<Alert {self.message}>"
\ No newline at end of file
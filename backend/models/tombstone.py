@@ -0,0 +1,19 @@
+"""This file defines the Tombstone model"""
+from db import db
+
+# Records deletions from synced collections so delta sync clients can drop the rows
+class Tombstone(db.Model):
+    __tablename__ = 'tombstones'
+    __table_args__ = (
+        db.Index('ix_tombstones_collection_user_deleted', 'collection', 'user_id', 'deleted_at'),
+        db.Index('ix_tombstones_deleted', 'deleted_at'),
+    )
+
+    tombstone_id = db.Column(db.Integer, primary_key=True)
+    collection = db.Column(db.String(50), nullable=False)
+    row_id = db.Column(db.Integer, nullable=False)
+    user_id = db.Column(db.Integer, nullable=True)
+    deleted_at = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f"<Tombstone {self.collection}:{self.row_id}>"
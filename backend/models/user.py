@@ -1,6 +1,6 @@
 """This file defines the User model"""
 from db import db
-from werkzeug.security import generate_password_hash, check_password_hash
+from passwords import hasher
 
 class User(db.Model):
     """User model for user management."""
@@ -20,11 +20,11 @@ class User(db.Model):
 
     def set_password(self, password: str) -> None:
         """Hashes and sets the user's password."""
-        self.password = generate_password_hash(password, method='pbkdf2:sha256')
+        self.password = hasher.hash(password)
 
     def check_password(self, password: str) -> bool:
         """Checks if the provided password matches the stored hash."""
-        return check_password_hash(self.password, password)
+        return hasher.verify(self.password, password)
 
     def save(self) -> bool:
         """Saves the user to the database."""
@@ -0,0 +1,107 @@
+"""Password hashing off the request thread.
+
+pbkdf2 hashing and verification take hundreds of milliseconds of pure CPU
+each. PasswordHasher runs them in a small process pool, so a burst of logins
+cannot starve the threads serving other requests. The number of in-flight
+hashing jobs is bounded; once the pool is saturated, callers get HasherBusy
+instead of queueing without limit. A job that outlives PASSWORD_HASH_TIMEOUT
+also raises HasherBusy, and keeps its slot until it actually finishes.
+
+The pool's processes are started by forkserver (or spawn where that is not
+available) instead of being forked from a multithreaded server process, and
+a pool broken by a dead worker is replaced.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class HasherBusy(Exception):
+    """Raised when the hashing pool has no capacity left."""
+
+
+class PasswordHasher:
+    def __init__(self, app=None):
+        self.method = 'pbkdf2:sha256'
+        self.workers = 0
+        self.timeout = None
+        self.queue_timeout = None
+        self._slots = None
+        self._pool = None
+        self._pool_pid = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.method = app.config['PASSWORD_HASH_METHOD']
+        self.workers = app.config['PASSWORD_HASH_WORKERS']
+        self.timeout = app.config['PASSWORD_HASH_TIMEOUT']
+        self.queue_timeout = app.config['PASSWORD_HASH_QUEUE_TIMEOUT']
+        max_pending = app.config['PASSWORD_HASH_MAX_PENDING'] or self.workers * 4
+        self._slots = threading.BoundedSemaphore(max_pending) if self.workers else None
+        app.extensions['password_hasher'] = self
+
+    def hash(self, password):
+        """Return a hash of password using the configured method."""
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, pwhash, password):
+        """Check password against a stored hash."""
+        return self._run(check_password_hash, pwhash, password)
+
+    def _executor(self):
+        # Pools do not survive fork, so each worker process creates its own on first use
+        with self._lock:
+            if self._pool is None or self._pool_pid != os.getpid():
+                method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context(method)
+                )
+                self._pool_pid = os.getpid()
+            return self._pool
+
+    def _discard(self, pool):
+        """Stop using a broken pool; the next job starts a new one."""
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False)
+
+    def _submit(self, func, *args):
+        pool = self._executor()
+        try:
+            return pool, pool.submit(func, *args)
+        except BrokenProcessPool:
+            # A worker died earlier (killed, out of memory) and the pool refuses new jobs
+            self._discard(pool)
+            pool = self._executor()
+            return pool, pool.submit(func, *args)
+
+    def _run(self, func, *args):
+        if not self.workers:
+            return func(*args)
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            raise HasherBusy("Password hashing pool is saturated")
+        try:
+            pool, future = self._submit(func, *args)
+        except BaseException as e:
+            self._slots.release()
+            if isinstance(e, BrokenProcessPool):
+                raise HasherBusy("Password hashing pool could not be restarted") from e
+            raise
+        # Released when the job is done, not when the caller gives up waiting for it
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout as e:
+            raise HasherBusy("Password hashing timed out") from e
+        except BrokenProcessPool as e:
+            self._discard(pool)
+            raise HasherBusy("Password hashing worker died") from e
+
+
+hasher = PasswordHasher()
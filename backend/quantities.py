@@ -0,0 +1,133 @@
+"""Atomic quantity adjustments for stock items and inventory items.
+
+Clients send signed deltas ("used 2", "bought 6") instead of absolute
+quantities, and each delta is applied in the database as
+
+    UPDATE ... SET quantity = quantity + :delta WHERE id IN (...)
+
+so concurrent adjustments from several devices add up instead of
+overwriting each other, without reading the row first or locking it. A
+batch is summed per id and grouped by delta, so it costs one statement per
+distinct delta (per 500 ids), all in the caller's transaction.
+
+Quantities never go below zero: negative deltas only apply where enough is
+left, and if any id is unknown or short the whole batch is rolled back and
+rejected with QuantityConflict.
+"""
+import traceback
+from collections import defaultdict
+from flask import current_app, jsonify, request
+from alerts import chunked
+from db import db
+
+
+class QuantityConflict(Exception):
+    """Raised when a batch names unknown ids or would take a quantity below zero."""
+
+    def __init__(self, missing, insufficient):
+        self.missing = missing
+        self.insufficient = insufficient
+        parts = []
+        if missing:
+            parts.append(f"not found: {missing}")
+        if insufficient:
+            parts.append(f"insufficient quantity: {insufficient}")
+        super().__init__("; ".join(parts))
+
+
+def _is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def parse_delta(data):
+    """Return the delta of a single adjustment body {"delta": n}."""
+    delta = data.get('delta') if isinstance(data, dict) else None
+    if not _is_int(delta):
+        raise ValueError("delta must be an integer")
+    return delta
+
+
+def parse_adjustments(data, id_key):
+    """Return {id: summed delta} from a batch body {"adjustments": [{id_key: id, "delta": n}, ...]}."""
+    adjustments = data.get('adjustments') if isinstance(data, dict) else None
+    if not isinstance(adjustments, list) or not adjustments:
+        raise ValueError("adjustments must be a non-empty list")
+    limit = current_app.config['QUANTITY_ADJUST_MAX_BATCH']
+    if len(adjustments) > limit:
+        raise ValueError(f"At most {limit} adjustments per request")
+
+    deltas = defaultdict(int)
+    for entry in adjustments:
+        row_id = entry.get(id_key) if isinstance(entry, dict) else None
+        delta = entry.get('delta') if isinstance(entry, dict) else None
+        if not _is_int(row_id) or not _is_int(delta):
+            raise ValueError(f"Each adjustment needs an integer {id_key} and delta")
+        deltas[row_id] += delta
+    return dict(deltas)
+
+
+def adjust_quantities(model, deltas):
+    """
+    Add deltas ({id: delta}) to the quantity of model rows and return {id: new quantity}.
+
+    Does not commit. If an id does not exist or a quantity would drop below
+    zero, the session is rolled back and QuantityConflict is raised.
+    """
+    table = model.__table__
+    key = table.c[model.__mapper__.primary_key[0].key]
+    quantity = table.c.quantity
+
+    by_delta = defaultdict(list)
+    for row_id, delta in deltas.items():
+        if delta:
+            by_delta[delta].append(row_id)
+
+    updated = 0
+    for delta, ids in by_delta.items():
+        for chunk in chunked(ids):
+            statement = table.update().where(key.in_(chunk)).values(quantity=quantity + delta)
+            if delta < 0:
+                statement = statement.where(quantity >= -delta)
+            updated += db.session.execute(statement).rowcount
+
+    quantities = current_quantities(key, quantity, deltas)
+    if updated < sum(len(ids) for ids in by_delta.values()) or len(quantities) < len(deltas):
+        # Undo the part of the batch that was applied, then report against the committed quantities
+        db.session.rollback()
+        quantities = current_quantities(key, quantity, deltas)
+        db.session.rollback()
+        raise QuantityConflict(
+            sorted(row_id for row_id in deltas if row_id not in quantities),
+            sorted(row_id for row_id, delta in deltas.items()
+                   if row_id in quantities and quantities[row_id] + delta < 0),
+        )
+    return quantities
+
+
+def current_quantities(key, quantity, ids):
+    quantities = {}
+    for chunk in chunked(ids):
+        quantities.update(db.session.execute(db.select(key, quantity).where(key.in_(chunk))).all())
+    return quantities
+
+
+def apply_adjustments(model, id_key, parse):
+    """Handle an adjust request: parse(body) returns {id: delta}; responds with the new quantities."""
+    try:
+        deltas = parse(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        quantities = adjust_quantities(model, deltas)
+        db.session.commit()
+    except QuantityConflict as e:
+        status = 404 if e.missing and not e.insufficient else 409
+        return jsonify({"error": str(e), "not_found": e.missing, "insufficient": e.insufficient}), status
+    except Exception:
+        db.session.rollback()
+        print(f"Error adjusting {model.__tablename__} quantities:\n{traceback.format_exc()}")
+        return jsonify({"error": "Could not apply the adjustments"}), 500
+    return jsonify({"quantities": [
+        {id_key: row_id, "quantity": quantity} for row_id, quantity in sorted(quantities.items())
+    ]}), 200
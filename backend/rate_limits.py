@@ -0,0 +1,57 @@
+"""In-process sliding-window admission limits.
+
+Limits are kept per worker process, so with N workers the effective limit is
+up to N times the configured one. That is still enough to stop a single
+client from monopolising the password hashing pool.
+
+At most max_keys keys are tracked. Keys are kept in least recently used
+order; when a new key would exceed the bound, expired keys and then the
+least recently used ones are dropped, so memory stays bounded even when
+many clients are active at once (e.g. a credential stuffing run from many
+addresses). An evicted key simply starts over with an empty window.
+"""
+import threading
+import time
+from collections import OrderedDict, deque
+
+
+class SlidingWindowLimiter:
+    """Allow at most limit events per key within the last window seconds."""
+
+    def __init__(self, limit, window, max_keys=10000):
+        self.limit = limit
+        self.window = window
+        self.max_keys = max_keys
+        self._events = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hit(self, key):
+        """
+        Record an event for key if it is within the limit.
+
+        Returns 0 when the event is allowed, otherwise the number of seconds
+        until the oldest event in the window expires.
+        """
+        now = time.monotonic()
+        with self._lock:
+            events = self._events.get(key)
+            if events is None:
+                self._evict(now)
+                events = self._events[key] = deque()
+            else:
+                self._events.move_to_end(key)
+            while events and events[0] <= now - self.window:
+                events.popleft()
+            if len(events) >= self.limit:
+                return max(1, int(events[0] + self.window - now) + 1)
+            events.append(now)
+            return 0
+
+    def _evict(self, now):
+        """Make room for one more key, dropping least recently used keys first."""
+        while self._events:
+            key, events = next(iter(self._events.items()))
+            expired = not events or events[-1] <= now - self.window
+            if not expired and len(self._events) < self.max_keys:
+                return
+            del self._events[key]
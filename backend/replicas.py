@@ -0,0 +1,58 @@
+"""Read replica routing.
+
+With DATABASE_REPLICA_URL set, the URL becomes the 'replica' bind and GET
+and HEAD requests read from it, so dashboards, list pages and polling do not
+compete with writes on the primary. Everything else, including scheduled
+jobs and the CLI, uses the primary only. Within a replica-routed request,
+writes still go to the primary and the rest of the request reads from the
+primary too (see RoutingSession in db.py).
+
+Replicas lag behind, so after a client writes, its reads stay on the primary
+for READ_YOUR_WRITES_SECONDS: the response to any request that wrote sets a
+cookie holding the time until which that client's reads are sent to the
+primary. A cookie works across workers and needs no shared state; the
+frontend already sends credentials with its requests.
+
+Code that must not read stale data calls use_primary() before querying.
+
+To try it locally, copy the SQLite database and point DATABASE_REPLICA_URL
+at the copy. Nothing is replicated, so reads visibly come from the copy
+except right after a write.
+"""
+import time
+from flask import current_app, request
+from db import db
+
+STICKY_COOKIE = 'read_primary_until'
+
+
+def use_primary():
+    """Send the rest of this request's reads to the primary."""
+    db.session.info['read_replica'] = False
+
+
+def wants_primary():
+    """True while the client's read-your-writes window from an earlier write is open."""
+    try:
+        return float(request.cookies.get(STICKY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def init_app(app):
+    """Route reads of GET and HEAD requests to the replica, if one is configured."""
+    if not app.config['DATABASE_REPLICA_URL']:
+        return
+
+    @app.before_request
+    def route_reads():
+        db.session.info['read_replica'] = request.method in ('GET', 'HEAD') and not wants_primary()
+
+    @app.after_request
+    def stick_to_primary(response):
+        if db.session.info.get('wrote'):
+            window = current_app.config['READ_YOUR_WRITES_SECONDS']
+            response.set_cookie(
+                STICKY_COOKIE, f"{time.time() + window:.3f}", max_age=window, httponly=True, samesite='Lax'
+            )
+        return response
@@ -1,14 +1,15 @@
 from flask import Blueprint, request, jsonify, make_response
-from werkzeug.security import check_password_hash, generate_password_hash
 from db import db
 from models.user import User
-from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
+from flask_jwt_extended import create_access_token, jwt_required, verify_jwt_in_request, current_user
 from datetime import datetime, timedelta
 from functools import wraps
-from flask_mail import Message
 import secrets
-from extensions import mail, reset_tokens
+from extensions import reset_tokens
+from mail_outbox import outbox
 from flask import current_app
+from passwords import HasherBusy
+from rate_limits import SlidingWindowLimiter
 
 auth_routes = Blueprint('auth_routes', __name__, url_prefix='/api/auth')
 
@@ -16,13 +17,23 @@ def add_cors_headers(response):
     response.headers['Access-Control-Allow-Credentials'] = 'true'
     return response
 
+def login_limiters():
+    """Return the (per-account, per-IP) login limiters for this app, creating them on first use."""
+    limiters = current_app.extensions.get('login_limiters')
+    if limiters is None:
+        window = current_app.config['LOGIN_ATTEMPT_WINDOW_SECONDS']
+        limiters = current_app.extensions.setdefault('login_limiters', (
+            SlidingWindowLimiter(current_app.config['LOGIN_MAX_ATTEMPTS_PER_ACCOUNT'], window),
+            SlidingWindowLimiter(current_app.config['LOGIN_MAX_ATTEMPTS_PER_IP'], window),
+        ))
+    return limiters
+
 def admin_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
-        current_user_id = get_jwt_identity()
-        current_user = User.query.get(current_user_id)
-        
-        if not current_user or current_user.role != 'admin':
+        # current_user comes from the cached identity loader, not a fresh query
+        verify_jwt_in_request()
+        if current_user.role != 'admin':
             return jsonify({'message': 'Admin access required'}), 403
             
         return f(*args, **kwargs)
@@ -61,23 +72,30 @@ def login():
         
     data = request.get_json()
     
-    # Debug logging
-    print("Login attempt with data:", data)
-    
     email = data.get('email')
     password = data.get('password')
 
     if not email or not password:
         return jsonify({"message": "Email and password are required"}), 400
 
+    # Admission limits keep one account or client from tying up the hashing pool
+    account_limiter, ip_limiter = login_limiters()
+    retry_after = ip_limiter.hit(request.remote_addr) or account_limiter.hit(email.lower())
+    if retry_after:
+        response = jsonify({"message": "Too many login attempts. Please try again later."})
+        response.headers['Retry-After'] = str(retry_after)
+        return response, 429
+
     user = User.query.filter_by(email=email).first()
-    
-    # Debug logging
-    print("Found user:", user)
-    if user:
-        print("Password check:", check_password_hash(user.password, password))
 
-    if not user or not check_password_hash(user.password, password):
+    try:
+        valid = user is not None and user.check_password(password)
+    except HasherBusy:
+        response = jsonify({"message": "Server is busy. Please try again shortly."})
+        response.headers['Retry-After'] = '1'
+        return response, 503
+
+    if not valid:
         return jsonify({"message": "Invalid email or password"}), 401
 
     # Create access token
@@ -128,24 +146,21 @@ def forgot_password():
 
     # Generate reset token
     reset_token = secrets.token_urlsafe(32)
-    reset_tokens[reset_token] = {
-        'user_id': user.user_id,
-        'expires': datetime.utcnow() + timedelta(hours=1)
-    }
+    reset_tokens.put(reset_token, user.user_id, datetime.utcnow() + timedelta(hours=1))
 
-    # Send reset email
-    msg = Message(
+    # Queue reset email; the outbox workers deliver it outside the request
+    outbox.enqueue(
         'Password Reset Request',
-        sender=current_app.config['MAIL_DEFAULT_SENDER'],
-        recipients=[email]
-    )
-    msg.body = f'''
+        [email],
+        f'''
     To reset your password, visit the following link:
     http://localhost:3000/reset-password?token={reset_token}
     
     This link will expire in 1 hour.
-    '''
-    mail.send(msg)
+    ''',
+        sender=current_app.config['MAIL_DEFAULT_SENDER']
+    )
+    db.session.commit()
 
     return jsonify({"message": "Password reset email sent"}), 200
 
@@ -166,20 +181,23 @@ def reset_password():
     if not token or not new_password:
         return jsonify({"message": "Token and new password are required"}), 400
 
-    token_data = reset_tokens.get(token)
-    if not token_data or datetime.utcnow() > token_data['expires']:
+    # Consuming the token and changing the password commit together
+    user_id = reset_tokens.pop(token)
+    if user_id is None:
         return jsonify({"message": "Invalid or expired token"}), 400
 
-    user = User.query.get(token_data['user_id'])
+    user = User.query.get(user_id)
     if not user:
+        db.session.rollback()
         return jsonify({"message": "User not found"}), 404
 
-    user.password = generate_password_hash(new_password)
+    try:
+        user.set_password(new_password)
+    except HasherBusy:
+        db.session.rollback()
+        return jsonify({"message": "Server is busy. Please try again shortly."}), 503
     db.session.commit()
 
-    # Remove used token
-    del reset_tokens[token]
-
     return jsonify({"message": "Password reset successful"}), 200
 
 @auth_routes.route('/verify-token', methods=['GET', 'OPTIONS'])
@@ -193,18 +211,13 @@ def verify_token():
         response.headers.add('Access-Control-Allow-Origin', 'http://localhost:3000')
         return response
 
-    current_user_id = get_jwt_identity()
-    user = User.query.get(current_user_id)
-
-    if not user:
-        return jsonify({"message": "User not found"}), 404
-
+    # A token whose user no longer exists is answered with 404 by the lookup error loader
     return jsonify({
         "message": "Token is valid",
         "user": {
-            "user_id": user.user_id,
-            "email": user.email,
-            "username": user.username,
-            "role": user.role
+            "user_id": current_user.user_id,
+            "email": current_user.email,
+            "username": current_user.username,
+            "role": current_user.role
         }
     }), 200 
\ No newline at end of file
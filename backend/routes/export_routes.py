@@ -0,0 +1,84 @@
+""" Streaming export of items, stock, reminders and shopping lists"""
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context
+from db import db
+from models.item import Item
+from models.stock import StockItem
+from models.reminder import Reminder
+from models.shopping_list import ShoppingListItem
+from serialization import (
+    ITEM_FIELDS, STOCK_FIELDS, REMINDER_FIELDS, SHOPPING_LIST_FIELDS, select_fields, format_rows, dumps
+)
+import csv
+import io
+
+export_routes = Blueprint('export_routes', __name__, url_prefix='/api/export')
+
+# Exportable collections; shopping-list rows also carry their owner
+EXPORTS = {
+    'items': (Item, ITEM_FIELDS),
+    'stock': (StockItem, STOCK_FIELDS),
+    'reminders': (Reminder, REMINDER_FIELDS),
+    'shopping-list': (ShoppingListItem, SHOPPING_LIST_FIELDS + [("user_id", ShoppingListItem.user_id, None)]),
+}
+
+def export_rows(model, spec, user_id, chunk_size):
+    """Yield lists of formatted rows, fetching chunk_size rows from the database at a time."""
+    primary_key = model.__table__.primary_key.columns.values()[0]
+
+    query = select_fields(spec).order_by(primary_key)
+    if user_id is not None:
+        query = query.where(model.user_id == user_id)
+
+    result = db.session.execute(query.execution_options(yield_per=chunk_size))
+    for partition in result.partitions():
+        yield format_rows(spec, partition)
+
+def generate_ndjson(names, chunks):
+    for rows in chunks:
+        yield b''.join(dumps(dict(zip(names, row))) + b'\n' for row in rows)
+
+def generate_csv(names, chunks):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # The header goes out before the first row is fetched
+    writer.writerow(names)
+    yield buffer.getvalue()
+    for rows in chunks:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(rows)
+        yield buffer.getvalue()
+
+@export_routes.route('/<collection>', methods=['GET'])
+def export_collection(collection):
+    """
+    Stream a whole collection as NDJSON (default) or CSV.
+
+    Query parameters:
+        format  -- ndjson or csv
+        user_id -- only export this user's rows (not available for stock)
+    """
+    if collection not in EXPORTS:
+        return jsonify({"error": f"Unknown collection: {collection}"}), 404
+    model, spec = EXPORTS[collection]
+
+    fmt = request.args.get('format', 'ndjson').lower()
+    if fmt not in ('ndjson', 'csv'):
+        return jsonify({"error": "Unsupported format. Use ndjson or csv"}), 400
+
+    user_id = request.args.get('user_id', type=int)
+    if user_id is not None and not hasattr(model, 'user_id'):
+        return jsonify({"error": f"{collection} cannot be filtered by user_id"}), 400
+
+    names = [name for name, _, _ in spec]
+    chunks = export_rows(model, spec, user_id, current_app.config['EXPORT_CHUNK_SIZE'])
+    if fmt == 'csv':
+        body, mimetype = generate_csv(names, chunks), 'text/csv'
+    else:
+        body, mimetype = generate_ndjson(names, chunks), 'application/x-ndjson'
+
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={collection}.{fmt}'}
+    )
@@ -0,0 +1,232 @@
+""" Bulk import of items and stock from streamed CSV or NDJSON uploads"""
+from flask import Blueprint, request, jsonify, current_app
+from db import db
+from models.item import Item
+from models.stock import StockItem
+from models.user import User
+from routes.stock_routes import valid_threshold
+from datetime import datetime
+from item_stats import apply_deltas, deltas_for_rows
+from search import reindex_items
+import csv
+import io
+import json
+
+import_routes = Blueprint('import_routes', __name__, url_prefix='/api/import')
+
+FORMATS = {
+    'csv': 'csv',
+    'ndjson': 'ndjson',
+    'text/csv': 'csv',
+    'application/x-ndjson': 'ndjson',
+    'application/ndjson': 'ndjson',
+}
+
+def request_format():
+    """Pick the upload format from ?format= or the Content-Type header."""
+    fmt = request.args.get('format') or (request.mimetype or '')
+    return FORMATS.get(fmt.lower())
+
+def read_rows(fmt):
+    """
+    Yield (line_number, row, error) for every record of the upload.
+
+    The body is read incrementally from the request stream, so memory use does
+    not depend on the size of the upload. Bytes that are not UTF-8, or CSV the
+    parser rejects, end the upload with a final error record.
+    """
+    stream = io.TextIOWrapper(request.stream, encoding='utf-8', newline='')
+    line_number = 0
+    try:
+        if fmt == 'csv':
+            reader = csv.DictReader(stream)
+            for row in reader:
+                line_number = reader.line_num
+                yield line_number, row, None
+            return
+
+        for line_number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield line_number, None, f"Invalid JSON: {str(e)}"
+                continue
+            if not isinstance(row, dict):
+                yield line_number, None, "Each line must be a JSON object"
+                continue
+            yield line_number, row, None
+    except (UnicodeDecodeError, csv.Error) as e:
+        # Nothing after this point can be parsed reliably, so the rest of the upload is skipped
+        yield line_number + 1, None, f"Upload could not be read after line {line_number}: {str(e)}"
+
+def parse_date(value, field, required=False):
+    if value in (None, ''):
+        if required:
+            raise ValueError(f"Missing required field: {field}")
+        return None
+    try:
+        return datetime.strptime(str(value), '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError(f"Invalid date for {field}. Use YYYY-MM-DD")
+
+def parse_int(value, field):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid integer for {field}")
+
+def require(row, fields):
+    for field in fields:
+        if row.get(field) in (None, ''):
+            raise ValueError(f"Missing required field: {field}")
+
+def validate_item(row):
+    require(row, ["item_name", "category", "quantity", "location", "user_id"])
+    return {
+        "item_name": str(row["item_name"]),
+        "category": str(row["category"]),
+        "quantity": parse_int(row["quantity"], "quantity"),
+        "location": str(row["location"]),
+        "user_id": parse_int(row["user_id"], "user_id"),
+        "purchase_date": parse_date(row.get("purchase_date"), "purchase_date"),
+        "expiry_date": parse_date(row.get("expiry_date"), "expiry_date"),
+    }
+
+CATEGORY_LENGTH = StockItem.__table__.c.category.type.length
+
+def validate_stock(row):
+    require(row, ["name", "quantity", "expiration_date"])
+    category = str(row["category"]) if row.get("category") not in (None, "") else None
+    if category is not None and len(category) > CATEGORY_LENGTH:
+        raise ValueError(f"category must be at most {CATEGORY_LENGTH} characters")
+    # Empty means the item has no threshold of its own and uses its category's
+    threshold = row.get("low_stock_threshold")
+    if threshold not in (None, ""):
+        threshold = parse_int(threshold, "low_stock_threshold")
+        if not valid_threshold(threshold):
+            raise ValueError("low_stock_threshold must be a non-negative integer")
+    else:
+        threshold = None
+    return {
+        "name": str(row["name"]),
+        "quantity": parse_int(row["quantity"], "quantity"),
+        "expiration_date": parse_date(row["expiration_date"], "expiration_date", required=True),
+        "category": category,
+        "low_stock_threshold": threshold,
+    }
+
+def check_item_users(batch):
+    """Drop rows whose user does not exist; returns the errors for them."""
+    user_ids = {row["user_id"] for _, row in batch}
+    known = {user_id for user_id, in db.session.query(User.user_id).filter(User.user_id.in_(user_ids))}
+    errors = [(line, f"Unknown user_id: {row['user_id']}") for line, row in batch if row["user_id"] not in known]
+    batch[:] = [(line, row) for line, row in batch if row["user_id"] in known]
+    return errors
+
+def index_new_items(batch, watermark):
+    """Update the dashboard counters and search index that ORM flush hooks would have maintained."""
+    connection = db.session.connection()
+    apply_deltas(connection, deltas_for_rows(
+        (row["user_id"], row["location"], row["expiry_date"]) for _, row in batch
+    ))
+    reindex_items(connection, db.session.query(
+        Item.item_id, Item.user_id, Item.item_name, Item.category, Item.location
+    ).filter(Item.item_id > watermark).all())
+
+def run_import(model, validate, check_batch=None, after_insert=None):
+    """
+    Stream the upload into model's table.
+
+    Valid rows are inserted with one executemany per IMPORT_BATCH_SIZE rows and
+    committed every IMPORT_BATCHES_PER_TRANSACTION batches. Rows that fail
+    validation, or whose transaction fails, are reported by line number.
+    """
+    fmt = request_format()
+    if fmt is None:
+        return jsonify({"error": "Unsupported format. Use ?format=csv or ?format=ndjson"}), 400
+
+    batch_size = current_app.config['IMPORT_BATCH_SIZE']
+    batches_per_transaction = current_app.config['IMPORT_BATCHES_PER_TRANSACTION']
+    max_errors = current_app.config['IMPORT_MAX_ERRORS']
+    table = model.__table__
+    primary_key = table.primary_key.columns.values()[0]
+
+    inserted, failed, errors, truncated = 0, 0, [], False
+    pending = []  # (first_line, last_line, count) of batches in the open transaction
+
+    def report(entry, count=1):
+        nonlocal failed, truncated
+        failed += count
+        if len(errors) < max_errors:
+            errors.append(entry)
+        else:
+            truncated = True
+
+    def fail_pending(error):
+        # A failed statement or commit loses every batch of the open transaction
+        db.session.rollback()
+        for first_line, last_line, count in pending:
+            report({"lines": [first_line, last_line], "error": str(error)}, count)
+        pending.clear()
+
+    def commit():
+        nonlocal inserted
+        try:
+            db.session.commit()
+        except Exception as e:
+            fail_pending(e)
+            return
+        inserted += sum(count for _, _, count in pending)
+        pending.clear()
+
+    def flush(batch):
+        if check_batch:
+            for line, message in check_batch(batch):
+                report({"line": line, "error": message})
+        if not batch:
+            return
+        pending.append((batch[0][0], batch[-1][0], len(batch)))
+        try:
+            watermark = db.session.query(db.func.max(primary_key)).scalar() or 0
+            db.session.execute(table.insert(), [row for _, row in batch])
+            if after_insert:
+                after_insert(batch, watermark)
+        except Exception as e:
+            fail_pending(e)
+            return
+        if len(pending) >= batches_per_transaction:
+            commit()
+
+    batch = []
+    for line, row, error in read_rows(fmt):
+        if error is None:
+            try:
+                batch.append((line, validate(row)))
+            except ValueError as e:
+                error = str(e)
+        if error is not None:
+            report({"line": line, "error": error})
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = []
+    flush(batch)
+    commit()
+
+    return jsonify({
+        "inserted": inserted,
+        "failed": failed,
+        "errors": errors,
+        "errors_truncated": truncated
+    }), 200
+
+@import_routes.route('/items', methods=['POST'])
+def import_items():
+    """Import items from a CSV (header row required) or NDJSON upload."""
+    return run_import(Item, validate_item, check_batch=check_item_users, after_insert=index_new_items)
+
+@import_routes.route('/stock', methods=['POST'])
+def import_stock():
+    """Import stock items from a CSV (header row required) or NDJSON upload."""
+    return run_import(StockItem, validate_stock)
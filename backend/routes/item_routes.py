@@ -1,19 +1,93 @@
 """ A directory to store Flask route handlers (views)"""
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from db import db
 import json
 from datetime import datetime  
 from models.item import Item
+import search
+from quantities import apply_adjustments, parse_adjustments, parse_delta
+from serialization import ITEM_FIELDS, select_fields, format_rows, fast_jsonify
 
 
 item_routes = Blueprint('item_routes', __name__)
 
-# Get all items
+# Columns that can be requested through ?fields=
+FIELDS_BY_NAME = {field[0]: field for field in ITEM_FIELDS}
+
+def parse_date_arg(name):
+    """Parse an optional YYYY-MM-DD query argument, raising ValueError on bad input."""
+    value = request.args.get(name)
+    if not value:
+        return None
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+# Get items, one keyset page at a time
 @item_routes.route("/api/items",methods=["GET"])
 def get_items():
-    items = Item.query.all()
-    result = [item.to_json() for item in items]
-    return jsonify(result)
+    """
+    List items ordered by item_id.
+
+    Query parameters:
+        after      -- cursor: only return items with item_id greater than this
+        limit      -- page size (defaults to ITEMS_PAGE_SIZE, capped at ITEMS_MAX_PAGE_SIZE)
+        user_id, category, location -- exact-match filters
+        expiry_from, expiry_to      -- inclusive expiry_date range (YYYY-MM-DD)
+        fields     -- comma separated list of columns to return
+
+    The body stays a JSON array; the cursor for the next page is returned in the
+    X-Next-Cursor header and is absent on the last page.
+    """
+    try:
+        after = request.args.get("after", type=int)
+        limit = request.args.get("limit", current_app.config['ITEMS_PAGE_SIZE'], type=int)
+        limit = max(1, min(limit, current_app.config['ITEMS_MAX_PAGE_SIZE']))
+        expiry_from = parse_date_arg("expiry_from")
+        expiry_to = parse_date_arg("expiry_to")
+    except ValueError:
+        return jsonify({"error": "Invalid date format. Use YYYY-MM-DD"}), 400
+
+    user_id = request.args.get("user_id")
+    if user_id:
+        try:
+            user_id = int(user_id)
+        except ValueError:
+            return jsonify({"error": "user_id must be an integer"}), 400
+
+    fields = request.args.get("fields")
+    if fields:
+        names = [name.strip() for name in fields.split(",") if name.strip()]
+        unknown = [name for name in names if name not in FIELDS_BY_NAME]
+        if unknown:
+            return jsonify({"error": f"Unknown fields: {', '.join(unknown)}"}), 400
+    else:
+        names = list(FIELDS_BY_NAME)
+
+    # item_id is always selected last so the next cursor can be computed
+    fields = [FIELDS_BY_NAME[name] for name in names] + [FIELDS_BY_NAME["item_id"]]
+
+    query = select_fields(fields)
+    if user_id:
+        query = query.where(Item.user_id == user_id)
+    if request.args.get("category"):
+        query = query.where(Item.category == request.args["category"])
+    if request.args.get("location"):
+        query = query.where(Item.location == request.args["location"])
+    if expiry_from:
+        query = query.where(Item.expiry_date >= expiry_from)
+    if expiry_to:
+        query = query.where(Item.expiry_date <= expiry_to)
+    if after is not None:
+        query = query.where(Item.item_id > after)
+
+    # Fetch one extra row to know whether another page exists
+    rows = db.session.execute(query.order_by(Item.item_id).limit(limit + 1)).all()
+    has_more = len(rows) > limit
+    rows = format_rows(fields, rows[:limit])
+
+    response = fast_jsonify([dict(zip(names, row)) for row in rows])
+    if has_more:
+        response.headers['X-Next-Cursor'] = str(rows[-1][-1])
+    return response
 
 #Create a item
 @item_routes.route("/api/items",methods=["POST"])
@@ -99,14 +173,55 @@ def update_item(item_id):
         db.session.rollback()
         return jsonify({"error": str(e)}), 500
 
-# Search items by name
+# Adjust quantities by signed deltas
+@item_routes.route('/api/items/<int:item_id>/adjust', methods=['PATCH'])
+def adjust_item(item_id):
+    """Add a signed delta to an item's quantity: {"delta": -1}"""
+    return apply_adjustments(Item, 'item_id', lambda data: {item_id: parse_delta(data)})
+
+@item_routes.route('/api/items/adjust', methods=['PATCH'])
+def adjust_items():
+    """Apply a batch of deltas in one transaction: {"adjustments": [{"item_id": 1, "delta": -1}, ...]}"""
+    return apply_adjustments(Item, 'item_id', lambda data: parse_adjustments(data, 'item_id'))
+
+# Search items by name, category or location
 @item_routes.route("/api/items/search", methods=["GET"])
 def search_items():
-    name = request.args.get("name")
+    """
+    Ranked item search backed by the trigram index in search.py.
 
-    if not name:
+    Query parameters:
+        q (or name) -- text to search for
+        user_id     -- only search this user's items
+        fuzzy       -- 1/true to allow partial trigram matches
+        limit, offset -- page of ranked results
+    """
+    query = request.args.get("q") or request.args.get("name")
+
+    if not query:
         return jsonify({"error": "Search name is required"}), 400
 
-    items = Item.query.filter(Item.name.ilike(f"%{name}%")).all()
-    result = [item.to_json() for item in items]
+    limit = max(1, min(request.args.get("limit", current_app.config['SEARCH_PAGE_SIZE'], type=int),
+                       current_app.config['ITEMS_MAX_PAGE_SIZE']))
+    offset = max(0, request.args.get("offset", 0, type=int))
+    fuzzy = request.args.get("fuzzy", "").lower() in ['true', '1', 't']
+
+    matches = search.search_items(
+        query,
+        user_id=request.args.get("user_id", type=int),
+        fuzzy=fuzzy,
+        limit=limit,
+        offset=offset,
+        min_similarity=current_app.config['SEARCH_MIN_SIMILARITY']
+    )
+    result = [dict(item.to_json(), score=score) for item, score in matches]
     return jsonify(result), 200
+
+# Suggest item names for search-as-you-type
+@item_routes.route("/api/items/autocomplete", methods=["GET"])
+def autocomplete_items():
+    prefix = request.args.get("prefix", "")
+    limit = max(1, min(request.args.get("limit", current_app.config['AUTOCOMPLETE_LIMIT'], type=int), 50))
+
+    suggestions = search.autocomplete(prefix, user_id=request.args.get("user_id", type=int), limit=limit)
+    return jsonify(suggestions), 200
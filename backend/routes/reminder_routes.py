@@ -2,6 +2,9 @@
 from flask import Blueprint, request, jsonify
 from db import db
 from models.reminder import Reminder
+from serialization import REMINDER_FIELDS, select_fields, fetch_records, fast_jsonify
+from change_tracking import conditional_list
+from sync import changes_since, parse_cursor, CursorExpired
 from datetime import datetime
 
 reminder_routes = Blueprint('reminder_routes', __name__)
@@ -45,19 +48,37 @@ def create_reminder():
 
 @reminder_routes.route('/reminders', methods=['GET'])
 def get_all_reminders():
-    reminders = Reminder.query.all()
-    reminder_list = [{
-        "reminder_id": reminder.reminder_id,
-        "title":reminder.title,
-        "user_id": reminder.user_id,
-        "reminder_text": reminder.reminder_text,
-        "due_date": reminder.due_date.strftime('%Y-%m-%d'),  # Formatting date
-        "reminder_time": reminder.reminder_time.strftime('%H:%M:%S') if reminder.reminder_time else None,
-        "is_completed": reminder.is_completed,
-        "created_at": reminder.created_at.strftime('%Y-%m-%d %H:%M:%S'),  # Formatting timestamp
-        "updated_at": reminder.updated_at.strftime('%Y-%m-%d %H:%M:%S')  # Formatting timestamp
-    } for reminder in reminders]
-    return jsonify(reminder_list), 200
+    """
+    List reminders; ?user_id= limits the list (and its ETag) to one user's reminders.
+    """
+    user_id = request.args.get('user_id')
+    if user_id is not None:
+        try:
+            user_id = int(user_id)
+        except ValueError:
+            return jsonify({"message": "user_id must be an integer"}), 400
+
+    query = select_fields(REMINDER_FIELDS).order_by(Reminder.reminder_id)
+    if user_id is not None:
+        query = query.where(Reminder.user_id == user_id)
+    return conditional_list('reminders', lambda: fast_jsonify(fetch_records(REMINDER_FIELDS, query)), user_id=user_id)
+
+@reminder_routes.route('/reminders/changes', methods=['GET'])
+def get_reminder_changes():
+    """
+    Reminders created, updated or deleted since a cursor.
+
+    Query parameters:
+        since   -- cursor from the previous response; omit for a full download
+        user_id -- only sync this user's reminders
+    """
+    try:
+        since = parse_cursor(request.args['since']) if request.args.get('since') else None
+        return fast_jsonify(changes_since('reminders', since, request.args.get('user_id', type=int)))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except CursorExpired as e:
+        return jsonify({"error": str(e)}), 410
 
 @reminder_routes.route('/reminders/<int:reminder_id>', methods=['GET'])
 def get_reminder(reminder_id):
@@ -1,10 +1,12 @@
 from flask import Blueprint, request, jsonify
 from db import db
 from models.shopping_list import ShoppingListItem
+from serialization import SHOPPING_LIST_FIELDS, select_fields, fetch_records, fast_jsonify
 from flask_cors import cross_origin
 from datetime import datetime
-import jwt
-import os
+from identity import decode_bearer_token
+from change_tracking import conditional_list
+from sync import changes_since, parse_cursor, CursorExpired
 
 shopping_list_routes = Blueprint('shopping_list_routes', __name__)
 
@@ -15,13 +17,13 @@ def get_user_id_from_token(request):
         return None
     
     token = auth_header.split(' ')[1]
-    try:
-        secret_key = os.environ.get('JWT_SECRET_KEY', 'your-secret-key')
-        payload = jwt.decode(token, secret_key, algorithms=['HS256'])
-        return payload.get('user_id')
-    except jwt.ExpiredSignatureError:
+    # Verified with the app's JWT settings; repeat calls with the same token hit a cache
+    claims = decode_bearer_token(token)
+    if not claims:
         return None
-    except jwt.InvalidTokenError:
+    try:
+        return int(claims['sub'])
+    except (KeyError, TypeError, ValueError):
         return None
 
 # Get all shopping list items
@@ -33,14 +35,33 @@ def get_shopping_list():
         user_id = get_user_id_from_token(request)
         
         # If user is authenticated, get only their items
+        query = select_fields(SHOPPING_LIST_FIELDS).order_by(ShoppingListItem.id)
         if user_id:
-            items = ShoppingListItem.query.filter_by(user_id=user_id).all()
-        else:
-            # Get all items if no user is authenticated (for development)
-            items = ShoppingListItem.query.all()
-        
-        items_list = [item.to_dict() for item in items]
-        return jsonify(items_list), 200
+            query = query.where(ShoppingListItem.user_id == user_id)
+        # Otherwise get all items (for development)
+
+        # The ETag is scoped to the caller because each user gets a different view
+        return conditional_list(
+            'shopping_list',
+            lambda: fast_jsonify(fetch_records(SHOPPING_LIST_FIELDS, query)),
+            user_id=user_id or None
+        )
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# Get shopping list changes since a cursor
+@shopping_list_routes.route('/shopping-list/changes', methods=['GET'])
+@cross_origin(supports_credentials=True)
+def get_shopping_list_changes():
+    """Items created, updated or deleted since the ?since= cursor (all items when it is omitted)"""
+    try:
+        user_id = get_user_id_from_token(request)
+        since = parse_cursor(request.args['since']) if request.args.get('since') else None
+        return fast_jsonify(changes_since('shopping_list', since, user_id))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except CursorExpired as e:
+        return jsonify({"error": str(e)}), 410
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
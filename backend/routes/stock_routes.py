@@ -1,29 +1,44 @@
 from flask import Blueprint, request, jsonify, current_app
 from db import db
-from models.stock import StockItem, Alert
+from models.stock import StockItem, Alert, CategoryThreshold
 from datetime import datetime
-from alerts import check_low_stock, check_expiration  # Import alert functions at the top
+from serialization import STOCK_FIELDS, ALERT_FIELDS, select_fields, fetch_records, fast_jsonify
+from alerts import run_alert_checks, alert_recipients  # Import alert functions at the top
+from change_tracking import conditional_list
+from quantities import apply_adjustments, parse_adjustments, parse_delta
 
 stock_routes = Blueprint('stock_routes', __name__)
 
+def valid_threshold(value, allow_none=False):
+    """Low stock thresholds are non-negative integers; None clears a stock item's own threshold."""
+    if value is None:
+        return allow_none
+    return isinstance(value, int) and not isinstance(value, bool) and value >= 0
+
 # Add a new stock item
 @stock_routes.route('/stock', methods=['POST'])
 def add_stock_item():
     """
     Add a new stock item to the database.
     """
-    data = request.get_json()
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "Request body must be a JSON object"}), 400
 
     # Validate required fields
     if not all(key in data for key in ['name', 'quantity', 'expiration_date']):
         return jsonify({"error": "Missing required fields (name, quantity, expiration_date)"}), 400
+    if not valid_threshold(data.get('low_stock_threshold'), allow_none=True):
+        return jsonify({"error": "low_stock_threshold must be a non-negative integer"}), 400
 
     try:
         # Create a new stock item
         new_item = StockItem(
             name=data['name'],
             quantity=data['quantity'],
-            expiration_date=datetime.strptime(data['expiration_date'], '%Y-%m-%d').date()
+            expiration_date=datetime.strptime(data['expiration_date'], '%Y-%m-%d').date(),
+            category=data.get('category'),
+            low_stock_threshold=data.get('low_stock_threshold')
         )
         db.session.add(new_item)
         db.session.commit()
@@ -39,14 +54,9 @@ def get_all_stock_items():
     Retrieve all stock items from the database.
     """
     try:
-        stock_items = StockItem.query.all()
-        stock_list = [{
-            "stock_id": item.stock_id,
-            "name": item.name,
-            "quantity": item.quantity,
-            "expiration_date": item.expiration_date.strftime('%Y-%m-%d')
-        } for item in stock_items]
-        return jsonify(stock_list), 200
+        return conditional_list('stock', lambda: fast_jsonify(
+            fetch_records(STOCK_FIELDS, select_fields(STOCK_FIELDS).order_by(StockItem.stock_id))
+        ))
     except Exception as e:
         return jsonify({"error": str(e)}), 500
     
@@ -60,6 +70,9 @@ def delete_stock_item(stock_id):
     try:
         item = StockItem.query.get(stock_id)
         if item:
+            # SQLite does not enforce the foreign key's ON DELETE CASCADE, and a reused
+            # stock_id would otherwise inherit the alerts
+            db.session.execute(db.delete(Alert).where(Alert.stock_id == stock_id))
             db.session.delete(item)
             db.session.commit()
             return jsonify({"message": f"Stock item {stock_id} deleted successfully!"}), 200
@@ -73,7 +86,12 @@ def update_stock_item(stock_id):
     """
     Update an existing stock item
     """
-    data = request.get_json()
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "Request body must be a JSON object"}), 400
+    if not valid_threshold(data.get('low_stock_threshold'), allow_none=True):
+        return jsonify({"error": "low_stock_threshold must be a non-negative integer"}), 400
+
     stock_item = StockItem.query.get(stock_id)
     
     if not stock_item:
@@ -86,6 +104,10 @@ def update_stock_item(stock_id):
             stock_item.quantity = data['quantity']
         if 'expiration_date' in data:
             stock_item.expiration_date = datetime.strptime(data['expiration_date'], '%Y-%m-%d').date()
+        if 'category' in data:
+            stock_item.category = data['category']
+        if 'low_stock_threshold' in data:
+            stock_item.low_stock_threshold = data['low_stock_threshold']
         
         db.session.commit()
         return jsonify({
@@ -93,7 +115,9 @@ def update_stock_item(stock_id):
             "stock_id": stock_item.stock_id,
             "name": stock_item.name,
             "quantity": stock_item.quantity,
-            "expiration_date": stock_item.expiration_date.strftime('%Y-%m-%d') if stock_item.expiration_date else None
+            "expiration_date": stock_item.expiration_date.strftime('%Y-%m-%d') if stock_item.expiration_date else None,
+            "category": stock_item.category,
+            "low_stock_threshold": stock_item.low_stock_threshold
         }), 200
     except ValueError as e:
         return jsonify({"error": "Invalid date format. Use YYYY-MM-DD"}), 400
@@ -101,6 +125,63 @@ def update_stock_item(stock_id):
         db.session.rollback()
         return jsonify({"error": str(e)}), 500
 
+# Adjust quantities by signed deltas
+@stock_routes.route('/stock/<int:stock_id>/adjust', methods=['PATCH'])
+def adjust_stock_item(stock_id):
+    """
+    Add a signed delta to a stock item's quantity: {"delta": -2}
+    """
+    return apply_adjustments(StockItem, 'stock_id', lambda data: {stock_id: parse_delta(data)})
+
+@stock_routes.route('/stock/adjust', methods=['PATCH'])
+def adjust_stock_items():
+    """
+    Apply a batch of deltas in one transaction: {"adjustments": [{"stock_id": 1, "delta": -2}, ...]}
+    """
+    return apply_adjustments(StockItem, 'stock_id', lambda data: parse_adjustments(data, 'stock_id'))
+
+
+# Per-category low stock thresholds
+@stock_routes.route('/stock/category-thresholds', methods=['GET'])
+def get_category_thresholds():
+    """
+    List the default low stock threshold of each category.
+    """
+    thresholds = CategoryThreshold.query.order_by(CategoryThreshold.category).all()
+    return jsonify([{"category": t.category, "threshold": t.threshold} for t in thresholds]), 200
+
+@stock_routes.route('/stock/category-thresholds/<category>', methods=['PUT'])
+def set_category_threshold(category):
+    """
+    Set the low stock threshold used by items of a category that have none of their own.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not valid_threshold(data.get('threshold')):
+        return jsonify({"error": "threshold must be a non-negative integer"}), 400
+
+    try:
+        entry = CategoryThreshold.query.get(category)
+        if entry:
+            entry.threshold = data['threshold']
+        else:
+            db.session.add(CategoryThreshold(category=category, threshold=data['threshold']))
+        db.session.commit()
+        return jsonify({"category": category, "threshold": data['threshold']}), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
+
+@stock_routes.route('/stock/category-thresholds/<category>', methods=['DELETE'])
+def delete_category_threshold(category):
+    """
+    Remove a category threshold; its items fall back to the global threshold.
+    """
+    entry = CategoryThreshold.query.get(category)
+    if not entry:
+        return jsonify({"error": "Category threshold not found"}), 404
+    db.session.delete(entry)
+    db.session.commit()
+    return jsonify({"message": f"Threshold for {category} removed"}), 200
 
 # Check for alerts
 @stock_routes.route('/alerts/check', methods=['POST'])
@@ -121,21 +202,18 @@ def check_alerts():
             return jsonify({"error": error_msg}), 500
 
         # Check if alert recipients are configured
-        if not current_app.config['ALERT_EMAIL_RECIPIENTS']:
+        if not alert_recipients():
             error_msg = "No alert recipients configured. Please set ALERT_EMAIL_RECIPIENTS in your .env file."
             print(error_msg)
             return jsonify({"error": error_msg}), 500
 
-        print("Checking for low stock alerts...")
-        check_low_stock()  # Check for low stock alerts
-        
-        print("Checking for expiration alerts...")
-        check_expiration()  # Check for expiration alerts
+        print("Checking for low stock and expiration alerts...")
+        sent = run_alert_checks()  # One digest per recipient for both checks
         
         print("Alert check completed successfully")
         return jsonify({
             "message": "Alerts checked successfully!",
-            "details": "Email alerts have been sent to configured recipients."
+            "details": f"{sent} alert email(s) queued for configured recipients."
         }), 200
     except Exception as e:
         error_msg = f"Error in check_alerts: {str(e)}"
@@ -156,12 +234,10 @@ def get_active_alerts():
     Retrieve all active alerts from the database.
     """
     try:
-        active_alerts = Alert.query.filter_by(is_active=True).all()
-        alert_list = [{
-            "alert_id": alert.alert_id,
-            "message": alert.message,
-            "created_at": alert.created_at.strftime('%Y-%m-%d %H:%M:%S')
-        } for alert in active_alerts]
-        return jsonify(alert_list), 200
+        return conditional_list('alerts', lambda: fast_jsonify(
+            fetch_records(ALERT_FIELDS, select_fields(ALERT_FIELDS).where(
+                Alert.is_active == True
+            ).order_by(Alert.alert_id))
+        ))
     except Exception as e:
         return jsonify({"error": str(e)}), 500
\ No newline at end of file
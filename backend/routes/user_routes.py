@@ -2,7 +2,7 @@
 from flask import Blueprint, request, jsonify, make_response
 from db import db
 from models.user import User
-from werkzeug.security import generate_password_hash
+from passwords import HasherBusy
 
 
 user_routes = Blueprint('user_routes', __name__)
@@ -38,14 +38,16 @@ def create_user():
     if User.query.filter_by(email=data['email']).first():
         return jsonify({"message": "Email already exists"}), 400
     
-    # Create new user
-    new_user = User(
-        username=data['username'],
-        email=data['email'],
-        password=data['password'],
-        role=data.get('role', 'user')
-    )
-    new_user.set_password(data['password'])
+    # Create new user (the constructor hashes the password)
+    try:
+        new_user = User(
+            username=data['username'],
+            email=data['email'],
+            password=data['password'],
+            role=data.get('role', 'user')
+        )
+    except HasherBusy:
+        return jsonify({"message": "Server is busy. Please try again shortly."}), 503
     
     try:
         db.session.add(new_user)
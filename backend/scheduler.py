@@ -1,25 +1,276 @@
-from flask_apscheduler import APScheduler
-from alerts import check_low_stock, check_expiration
+"""Scheduled jobs and the reminder dispatcher.
+
+APScheduler runs in every worker, but scheduled work only happens in the
+worker holding the scheduler lease (see jobs.py): alert shards (see
+alert_shards.py) run through the shared job history, and the reminder
+dispatcher runs only while this worker is the leader.
+
+Reminders are fired by ReminderDispatcher, a single thread that keeps the
+reminders due in the next REMINDER_WINDOW_MINUTES in a heap. The window is
+loaded with one range query on reminders.due_date; when it runs out the next
+window is loaded. The table is never scanned as a whole:
+
+- commits in this process that create, edit, complete or delete a reminder
+  update the heap directly (see the session hooks at the bottom);
+- writes made by other processes bump the 'reminders' collection version,
+  which the dispatcher checks every REMINDER_VERSION_CHECK_SECONDS with a
+  primary key lookup, reloading the window when it changed.
+
+Each notification is recorded in reminder_deliveries under (reminder_id,
+fire time) in the same transaction that queues its email, so a reminder is
+never sent twice for the same time, even across restarts. Reminders missed
+while the app was down are sent on start if they are at most
+REMINDER_CATCHUP_HOURS late. Due dates and times are read as UTC, like every
+other timestamp the app stores.
+"""
+import atexit
+import heapq
+import threading
+from datetime import datetime, time as dt_time, timedelta
+from functools import wraps
+from sqlalchemy import event, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from alert_shards import run_alert_shards
+from change_tracking import collection_version
+from db import db
 from extensions import scheduler
+from jobs import jobs
+from mail_outbox import outbox
+from models.reminder import Reminder
+from models.reminder_delivery import ReminderDelivery
+from models.user import User
+
+
+def with_app_context(app, func):
+    """Wrap a job so it runs inside an app context, as the alert checks need the database."""
+    @wraps(func)
+    def job(*args, **kwargs):
+        with app.app_context():
+            return func(*args, **kwargs)
+    return job
+
+
+def fire_time(due_date, reminder_time, default_time):
+    """When a reminder is due; reminders without a time fire at default_time on their due date."""
+    if isinstance(due_date, datetime):
+        due_date = due_date.date()
+    return datetime.combine(due_date, reminder_time or default_time)
+
+
+class ReminderDispatcher:
+    """Fire due reminders from an in-memory heap of the upcoming time window."""
+
+    def __init__(self, app=None):
+        self.app = None
+        self.default_time = dt_time(9, 0)
+        self._heap = []         # (fire_at, reminder_id); entries not matching _scheduled are stale
+        self._scheduled = {}    # reminder_id -> fire_at within the loaded window
+        self._window_end = None
+        self._version = None
+        self._lock = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        hour, minute = app.config['REMINDER_DEFAULT_TIME'].split(':')
+        self.default_time = dt_time(int(hour), int(minute))
+        app.extensions['reminder_dispatcher'] = self
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='reminder-dispatcher', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        with self._lock:
+            self._lock.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def notify(self, changes):
+        """Apply committed reminder changes, a dict of reminder_id -> fire time (None when it no longer fires)."""
+        with self._lock:
+            for reminder_id, fire_at in changes.items():
+                self._schedule(reminder_id, fire_at)
+            self._lock.notify()
+
+    def _schedule(self, reminder_id, fire_at):
+        if fire_at is None or self._window_end is None or fire_at > self._window_end:
+            self._scheduled.pop(reminder_id, None)
+            return
+        if self._scheduled.get(reminder_id) != fire_at:
+            self._scheduled[reminder_id] = fire_at
+            heapq.heappush(self._heap, (fire_at, reminder_id))
+
+    def load_window(self, now):
+        """Reload the heap with the undelivered reminders due between the catch-up horizon and the window end."""
+        start = now - timedelta(hours=self.app.config['REMINDER_CATCHUP_HOURS'])
+        end = now + timedelta(minutes=self.app.config['REMINDER_WINDOW_MINUTES'])
+        version = collection_version('reminders')
+
+        rows = db.session.query(Reminder.reminder_id, Reminder.due_date, Reminder.reminder_time).filter(
+            Reminder.due_date >= start.date(),
+            Reminder.due_date <= end.date(),
+            or_(Reminder.is_completed == False, Reminder.is_completed.is_(None)),
+        ).all()
+        delivered = set(db.session.query(ReminderDelivery.reminder_id, ReminderDelivery.fire_at).filter(
+            ReminderDelivery.fire_at >= start
+        ))
+        db.session.rollback()
+
+        with self._lock:
+            self._heap = []
+            self._scheduled = {}
+            self._window_end = end
+            self._version = version
+            for reminder_id, due_date, reminder_time in rows:
+                fire_at = fire_time(due_date, reminder_time, self.default_time)
+                if start <= fire_at <= end and (reminder_id, fire_at) not in delivered:
+                    self._scheduled[reminder_id] = fire_at
+                    self._heap.append((fire_at, reminder_id))
+            heapq.heapify(self._heap)
+        return len(self._scheduled)
+
+    def pop_due(self, now):
+        """Remove and return (reminder_id, fire_at) for every reminder due by now."""
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                fire_at, reminder_id = heapq.heappop(self._heap)
+                if self._scheduled.get(reminder_id) == fire_at:
+                    del self._scheduled[reminder_id]
+                    due.append((reminder_id, fire_at))
+        return due
+
+    def fire(self, reminder_id, fire_at):
+        """Record the delivery and queue the email in one transaction; returns False if it was already sent."""
+        row = db.session.query(Reminder.title, Reminder.reminder_text, Reminder.due_date, User.email).join(
+            User, User.user_id == Reminder.user_id
+        ).filter(
+            Reminder.reminder_id == reminder_id,
+            or_(Reminder.is_completed == False, Reminder.is_completed.is_(None)),
+        ).first()
+        if row is None:
+            db.session.rollback()
+            return False
+        title, text, due_date, email = row
+        try:
+            db.session.add(ReminderDelivery(reminder_id=reminder_id, fire_at=fire_at))
+            outbox.enqueue(
+                f"Reminder: {title}",
+                [email],
+                f"{text}\n\nDue: {fire_at.strftime('%Y-%m-%d %H:%M')}",
+                sender=self.app.config['MAIL_DEFAULT_SENDER']
+            )
+            db.session.commit()
+        except IntegrityError:
+            # Already delivered by another process
+            db.session.rollback()
+            return False
+        return True
+
+    def _next_wakeup(self, now):
+        check = now + timedelta(seconds=self.app.config['REMINDER_VERSION_CHECK_SECONDS'])
+        with self._lock:
+            wakeup = min(check, self._window_end)
+            if self._heap:
+                wakeup = min(wakeup, self._heap[0][0])
+        return max((wakeup - now).total_seconds(), 0)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                with self.app.app_context():
+                    now = datetime.utcnow()
+                    if self._window_end is None or now >= self._window_end or collection_version('reminders') != self._version:
+                        self.load_window(now)
+                    for reminder_id, fire_at in self.pop_due(now):
+                        if self.fire(reminder_id, fire_at):
+                            print(f"Reminder {reminder_id} sent for {fire_at}")
+                    db.session.remove()
+                    timeout = self._next_wakeup(datetime.utcnow())
+            except Exception as e:
+                print(f"Error in reminder dispatcher: {str(e)}")
+                timeout = self.app.config['REMINDER_VERSION_CHECK_SECONDS']
+            with self._lock:
+                if not self._stop.is_set():
+                    self._lock.wait(timeout)
+
+
+reminders = ReminderDispatcher()
+
+
+def follow_leadership(is_leader):
+    """Run the reminder dispatcher only in the leader."""
+    if is_leader:
+        reminders.start()
+    else:
+        reminders.stop()
+
 
 def init_scheduler(app):
     """Initialize the scheduler with the Flask app."""
+    jobs.init_app(app)
+    reminders.init_app(app)
+
+    # Alert checks run shard by shard across ALERT_WINDOW_HOURS; the job only runs the shards that are due
+    jobs.register('alert_shards', run_alert_shards, timedelta(minutes=app.config['ALERT_SHARD_POLL_MINUTES']))
+    jobs.on_leadership_change(follow_leadership)
+
     scheduler.init_app(app)
     scheduler.start()
-    
-    # Schedule daily alert checks
     scheduler.add_job(
-        id='check_stock_alerts',
-        func=check_low_stock,
+        id='leader_election',
+        func=with_app_context(app, jobs.elect),
         trigger='interval',
-        hours=24,
+        seconds=app.config['JOB_LEASE_RENEW_SECONDS'],
+        next_run_time=datetime.now(),  # APScheduler reads naive times in its local time zone
         replace_existing=True
     )
-    
     scheduler.add_job(
-        id='check_expiration_alerts',
-        func=check_expiration,
+        id='run_due_jobs',
+        func=with_app_context(app, jobs.run_due),
         trigger='interval',
-        hours=24,
+        seconds=app.config['JOB_TICK_SECONDS'],
         replace_existing=True
-    ) 
\ No newline at end of file
+    )
+    atexit.register(with_app_context(app, jobs.resign))
+
+
+def _reminder_fire_time(obj):
+    if obj.is_completed or obj.due_date is None:
+        return None
+    return fire_time(obj.due_date, obj.reminder_time, reminders.default_time)
+
+
+@event.listens_for(Session, 'after_flush')
+def track_reminder_changes(session, flush_context):
+    changes = {}
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, Reminder):
+            changes[obj.reminder_id] = _reminder_fire_time(obj)
+    for obj in session.deleted:
+        if isinstance(obj, Reminder):
+            changes[obj.reminder_id] = None
+    if changes:
+        session.info.setdefault('reminder_changes', {}).update(changes)
+
+
+@event.listens_for(Session, 'after_commit')
+def notify_reminder_changes(session):
+    changes = session.info.pop('reminder_changes', None)
+    if changes and reminders.app is not None:
+        reminders.notify(changes)
+
+
+@event.listens_for(Session, 'after_rollback')
+def discard_reminder_changes(session):
+    session.info.pop('reminder_changes', None)
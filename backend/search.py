@@ -0,0 +1,189 @@
+"""Indexed item search.
+
+Every item's name, category and location are broken into lowercase trigrams
+stored in item_trigrams, and the words of its name into item_terms. Both are
+kept in sync from an after_flush hook, so searches are index lookups on those
+tables instead of a LIKE scan over Items:
+
+* substring search: items holding every trigram of the query, confirmed
+  with a substring check on that candidate set only;
+* fuzzy search: items holding at least SEARCH_MIN_SIMILARITY of the query's
+  trigrams, ranked by how many they hold;
+* autocomplete: a range scan over item_terms for words starting with a prefix.
+"""
+import math
+import re
+from sqlalchemy import event, func, inspect, or_
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import get_history
+from db import db
+from models.item import Item
+from models.search_index import ItemTrigram, ItemTerm
+
+INDEXED_FIELDS = ('item_name', 'category', 'location')
+TERM_MAX_LENGTH = 255
+
+trigram_table = ItemTrigram.__table__
+term_table = ItemTerm.__table__
+
+
+def normalize(text):
+    """Lowercase and collapse whitespace."""
+    return ' '.join((text or '').lower().split())
+
+
+def trigrams(text):
+    """Return the set of trigrams of a normalized string."""
+    text = normalize(text)
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def terms(text):
+    """Return the distinct words of a string, lowercased."""
+    return {word[:TERM_MAX_LENGTH] for word in re.findall(r'\w+', normalize(text))}
+
+
+def prefix_upper_bound(prefix):
+    """Smallest string greater than every string starting with prefix."""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def reindex_items(connection, rows):
+    """
+    Replace the index entries for the given items.
+
+    rows are (item_id, user_id, item_name, category, location) tuples. The call
+    is idempotent, so it is safe for bulk loaders to re-run it over a range.
+    """
+    rows = list(rows)
+    if not rows:
+        return
+    unindex_items(connection, [row[0] for row in rows])
+
+    trigram_rows, term_rows = [], []
+    for item_id, user_id, item_name, category, location in rows:
+        grams = set()
+        for value in (item_name, category, location):
+            grams |= trigrams(value)
+        trigram_rows.extend({'trigram': gram, 'user_id': user_id, 'item_id': item_id} for gram in grams)
+        term_rows.extend({'term': term, 'user_id': user_id, 'item_id': item_id} for term in terms(item_name))
+
+    if trigram_rows:
+        connection.execute(trigram_table.insert(), trigram_rows)
+    if term_rows:
+        connection.execute(term_table.insert(), term_rows)
+
+
+def unindex_items(connection, item_ids):
+    """Remove the index entries for the given item ids."""
+    item_ids = list(item_ids)
+    if not item_ids:
+        return
+    connection.execute(trigram_table.delete().where(trigram_table.c.item_id.in_(item_ids)))
+    connection.execute(term_table.delete().where(term_table.c.item_id.in_(item_ids)))
+
+
+def _index_row(item):
+    return (item.item_id, item.user_id, item.item_name, item.category, item.location)
+
+
+@event.listens_for(Session, 'after_flush')
+def track_item_changes(session, flush_context):
+    """Keep the search index in step with Item writes from this flush."""
+    changed, removed = [], []
+    for obj in session.new:
+        if isinstance(obj, Item):
+            changed.append(_index_row(obj))
+    for obj in session.dirty:
+        if isinstance(obj, Item) and any(
+            get_history(obj, field).has_changes() for field in INDEXED_FIELDS + ('user_id',)
+        ):
+            changed.append(_index_row(obj))
+    for obj in session.deleted:
+        if isinstance(obj, Item):
+            removed.append(inspect(obj).identity[0])
+
+    if changed or removed:
+        connection = session.connection()
+        unindex_items(connection, removed)
+        reindex_items(connection, changed)
+
+
+def search_items(query, user_id=None, fuzzy=False, limit=20, offset=0, min_similarity=0.5):
+    """
+    Search items by name, category or location.
+
+    Returns a list of (Item, score) ranked best first, where score is the share
+    of the query's trigrams the item contains. Queries shorter than three
+    characters have no trigrams and fall back to a word-prefix lookup.
+    """
+    text = normalize(query)
+    grams = trigrams(text)
+    if not grams:
+        return [(item, 1.0) for item in _prefix_items(text, user_id, limit, offset)]
+
+    min_hits = len(grams) if not fuzzy else max(1, math.ceil(len(grams) * min_similarity))
+    hits = func.count(ItemTrigram.trigram).label('hits')
+    candidates = db.session.query(ItemTrigram.item_id, hits).filter(ItemTrigram.trigram.in_(grams))
+    if user_id is not None:
+        candidates = candidates.filter(ItemTrigram.user_id == user_id)
+    candidates = candidates.group_by(ItemTrigram.item_id).having(hits >= min_hits).subquery()
+
+    results = db.session.query(Item, candidates.c.hits).join(
+        candidates, Item.item_id == candidates.c.item_id
+    )
+    if not fuzzy:
+        # Holding every trigram does not guarantee they are contiguous
+        results = results.filter(or_(*[
+            func.lower(getattr(Item, field)).contains(text, autoescape=True) for field in INDEXED_FIELDS
+        ]))
+    results = results.order_by(candidates.c.hits.desc(), Item.item_id).offset(offset).limit(limit)
+    return [(item, round(item_hits / len(grams), 3)) for item, item_hits in results]
+
+
+def _prefix_items(prefix, user_id, limit, offset):
+    if not prefix:
+        return []
+    item_ids = db.session.query(ItemTerm.item_id).filter(
+        ItemTerm.term >= prefix, ItemTerm.term < prefix_upper_bound(prefix)
+    )
+    if user_id is not None:
+        item_ids = item_ids.filter(ItemTerm.user_id == user_id)
+    return Item.query.filter(Item.item_id.in_(item_ids)).order_by(
+        Item.item_name, Item.item_id
+    ).offset(offset).limit(limit).all()
+
+
+def autocomplete(prefix, user_id=None, limit=10):
+    """Return up to limit distinct item names containing a word that starts with prefix."""
+    prefix = normalize(prefix)
+    if not prefix:
+        return []
+    query = db.session.query(Item.item_name).join(
+        ItemTerm, ItemTerm.item_id == Item.item_id
+    ).filter(ItemTerm.term >= prefix, ItemTerm.term < prefix_upper_bound(prefix))
+    if user_id is not None:
+        query = query.filter(ItemTerm.user_id == user_id)
+    return [name for name, in query.distinct().order_by(Item.item_name).limit(limit)]
+
+
+def rebuild_search_index(batch_size=1000):
+    """Re-index every item in item_id order, committing once per batch."""
+    last_id, indexed = 0, 0
+    while True:
+        rows = db.session.query(
+            Item.item_id, Item.user_id, Item.item_name, Item.category, Item.location
+        ).filter(Item.item_id > last_id).order_by(Item.item_id).limit(batch_size).all()
+        if not rows:
+            return indexed
+        reindex_items(db.session.connection(), rows)
+        db.session.commit()
+        last_id = rows[-1].item_id
+        indexed += len(rows)
+
+
+if __name__ == '__main__':
+    from app import create_app
+
+    with create_app().app_context():
+        print(f"Indexed {rebuild_search_index()} items")
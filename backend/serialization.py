@@ -0,0 +1,133 @@
+"""Fast serialization of list responses.
+
+List endpoints select only the columns they return as plain row tuples rather
+than hydrating ORM objects, format date/time columns once per distinct value
+instead of once per row, and encode with orjson when it is installed.
+"""
+import json
+from flask import current_app
+from db import db
+from models.item import Item
+from models.stock import StockItem, Alert
+from models.reminder import Reminder
+from models.shopping_list import ShoppingListItem
+
+try:
+    import orjson
+except ImportError:  # Optional dependency; the standard library encoder is used instead
+    orjson = None
+
+
+def date_value(value):
+    return value.strftime('%Y-%m-%d') if value else None
+
+def time_value(value):
+    return value.strftime('%H:%M:%S') if value else None
+
+def timestamp_value(value):
+    return value.strftime('%Y-%m-%d %H:%M:%S') if value else None
+
+def iso_value(value):
+    return value.isoformat() if value else None
+
+
+# (field name, column, formatter) in output order; the formats match each model's existing responses
+ITEM_FIELDS = [
+    ("item_id", Item.item_id, None),
+    ("user_id", Item.user_id, None),
+    ("item_name", Item.item_name, None),
+    ("category", Item.category, None),
+    ("quantity", Item.quantity, None),
+    ("location", Item.location, None),
+    ("purchase_date", Item.purchase_date, date_value),
+    ("expiry_date", Item.expiry_date, date_value),
+]
+
+STOCK_FIELDS = [
+    ("stock_id", StockItem.stock_id, None),
+    ("name", StockItem.name, None),
+    ("quantity", StockItem.quantity, None),
+    ("expiration_date", StockItem.expiration_date, date_value),
+    ("category", StockItem.category, None),
+    ("low_stock_threshold", StockItem.low_stock_threshold, None),
+]
+
+ALERT_FIELDS = [
+    ("alert_id", Alert.alert_id, None),
+    ("stock_id", Alert.stock_id, None),
+    ("kind", Alert.kind, None),
+    ("message", Alert.message, None),
+    ("created_at", Alert.created_at, timestamp_value),
+]
+
+REMINDER_FIELDS = [
+    ("reminder_id", Reminder.reminder_id, None),
+    ("title", Reminder.title, None),
+    ("user_id", Reminder.user_id, None),
+    ("reminder_text", Reminder.reminder_text, None),
+    ("due_date", Reminder.due_date, date_value),
+    ("reminder_time", Reminder.reminder_time, time_value),
+    ("is_completed", Reminder.is_completed, None),
+    ("created_at", Reminder.created_at, timestamp_value),
+    ("updated_at", Reminder.updated_at, timestamp_value),
+]
+
+SHOPPING_LIST_FIELDS = [
+    ("id", ShoppingListItem.id, None),
+    ("name", ShoppingListItem.name, None),
+    ("quantity", ShoppingListItem.quantity, None),
+    ("unit", ShoppingListItem.unit, None),
+    ("category", ShoppingListItem.category, None),
+    ("priority", ShoppingListItem.priority, None),
+    ("purchased", ShoppingListItem.purchased, None),
+    ("notes", ShoppingListItem.notes, None),
+    ("created_at", ShoppingListItem.created_at, iso_value),
+    ("updated_at", ShoppingListItem.updated_at, iso_value),
+]
+
+
+def select_fields(fields):
+    """Build a SELECT of just the columns in a field spec."""
+    return db.select(*[column for _, column, _ in fields])
+
+
+def format_rows(fields, rows):
+    """
+    Turn row tuples into lists of output values.
+
+    Formatted columns go through a per-call cache, so a date shared by many
+    rows is converted to a string only once.
+    """
+    formatters = [(index, formatter, {}) for index, (_, _, formatter) in enumerate(fields) if formatter]
+    rows = [list(row) for row in rows]
+    for index, formatter, cache in formatters:
+        for row in rows:
+            value = row[index]
+            try:
+                row[index] = cache[value]
+            except KeyError:
+                row[index] = cache[value] = formatter(value)
+    return rows
+
+
+def to_records(fields, rows):
+    """Turn row tuples into a list of dicts keyed by field name."""
+    names = [name for name, _, _ in fields]
+    return [dict(zip(names, row)) for row in format_rows(fields, rows)]
+
+
+def fetch_records(fields, query):
+    """Execute a SELECT built from select_fields() and return its rows as dicts."""
+    return to_records(fields, db.session.execute(query))
+
+
+def dumps(payload):
+    """Encode a JSON payload to bytes."""
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, separators=(',', ':')).encode('utf-8')
+
+
+def fast_jsonify(payload, status=200):
+    """Like flask.jsonify, using orjson when available."""
+    return current_app.response_class(dumps(payload), status=status, mimetype='application/json')
@@ -0,0 +1,142 @@
+"""Delta sync ("changes since") for the shopping list and reminders.
+
+Clients keep the cursor from their last sync and ask for what changed since
+then: rows created or updated at or after the cursor, and the ids of rows
+deleted since. Deletions are recorded as tombstones by a flush hook, and are
+kept for SYNC_TOMBSTONE_RETENTION_DAYS; a cursor older than that gets a 410
+and the client falls back to a full download.
+
+The cursor is the server time, rounded down to the second, taken before the
+rows are read. The comparison is inclusive, so a row written in the same
+second as a sync is sent again on the next one, and the window is widened
+by SYNC_CURSOR_OVERLAP_SECONDS to cover clock differences between workers
+and transactions that commit a little after stamping their rows. Clients
+apply deletions first and then upsert the changed rows by id, which makes
+these repeats harmless.
+"""
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from db import db
+from models.reminder import Reminder
+from models.shopping_list import ShoppingListItem
+from models.tombstone import Tombstone
+from replicas import use_primary
+from serialization import SHOPPING_LIST_FIELDS, REMINDER_FIELDS, select_fields, fetch_records
+
+tombstone_table = Tombstone.__table__
+
+# clock is where updated_at values come from: 'app' (datetime.utcnow) or 'db' (CURRENT_TIMESTAMP)
+SyncCollection = namedtuple('SyncCollection', ['model', 'primary_key', 'fields', 'clock'])
+
+SYNC_COLLECTIONS = {
+    'shopping_list': SyncCollection(ShoppingListItem, ShoppingListItem.id, SHOPPING_LIST_FIELDS, 'app'),
+    'reminders': SyncCollection(Reminder, Reminder.reminder_id, REMINDER_FIELDS, 'db'),
+}
+
+COLLECTION_BY_MODEL = {spec.model: name for name, spec in SYNC_COLLECTIONS.items()}
+
+CURSOR_FORMAT = '%Y-%m-%dT%H:%M:%S'
+
+_last_purge = 0
+
+
+class CursorExpired(Exception):
+    """Raised when a since cursor is older than the tombstone retention."""
+
+
+def parse_cursor(value):
+    """Parse a since cursor; accepts the cursor format and plain ISO 8601 timestamps."""
+    try:
+        since = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        raise ValueError(f"Invalid since cursor: {value}")
+    if since.tzinfo is not None:
+        since = since.astimezone(timezone.utc).replace(tzinfo=None)
+    return since
+
+
+def current_time(clock):
+    """Current UTC time from the app or the database (the mysql engine profile sets the session to UTC)."""
+    if clock == 'db':
+        return db.session.execute(db.select(db.func.current_timestamp())).scalar()
+    return datetime.utcnow()
+
+
+def changes_since(collection, since=None, user_id=None):
+    """
+    Return the changes of one collection since a cursor.
+
+    Without since every row is returned, which is how a client starts syncing.
+    """
+    spec = SYNC_COLLECTIONS[collection]
+    # A lagging replica would hide rows written before the cursor from every later sync
+    use_primary()
+    # The expiry check and the cursor use the clock the collection's rows are stamped with
+    now = current_time(spec.clock)
+    retention = timedelta(days=current_app.config['SYNC_TOMBSTONE_RETENTION_DAYS'])
+    if since is not None and since < now - retention:
+        raise CursorExpired("Cursor is older than the deletion history; download the full collection")
+
+    cursor = now.replace(microsecond=0)
+    if since is not None:
+        since = since - timedelta(seconds=current_app.config['SYNC_CURSOR_OVERLAP_SECONDS'])
+
+    query = select_fields(spec.fields).order_by(spec.primary_key)
+    if user_id is not None:
+        query = query.where(spec.model.user_id == user_id)
+    if since is not None:
+        query = query.where(spec.model.updated_at >= since)
+    changes = fetch_records(spec.fields, query)
+
+    deleted = []
+    if since is not None:
+        tombstones = db.select(Tombstone.row_id).where(
+            Tombstone.collection == collection, Tombstone.deleted_at >= since
+        ).order_by(Tombstone.tombstone_id)
+        if user_id is not None:
+            tombstones = tombstones.where(Tombstone.user_id == user_id)
+        deleted = list(db.session.execute(tombstones).scalars())
+
+    return {
+        "changes": changes,
+        "deleted": deleted,
+        "cursor": cursor.strftime(CURSOR_FORMAT),
+    }
+
+
+def purge_tombstones(connection, before):
+    """Delete tombstones recorded before the given time."""
+    return connection.execute(tombstone_table.delete().where(tombstone_table.c.deleted_at < before)).rowcount
+
+
+@event.listens_for(Session, 'after_flush')
+def record_deletions(session, flush_context):
+    global _last_purge
+    rows = []
+    for obj in session.deleted:
+        collection = COLLECTION_BY_MODEL.get(type(obj))
+        if collection is None:
+            continue
+        spec = SYNC_COLLECTIONS[collection]
+        rows.append({
+            'collection': collection,
+            'row_id': getattr(obj, spec.primary_key.key),
+            'user_id': obj.user_id,
+            'deleted_at': datetime.utcnow() if spec.clock == 'app' else db.func.current_timestamp(),
+        })
+    if not rows:
+        return
+
+    connection = session.connection()
+    for row in rows:
+        connection.execute(tombstone_table.insert().values(**row))
+
+    # Expired tombstones are purged in bulk, at most once an hour per process
+    if has_app_context() and time.monotonic() - _last_purge >= 3600:
+        _last_purge = time.monotonic()
+        retention = timedelta(days=current_app.config['SYNC_TOMBSTONE_RETENTION_DAYS'])
+        purge_tombstones(connection, datetime.utcnow() - retention)
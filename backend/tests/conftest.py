@@ -0,0 +1,52 @@
+"""Shared fixtures: apps backed by throwaway SQLite files."""
+import os
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault('SCHEDULER_ENABLED', '0')
+os.environ.setdefault('MAIL_OUTBOX_WORKERS', '0')
+os.environ.setdefault('PASSWORD_HASH_WORKERS', '0')
+
+from app import create_app  # noqa: E402
+import identity  # noqa: E402
+
+
+@pytest.fixture
+def make_app(tmp_path):
+    """Return a factory for apps on tmp_path/primary.db, optionally with a replica file."""
+    def make(replica=None, **config):
+        settings = {
+            'TESTING': True,
+            'JWT_SECRET_KEY': 'test-secret-key-that-is-long-enough-for-hs256',
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'primary.db'}",
+            'MIGRATE_ON_START': True,
+            'SCHEDULER_ENABLED': False,
+            'MAIL_OUTBOX_WORKERS': 0,
+            'PASSWORD_HASH_WORKERS': 0,
+        }
+        if replica:
+            url = f"sqlite:///{tmp_path / replica}"
+            settings.update(DATABASE_REPLICA_URL=url, SQLALCHEMY_BINDS={'replica': url})
+        settings.update(config)
+        return create_app(settings)
+
+    identity.user_cache.clear()
+    identity.token_cache.clear()
+    yield make
+    identity.user_cache.clear()
+    identity.token_cache.clear()
+
+
+@pytest.fixture
+def copy_database(tmp_path):
+    """Return a function copying tmp_path/primary.db to another file, including its WAL contents."""
+    def copy(target):
+        src, dst = sqlite3.connect(tmp_path / 'primary.db'), sqlite3.connect(tmp_path / target)
+        src.backup(dst)
+        src.close()
+        dst.close()
+    return copy
@@ -0,0 +1,80 @@
+"""Sharded alert evaluation: checkpoints, catch-up and failing shards."""
+from datetime import date, datetime, timedelta
+
+import pytest
+
+import alert_shards
+from alert_shards import run_alert_shards
+from db import db
+from models.alert_cycle import AlertCycle
+from models.stock import StockItem, Alert
+
+START = datetime(2030, 1, 1)
+
+
+@pytest.fixture
+def app(make_app):
+    app = make_app(ALERT_SHARDS=4, ALERT_WINDOW_HOURS=4, ALERT_JITTER_MINUTES=0,
+                   ALERT_MAX_SHARDS_PER_POLL=2, ALERT_SHARD_MAX_ATTEMPTS=2)
+    with app.app_context():
+        # One low stock item per shard: ids 1..8 give shards of 3 ids
+        db.session.add_all([
+            StockItem(name=f'item {n}', quantity=0, expiration_date=date(2031, 1, 1)) for n in range(8)
+        ])
+        db.session.commit()
+        yield app
+
+
+def cycle():
+    return db.session.query(AlertCycle).one()
+
+
+def alerted_stock():
+    return sorted(stock_id for stock_id, in db.session.query(Alert.stock_id))
+
+
+def test_shards_run_when_due_and_resume_from_the_checkpoint(app):
+    assert run_alert_shards(START) == 1
+    assert cycle().next_shard == 1
+    assert alerted_stock() == [1, 2]
+
+    # Shard 2 is due an hour into the window
+    assert run_alert_shards(START + timedelta(minutes=30)) == 0
+    assert run_alert_shards(START + timedelta(hours=1)) == 1
+    assert cycle().next_shard == 2
+    assert alerted_stock() == [1, 2, 3, 4, 5]
+
+
+def test_overdue_shards_are_caught_up_a_few_per_poll(app):
+    run_alert_shards(START)
+    late = START + timedelta(hours=10)
+
+    assert run_alert_shards(late) == 2
+    assert cycle().next_shard == 3
+    assert cycle().completed_at is None
+    assert run_alert_shards(late) == 1
+    assert cycle().completed_at is not None
+    assert alerted_stock() == list(range(1, 9))
+
+
+def test_failing_shard_is_retried_then_skipped(app, monkeypatch):
+    run_alert_shards(START)
+    check_low_stock = alert_shards.check_low_stock
+
+    def broken_second_shard(stock_range, **kwargs):
+        if stock_range[0] == 3:
+            raise RuntimeError("boom")
+        return check_low_stock(stock_range=stock_range, **kwargs)
+
+    monkeypatch.setattr(alert_shards, 'check_low_stock', broken_second_shard)
+    late = START + timedelta(hours=10)
+
+    assert run_alert_shards(late) == 0
+    assert (cycle().next_shard, cycle().failed_attempts) == (1, 1)
+
+    assert run_alert_shards(late) == 0
+    assert (cycle().next_shard, cycle().failed_attempts) == (2, 0)
+
+    assert run_alert_shards(late) == 2
+    assert cycle().completed_at is not None
+    assert alerted_stock() == [1, 2, 6, 7, 8]
@@ -0,0 +1,80 @@
+"""Collection versions and conditional list responses."""
+from datetime import date
+
+import pytest
+
+from db import db
+from models.reminder import Reminder
+from models.stock import StockItem
+from models.user import User
+
+
+@pytest.fixture
+def app(make_app):
+    app = make_app()
+    with app.app_context():
+        users = [User(f'user{n}', f'user{n}@example.com', 'secret') for n in (1, 2)]
+        db.session.add_all(users)
+        db.session.commit()
+        app.user_ids = [user.user_id for user in users]
+        yield app
+
+
+def add_reminder(user_id, title='water plants'):
+    db.session.add(Reminder(user_id=user_id, title=title, reminder_text='', due_date=date(2030, 1, 1)))
+    db.session.commit()
+
+
+def get(client, url, etag=None):
+    return client.get(url, headers={'If-None-Match': etag} if etag else {})
+
+
+def test_unchanged_list_is_not_modified_until_a_write(app):
+    first, _ = app.user_ids
+    client = app.test_client()
+    url = f'/reminders?user_id={first}'
+
+    etag = get(client, url).headers['ETag']
+    assert get(client, url, etag).status_code == 304
+
+    add_reminder(first)
+    response = get(client, url, etag)
+    assert response.status_code == 200
+    assert [reminder['title'] for reminder in response.get_json()] == ['water plants']
+    assert get(client, url, response.headers['ETag']).status_code == 304
+
+
+def test_a_write_leaves_other_users_etags_alone(app):
+    first, second = app.user_ids
+    client = app.test_client()
+    etags = {user_id: get(client, f'/reminders?user_id={user_id}').headers['ETag'] for user_id in app.user_ids}
+    all_etag = get(client, '/reminders').headers['ETag']
+
+    add_reminder(second)
+
+    assert get(client, f'/reminders?user_id={first}', etags[first]).status_code == 304
+    assert get(client, f'/reminders?user_id={second}', etags[second]).status_code == 200
+    assert get(client, '/reminders', all_etag).status_code == 200
+
+
+def test_bulk_statements_invalidate_every_view(app):
+    first, _ = app.user_ids
+    add_reminder(first)
+    client = app.test_client()
+    url = f'/reminders?user_id={first}'
+    etag = get(client, url).headers['ETag']
+
+    db.session.execute(db.update(Reminder).values(is_completed=True))
+    db.session.commit()
+
+    assert get(client, url, etag).status_code == 200
+
+
+def test_stock_etag_changes_on_write(app):
+    client = app.test_client()
+    etag = get(client, '/stock').headers['ETag']
+
+    db.session.add(StockItem(name='flour', quantity=1, expiration_date=date(2030, 1, 1)))
+    db.session.commit()
+
+    assert get(client, '/stock', etag).status_code == 200
@@ -0,0 +1,36 @@
+"""Engine profile selection."""
+import pytest
+
+from db import db, engine_profile_name, mysql_profile
+
+
+def test_sqlite_profile_applies_pragmas(make_app):
+    app = make_app(SQLITE_BUSY_TIMEOUT_MS=1234)
+    assert app.extensions['db_engine_profile'] == 'sqlite'
+    with app.app_context():
+        assert db.session.execute(db.text('PRAGMA journal_mode')).scalar() == 'wal'
+        assert db.session.execute(db.text('PRAGMA busy_timeout')).scalar() == 1234
+        assert db.session.execute(db.text('PRAGMA synchronous')).scalar() == 1  # NORMAL
+
+
+def test_explicit_engine_options_take_precedence(make_app):
+    app = make_app(SQLALCHEMY_ENGINE_OPTIONS={'connect_args': {'timeout': 1}, 'echo_pool': True})
+    assert app.config['SQLALCHEMY_ENGINE_OPTIONS'] == {'connect_args': {'timeout': 1}, 'echo_pool': True}
+    with app.app_context():
+        # Pragmas still apply; they are not engine options
+        assert db.session.execute(db.text('PRAGMA journal_mode')).scalar() == 'wal'
+
+
+def test_profile_names(make_app):
+    app = make_app()
+    config = dict(app.config, SQLALCHEMY_DATABASE_URI='mysql+pymysql://user:pw@db/app')
+    assert engine_profile_name(config) == 'mysql'
+    assert engine_profile_name(dict(config, SQLALCHEMY_DATABASE_URI='postgresql://db/app')) == 'default'
+    assert engine_profile_name(dict(config, DB_ENGINE_PROFILE='sqlite')) == 'sqlite'
+    with pytest.raises(ValueError):
+        engine_profile_name(dict(config, DB_ENGINE_PROFILE='oracle'))
+
+    options, pragmas = mysql_profile(dict(config, DB_POOL_SIZE=3))
+    assert options['pool_size'] == 3
+    assert options['connect_args']['init_command'] == "SET time_zone = '+00:00'"
+    assert pragmas == []
@@ -0,0 +1,70 @@
+"""Cached user lookups and token verification."""
+from datetime import timedelta
+
+from flask_jwt_extended import create_access_token
+
+from db import db
+from models.user import User
+import cache
+import identity
+
+
+def test_ttl_cache_evicts_least_recently_used_and_expired_entries(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(cache.time, 'monotonic', lambda: now[0])
+    entries = cache.TTLCache(maxsize=2, ttl=10)
+
+    entries.set('a', 1)
+    entries.set('b', 2)
+    assert entries.get('a') == 1
+    entries.set('c', 3)
+    assert entries.get('b') is None
+    assert entries.get('a') == 1
+
+    now[0] += 10
+    assert entries.get('a') is None
+    assert entries.get('c') is None
+    assert len(entries) == 0
+
+
+def test_user_records_are_cached_until_the_user_changes(make_app):
+    app = make_app()
+    with app.app_context():
+        user = User('frank', 'frank@example.com', 'secret')
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.user_id
+
+        assert identity.load_user(user_id).email == 'frank@example.com'
+        # Writes that bypass the session are not seen until the entry expires
+        db.session.execute(
+            db.update(User.__table__).where(User.__table__.c.user_id == user_id).values(email='old@example.com')
+        )
+        db.session.commit()
+        assert identity.load_user(user_id).email == 'frank@example.com'
+
+        user.email = 'new@example.com'
+        db.session.commit()
+        assert identity.load_user(user_id).email == 'new@example.com'
+
+        db.session.delete(user)
+        db.session.commit()
+        assert identity.load_user(user_id) is None
+
+
+def test_verified_tokens_are_cached_until_they_expire(make_app, monkeypatch):
+    app = make_app()
+    with app.app_context():
+        token = create_access_token(identity='7', expires_delta=timedelta(minutes=5))
+        assert identity.decode_bearer_token(token)['sub'] == '7'
+        assert identity.decode_bearer_token(token + 'x') is None
+
+        calls = []
+        monkeypatch.setattr(identity, 'decode_token', lambda token: calls.append(token))
+        assert identity.decode_bearer_token(token)['sub'] == '7'
+        assert calls == []
+
+        expired = create_access_token(identity='7', expires_delta=timedelta(seconds=-1))
+        monkeypatch.undo()
+        assert identity.decode_bearer_token(expired) is None
+        assert len(identity.token_cache) == 1
@@ -0,0 +1,81 @@
+"""Streamed CSV and NDJSON imports."""
+from db import db
+from models.stock import StockItem
+
+HEADER = b'name,quantity,expiration_date\n'
+
+
+def stock_rows(count):
+    return b''.join(b'item %d,1,2030-01-01\n' % n for n in range(count))
+
+
+def import_stock(app, body, fmt='csv'):
+    return app.test_client().post(f'/api/import/stock?format={fmt}', data=body)
+
+
+def test_csv_import(make_app):
+    app = make_app()
+
+    response = import_stock(app, HEADER + stock_rows(3) + b'bad,x,2030-01-01\n')
+
+    assert response.status_code == 200
+    assert response.get_json()['inserted'] == 3
+    assert response.get_json()['errors'] == [{'line': 5, 'error': 'Invalid integer for quantity'}]
+
+
+def test_invalid_utf8_ends_the_import_with_an_error(make_app):
+    app = make_app(IMPORT_BATCH_SIZE=10, IMPORT_BATCHES_PER_TRANSACTION=1)
+    # Well past the stream decoder's first chunk, so earlier batches are already committed
+    body = HEADER + stock_rows(1000) + b'caf\xe9,1,2030-01-01\n' + stock_rows(5)
+
+    response = import_stock(app, body)
+
+    assert response.status_code == 200
+    result = response.get_json()
+    assert result['failed'] == 1
+    assert 'could not be read' in result['errors'][-1]['error']
+    with app.app_context():
+        assert db.session.query(StockItem).count() == result['inserted'] > 0
+
+
+def test_unparseable_csv_ends_the_import_with_an_error(make_app):
+    app = make_app()
+    body = HEADER + stock_rows(2) + b'"' + b'x' * 200000 + b'",1,2030-01-01\n'
+
+    response = import_stock(app, body)
+
+    assert response.status_code == 200
+    result = response.get_json()
+    assert result['inserted'] == 2
+    assert result['errors'] == [{'line': 4, 'error': result['errors'][0]['error']}]
+    assert 'field larger than field limit' in result['errors'][0]['error']
+
+
+def test_invalid_utf8_in_ndjson_ends_the_import_with_an_error(make_app):
+    app = make_app()
+    body = b'{"name": "flour", "quantity": 1, "expiration_date": "2030-01-01"}\n\xff\xfe\n'
+
+    response = import_stock(app, body, fmt='ndjson')
+
+    assert response.status_code == 200
+    assert response.get_json()['failed'] == 1
+
+
+def test_stock_thresholds_and_categories_are_validated(make_app):
+    app = make_app()
+    body = (b'name,quantity,expiration_date,category,low_stock_threshold\n'
+            b'flour,1,2030-01-01,baking,-3\n'
+            b'sugar,1,2030-01-01,' + b'x' * 51 + b',2\n'
+            b'salt,1,2030-01-01,,\n'
+            b'rice,1,2030-01-01,grains,0\n')
+
+    response = import_stock(app, body)
+
+    result = response.get_json()
+    assert result['inserted'] == 2
+    assert [error['line'] for error in result['errors']] == [2, 3]
+    assert 'low_stock_threshold' in result['errors'][0]['error']
+    assert 'category' in result['errors'][1]['error']
+    with app.app_context():
+        rows = db.session.query(StockItem.name, StockItem.category, StockItem.low_stock_threshold)
+        assert sorted(rows) == [('rice', 'grains', 0), ('salt', None, None)]
@@ -0,0 +1,106 @@
+"""Incrementally maintained dashboard counters."""
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy.dialects import mysql
+
+from db import db
+from item_stats import aggregate_item_stats, get_item_stats, rebuild_item_stats, stats_table
+from models.item import Item
+from models.item_stats import ItemStat
+from models.user import User
+
+TODAY = date(2030, 6, 1)
+
+
+@pytest.fixture
+def user_id(make_app):
+    app = make_app()
+    with app.app_context():
+        user = User('carol', 'carol@example.com', 'secret')
+        db.session.add(user)
+        db.session.commit()
+        yield user.user_id
+
+
+def add_item(user_id, location='pantry', expiry_date=None):
+    item = Item(item_name='beans', category='food', quantity=1, location=location,
+                expiry_date=expiry_date, user_id=user_id)
+    db.session.add(item)
+    db.session.commit()
+    return item
+
+
+def counters(user_id):
+    return {(kind, key): count for kind, key, count in db.session.query(
+        ItemStat.kind, ItemStat.key, ItemStat.count).filter(ItemStat.user_id == user_id)}
+
+
+def test_counters_follow_item_changes(user_id):
+    assert get_item_stats(user_id, TODAY)['total_items'] == 0
+    soon = add_item(user_id, expiry_date=TODAY + timedelta(days=2))
+    add_item(user_id, location='fridge', expiry_date=TODAY - timedelta(days=1))
+    add_item(user_id, location='fridge')
+
+    soon.location = 'freezer'
+    db.session.commit()
+    db.session.delete(db.session.query(Item).filter_by(location='fridge', expiry_date=None).one())
+    db.session.commit()
+
+    assert get_item_stats(user_id, TODAY) == aggregate_item_stats(user_id, TODAY) == {
+        'total_items': 2, 'expiring_soon': 1, 'expired_items': 1,
+        'items_by_location': {'freezer': 1, 'fridge': 1},
+    }
+    assert ('location', 'pantry') not in counters(user_id)
+
+
+def test_rebuild_overwrites_counters_in_place(user_id):
+    add_item(user_id)
+    rebuild_item_stats(user_id)
+    db.session.execute(stats_table.insert().values(user_id=user_id, kind='location', key='attic', count=4))
+    db.session.execute(stats_table.update().where(stats_table.c.kind == 'total').values(count=9))
+    db.session.commit()
+
+    rebuild_item_stats(user_id)
+    rebuild_item_stats(user_id)
+
+    assert counters(user_id) == {('total', ''): 1, ('location', 'pantry'): 1}
+
+
+def test_mysql_counters_use_a_single_upsert():
+    from item_stats import upsert_counters
+
+    class Recorder:
+        dialect = mysql.dialect()
+
+        def execute(self, statement, rows):
+            self.sql = str(statement.compile(dialect=self.dialect))
+
+    connection = Recorder()
+    upsert_counters(connection, [{'user_id': 1, 'kind': 'total', 'key': '', 'count': 1}])
+
+    assert 'ON DUPLICATE KEY UPDATE count = (item_stats.count + VALUES(count))' in connection.sql
+
+
+def test_past_expiry_days_are_folded_into_one_row(user_id):
+    get_item_stats(user_id, TODAY)
+    old = [add_item(user_id, expiry_date=TODAY - timedelta(days=days)) for days in (1, 2, 30)]
+    add_item(user_id, expiry_date=TODAY)
+
+    assert get_item_stats(user_id, TODAY)['expired_items'] == 3
+    assert counters(user_id) == {
+        ('total', ''): 4, ('location', 'pantry'): 4,
+        ('expired', (TODAY - timedelta(days=1)).isoformat()): 3, ('expiry', TODAY.isoformat()): 1,
+    }
+
+    # Writes to folded days go to the expired row
+    db.session.delete(old[2])
+    old[0].expiry_date = TODAY + timedelta(days=1)
+    add_item(user_id, expiry_date=TODAY - timedelta(days=5))
+    db.session.commit()
+
+    tomorrow = TODAY + timedelta(days=1)
+    for day in (TODAY, tomorrow):
+        assert get_item_stats(user_id, day) == aggregate_item_stats(user_id, day)
+    assert get_item_stats(user_id, tomorrow)['expired_items'] == 3
+    assert counters(user_id)[('expired', TODAY.isoformat())] == 3
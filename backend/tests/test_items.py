@@ -0,0 +1,81 @@
+"""Item list paging."""
+from db import db
+from models.item import Item
+from models.user import User
+
+
+def add_items(count):
+    user = User('bob', 'bob@example.com', 'secret')
+    db.session.add(user)
+    db.session.flush()
+    db.session.add_all([
+        Item(item_name=f'item {n}', category='food', quantity=1, location='pantry', user_id=user.user_id)
+        for n in range(count)
+    ])
+    db.session.commit()
+
+
+def test_item_pages_are_always_bounded(make_app):
+    app = make_app(ITEMS_PAGE_SIZE=2, ITEMS_MAX_PAGE_SIZE=3)
+    with app.app_context():
+        add_items(5)
+    client = app.test_client()
+
+    response = client.get('/api/items')
+    assert len(response.get_json()) == 2
+    assert 'X-Next-Cursor' in response.headers
+    assert len(client.get('/api/items?limit=100').get_json()) == 3
+
+
+def test_non_integer_user_id_is_rejected(make_app):
+    app = make_app()
+
+    assert app.test_client().get('/api/items?user_id=abc').status_code == 400
+
+
+def test_items_are_paged_with_a_cursor(make_app):
+    app = make_app(ITEMS_PAGE_SIZE=2)
+    with app.app_context():
+        add_items(5)
+    client = app.test_client()
+
+    pages, url = [], '/api/items?limit=2'
+    while url:
+        response = client.get(url)
+        pages.append([item['item_name'] for item in response.get_json()])
+        cursor = response.headers.get('X-Next-Cursor')
+        url = cursor and f'/api/items?after={cursor}'
+
+    assert pages == [['item 0', 'item 1'], ['item 2', 'item 3'], ['item 4']]
+
+
+def item_quantities(app):
+    with app.app_context():
+        return [quantity for quantity, in db.session.query(Item.quantity).order_by(Item.item_id)]
+
+
+def test_adjust_item_quantities(make_app):
+    app = make_app(QUANTITY_ADJUST_MAX_BATCH=2)
+    with app.app_context():
+        add_items(2)
+        first, second = [item_id for item_id, in db.session.query(Item.item_id).order_by(Item.item_id)]
+    client = app.test_client()
+
+    assert client.patch(f'/api/items/{first}/adjust', json={'delta': 3}).get_json() == {
+        'quantities': [{'item_id': first, 'quantity': 4}]
+    }
+    response = client.patch('/api/items/adjust', json={'adjustments': [
+        {'item_id': second, 'delta': 2}, {'item_id': second, 'delta': -1},
+    ]})
+    assert response.status_code == 200
+    assert item_quantities(app) == [4, 2]
+
+    assert client.patch(f'/api/items/{second}/adjust', json={'delta': -3}).status_code == 409
+    assert client.patch('/api/items/adjust', json={'adjustments': [
+        {'item_id': first, 'delta': -1}, {'item_id': 12345, 'delta': 1},
+    ]}).status_code == 404
+    assert client.patch(f'/api/items/{first}/adjust', json={'delta': False}).status_code == 400
+    assert client.patch('/api/items/adjust', json={'adjustments': [
+        {'item_id': first, 'delta': 1}, {'item_id': first, 'delta': 1}, {'item_id': second, 'delta': 1},
+    ]}).status_code == 400
+    assert item_quantities(app) == [4, 2]
@@ -0,0 +1,100 @@
+"""Scheduler leases, failover and run history."""
+import time
+from datetime import timedelta
+
+import pytest
+
+from alert_shards import run_alert_shards
+from db import db
+from jobs import JobRunner, LEADER_LEASE
+from models.alert_cycle import AlertCycle
+from models.job import JobRun
+
+
+@pytest.fixture
+def app(make_app):
+    app = make_app(JOB_LEASE_SECONDS=60)
+    with app.app_context():
+        yield app
+
+
+def expire(runner):
+    """Let runner's lease run out, as if it had stopped renewing it."""
+    runner.acquire(LEADER_LEASE, 0.05)
+    time.sleep(0.1)
+
+
+def test_lease_is_exclusive_until_it_expires(app):
+    first, second = JobRunner(app), JobRunner(app)
+
+    assert first.acquire(LEADER_LEASE, 60)
+    assert not second.acquire(LEADER_LEASE, 60)
+    assert first.acquire(LEADER_LEASE, 60)
+
+    expire(first)
+    assert not first.holds_lease()
+    assert second.acquire(LEADER_LEASE, 60)
+    assert not first.acquire(LEADER_LEASE, 60)
+
+
+def test_released_lease_can_be_taken_at_once(app):
+    first, second = JobRunner(app), JobRunner(app)
+    assert first.elect() and first.is_leader
+
+    first.resign()
+
+    assert not first.is_leader
+    assert second.elect()
+
+
+def test_jobs_only_start_while_the_lease_is_valid(app):
+    runner, ran = JobRunner(app), []
+    runner.register('count', lambda: ran.append(1), timedelta(0))
+    assert runner.elect()
+
+    expire(runner)
+    assert runner.is_leader
+    runner.run_due()
+    assert ran == []
+
+    runner.elect()
+    runner.run_due()
+    assert ran == [1]
+
+
+def test_run_history_records_outcome_and_rows_scanned(app):
+    runner = JobRunner(app)
+    runner.register('scan', lambda: runner.add_rows_scanned(7), timedelta(hours=1))
+    runner.register('broken', lambda: 1 / 0, timedelta(hours=1))
+    runner.elect()
+
+    runner.run_due()
+    runner.run_due()
+
+    runs = {run.job: run for run in JobRun.query.all()}
+    assert len(runs) == JobRun.query.count() == 2
+    assert (runs['scan'].status, runs['scan'].rows_scanned) == ('succeeded', 7)
+    assert runs['broken'].status == 'failed' and 'ZeroDivisionError' in runs['broken'].error
+
+
+def test_new_leader_resumes_alert_shards_from_the_checkpoint(make_app):
+    app = make_app(ALERT_SHARDS=3, ALERT_WINDOW_HOURS=0, ALERT_MAX_SHARDS_PER_POLL=1)
+    with app.app_context():
+        first, second = JobRunner(app), JobRunner(app)
+        for runner in (first, second):
+            runner.register('alert_shards', run_alert_shards, timedelta(0))
+
+        assert first.elect()
+        first.run_due()
+        assert db.session.query(AlertCycle.next_shard).scalar() == 1
+
+        # The leader stalls; its lease runs out and the other worker takes over
+        expire(first)
+        assert second.elect()
+        first.run_due()
+        second.run_due()
+        second.run_due()
+
+        cycle = db.session.query(AlertCycle).one()
+        assert cycle.next_shard == 3 and cycle.completed_at is not None
+        assert [run.owner for run in JobRun.query.order_by(JobRun.run_id)] == [first.owner] + [second.owner] * 2
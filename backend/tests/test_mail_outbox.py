@@ -0,0 +1,37 @@
+"""Mail outbox: enqueueing and retention."""
+from datetime import datetime, timedelta
+
+from db import db
+from mail_outbox import outbox, SUBJECT_LENGTH
+from models.outbox import OutboxMessage
+
+
+def test_long_subjects_are_truncated(make_app):
+    app = make_app()
+    with app.app_context():
+        outbox.enqueue('Low stock: ' + 'very long item name ' * 30, ['a@example.com'], 'body')
+        db.session.commit()
+
+        subject = db.session.query(OutboxMessage.subject).scalar()
+        assert len(subject) == SUBJECT_LENGTH
+        assert subject.startswith('Low stock: very long') and subject.endswith('...')
+
+
+def test_old_sent_messages_are_purged(make_app):
+    app = make_app(MAIL_OUTBOX_RETENTION_DAYS=7)
+    now = datetime(2030, 1, 31)
+    with app.app_context():
+        for subject, status, sent_at in [
+            ('old sent', 'sent', now - timedelta(days=8)),
+            ('recent sent', 'sent', now - timedelta(days=1)),
+            ('old failed', 'failed', None),
+            ('pending', 'pending', None),
+        ]:
+            message = outbox.enqueue(subject, ['a@example.com'], 'body')
+            message.status, message.sent_at = status, sent_at
+        db.session.commit()
+
+        assert outbox.purge_sent(now) == 1
+        assert sorted(subject for subject, in db.session.query(OutboxMessage.subject)) == [
+            'old failed', 'pending', 'recent sent'
+        ]
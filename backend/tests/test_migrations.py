@@ -0,0 +1,59 @@
+"""Versioned schema migrations."""
+import pytest
+from sqlalchemy.dialects import mysql
+
+import migrations
+from db import db
+from migrations import add_foreign_key, check_schema_version, current_version, latest_version, upgrade
+from models.schema_version import SchemaVersion
+from models.stock import Alert
+
+
+def test_fresh_database_is_migrated_in_order_once(make_app):
+    app = make_app()
+    with app.app_context():
+        versions = [version for version, in db.session.query(SchemaVersion.version).order_by(SchemaVersion.version)]
+        assert versions == list(range(1, latest_version() + 1))
+        assert upgrade() == 0
+        assert check_schema_version() == latest_version()
+
+
+def test_only_pending_migrations_run(make_app, monkeypatch):
+    app = make_app()
+    ran = []
+    with app.app_context():
+        pending = [(latest_version() + n, f'step {n}', lambda n=n: ran.append(n)) for n in (1, 2)]
+        monkeypatch.setattr(migrations, 'MIGRATIONS', migrations.MIGRATIONS + pending)
+
+        assert upgrade() == 2
+        assert upgrade() == 0
+        assert ran == [1, 2]
+        assert current_version() == latest_version()
+
+
+def test_app_refuses_to_start_on_an_old_schema(make_app):
+    make_app()
+    app = make_app(MIGRATE_ON_START=False)
+    with app.app_context():
+        db.session.query(SchemaVersion).filter(SchemaVersion.version == latest_version()).delete()
+        db.session.commit()
+
+    with pytest.raises(RuntimeError, match='run `python migrations.py`'):
+        make_app(MIGRATE_ON_START=False)
+
+
+def test_mysql_foreign_keys_are_added_in_place():
+    class Recorder:
+        dialect = mysql.dialect()
+        statements = []
+
+        def exec_driver_sql(self, sql):
+            self.statements.append(sql)
+
+    connection = Recorder()
+    add_foreign_key(connection, next(iter(Alert.__table__.c.stock_id.foreign_keys)).constraint)
+
+    first, ddl, last = connection.statements
+    assert (first, last) == ('SET foreign_key_checks = 0', 'SET foreign_key_checks = 1')
+    assert ddl.startswith('ALTER TABLE alert ADD FOREIGN KEY(stock_id) REFERENCES stock_item (stock_id)')
+    assert ddl.endswith('ON DELETE CASCADE, ALGORITHM=INPLACE, LOCK=NONE')
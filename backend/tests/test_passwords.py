@@ -0,0 +1,51 @@
+"""Password hashing pool."""
+import os
+import signal
+import time
+
+import pytest
+from flask import Flask
+
+from config import Config
+from passwords import HasherBusy, PasswordHasher
+
+
+@pytest.fixture
+def pool_hasher():
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    app.config.update(PASSWORD_HASH_WORKERS=1, PASSWORD_HASH_MAX_PENDING=1,
+                      PASSWORD_HASH_QUEUE_TIMEOUT=0.05, PASSWORD_HASH_TIMEOUT=10)
+    hasher = PasswordHasher(app)
+    yield hasher
+    if hasher._pool is not None:
+        hasher._pool.shutdown(wait=True)
+
+
+def test_hash_and_verify_in_the_pool(pool_hasher):
+    pwhash = pool_hasher.hash('secret')
+    assert pool_hasher.verify(pwhash, 'secret')
+    assert not pool_hasher.verify(pwhash, 'wrong')
+
+
+def test_timeout_is_busy_and_keeps_the_slot_until_the_job_ends(pool_hasher):
+    pool_hasher.timeout = 0.1
+    with pytest.raises(HasherBusy):
+        pool_hasher._run(time.sleep, 1)
+    # The abandoned job still occupies the only slot
+    with pytest.raises(HasherBusy):
+        pool_hasher._run(time.sleep, 0)
+
+    time.sleep(1.5)
+    assert pool_hasher._run(abs, -1) == 1
+
+
+def test_pool_is_replaced_after_a_worker_dies(pool_hasher):
+    pool_hasher.hash('warm up')
+    for pid in list(pool_hasher._pool._processes):
+        os.kill(pid, signal.SIGKILL)
+    time.sleep(0.5)
+
+    pwhash = pool_hasher.hash('secret')
+
+    assert pool_hasher.verify(pwhash, 'secret')
@@ -0,0 +1,31 @@
+"""Sliding window login limits."""
+from rate_limits import SlidingWindowLimiter
+
+
+def test_events_over_the_limit_are_refused():
+    limiter = SlidingWindowLimiter(limit=2, window=60)
+
+    assert limiter.hit('a') == 0
+    assert limiter.hit('a') == 0
+    assert limiter.hit('a') > 0
+    assert limiter.hit('b') == 0
+
+
+def test_number_of_tracked_keys_is_bounded():
+    limiter = SlidingWindowLimiter(limit=1, window=60, max_keys=100)
+
+    for n in range(10000):
+        limiter.hit(f'10.0.{n // 256}.{n % 256}')
+        assert len(limiter._events) <= 100
+
+
+def test_least_recently_used_keys_are_evicted_first():
+    limiter = SlidingWindowLimiter(limit=1, window=60, max_keys=2)
+    limiter.hit('old')
+    limiter.hit('busy')
+    limiter.hit('old')  # Refused, but marks old as recently used
+
+    limiter.hit('new')
+
+    assert list(limiter._events) == ['old', 'new']
+    assert limiter.hit('old') > 0
@@ -0,0 +1,100 @@
+"""Reads that feed writes or caches must not come from a lagging replica."""
+from datetime import date, timedelta
+
+from flask_jwt_extended import create_access_token
+
+from db import db
+from item_stats import rebuild_item_stats
+from models.item import Item
+from models.item_stats import ItemStat
+from models.user import User
+
+
+def add_user(role='user'):
+    user = User('alice', 'alice@example.com', 'secret', role=role)
+    db.session.add(user)
+    db.session.commit()
+    return user.user_id
+
+
+def auth_headers(user_id):
+    return {'Authorization': f'Bearer {create_access_token(identity=user_id)}'}
+
+
+def total_counter(user_id):
+    return db.session.execute(
+        db.select(ItemStat.count).where(ItemStat.user_id == user_id, ItemStat.kind == 'total')
+    ).scalar()
+
+
+def test_dashboard_stats_are_not_seeded_from_a_lagging_replica(make_app, copy_database):
+    app = make_app(replica='replica.db')
+    with app.app_context():
+        user_id = add_user()
+        # The replica has the user but none of the items or counters written below
+        copy_database('replica.db')
+        expiry = date.today() + timedelta(days=30)
+        for name in ('milk', 'eggs', 'rice'):
+            db.session.add(Item(item_name=name, category='food', quantity=1, location='pantry',
+                                expiry_date=expiry, user_id=user_id))
+        db.session.commit()
+        rebuild_item_stats(user_id)
+        db.session.commit()
+        headers = auth_headers(user_id)
+
+    response = app.test_client().get('/api/dashboard/stats', headers=headers)
+
+    assert response.status_code == 200
+    assert response.get_json()['total_items'] == 3
+    with app.app_context():
+        assert total_counter(user_id) == 3
+
+
+def test_changed_user_is_not_cached_from_a_lagging_replica(make_app, copy_database):
+    app = make_app(replica='replica.db')
+    with app.app_context():
+        user_id = add_user(role='user')
+        copy_database('replica.db')
+        db.session.get(User, user_id).role = 'admin'
+        db.session.commit()
+        headers = auth_headers(user_id)
+
+    client = app.test_client()
+    for _ in range(2):
+        response = client.get('/api/auth/verify-token', headers=headers)
+        assert response.status_code == 200
+        assert response.get_json()['user']['role'] == 'admin'
+
+
+def test_deleted_user_is_not_loaded_from_a_lagging_replica(make_app, copy_database):
+    app = make_app(replica='replica.db')
+    with app.app_context():
+        user_id = add_user()
+        copy_database('replica.db')
+        db.session.delete(db.session.get(User, user_id))
+        db.session.commit()
+        headers = auth_headers(user_id)
+
+    response = app.test_client().get('/api/auth/verify-token', headers=headers)
+
+    assert response.status_code == 404
+
+
+def test_reads_go_to_the_replica_and_writes_to_the_primary(make_app, copy_database):
+    app = make_app(replica='replica.db')
+    with app.app_context():
+        copy_database('replica.db')
+        primary, replica = db.engines[None], db.engines['replica']
+
+        db.session.info['read_replica'] = True
+        assert db.session.get_bind(clause=db.select(User)) is replica
+        assert db.session.get_bind(clause=db.text('SELECT 1')) is primary
+
+        db.session.add(User('erin', 'erin@example.com', 'secret'))
+        db.session.flush()
+        assert db.session.info['wrote']
+        assert db.session.get_bind(clause=db.select(User)) is primary
+        db.session.commit()
+
+    with app.app_context():
+        assert db.session.query(User).count() == 1
@@ -0,0 +1,41 @@
+"""Item search index maintenance."""
+from db import db
+from models.item import Item
+from models.search_index import ItemTrigram, ItemTerm
+from models.user import User
+import search
+
+
+def names(results):
+    return [item.item_name for item, score in results]
+
+
+def test_index_follows_item_writes(make_app):
+    app = make_app()
+    with app.app_context():
+        user = User('dana', 'dana@example.com', 'secret')
+        db.session.add(user)
+        db.session.flush()
+        item = Item(item_name='Basmati rice', category='grains', quantity=1, location='pantry', user_id=user.user_id)
+        db.session.add(item)
+        db.session.commit()
+
+        assert names(search.search_items('basmati')) == ['Basmati rice']
+        assert names(search.search_items('rice', user_id=user.user_id)) == ['Basmati rice']
+        assert search.search_items('rice', user_id=user.user_id + 1) == []
+        assert search.autocomplete('bas') == ['Basmati rice']
+
+        item.item_name = 'Jasmine rice'
+        db.session.commit()
+
+        assert search.search_items('basmati') == []
+        assert names(search.search_items('jasmine')) == ['Jasmine rice']
+        assert names(search.search_items('jasmnie rice', fuzzy=True)) == ['Jasmine rice']
+        assert search.autocomplete('bas') == []
+
+        db.session.delete(item)
+        db.session.commit()
+
+        assert search.search_items('jasmine') == []
+        assert ItemTrigram.query.count() == 0
+        assert ItemTerm.query.count() == 0
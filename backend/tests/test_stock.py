@@ -0,0 +1,115 @@
+"""Stock item routes."""
+from datetime import date
+
+from db import db
+from migrations import delete_orphaned_alerts
+from models.stock import StockItem, Alert
+
+
+def add_stock(name='flour', quantity=1):
+    item = StockItem(name=name, quantity=quantity, expiration_date=date(2030, 1, 1))
+    db.session.add(item)
+    db.session.commit()
+    return item.stock_id
+
+
+def test_deleting_stock_deletes_its_alerts(make_app):
+    app = make_app()
+    with app.app_context():
+        stock_id = add_stock()
+        db.session.add(Alert(stock_id=stock_id, kind='low_stock', message='flour is low'))
+        db.session.commit()
+
+    response = app.test_client().delete(f'/stock/{stock_id}')
+
+    assert response.status_code == 200
+    with app.app_context():
+        assert db.session.query(Alert).count() == 0
+        # SQLite hands out the id of the deleted row again
+        assert add_stock('sugar', 10) == stock_id
+        assert db.session.query(Alert).filter_by(stock_id=stock_id).count() == 0
+
+
+def test_migration_deletes_alerts_left_by_deleted_stock(make_app):
+    app = make_app()
+    with app.app_context():
+        kept = add_stock()
+        db.session.add_all([
+            Alert(stock_id=kept, kind='low_stock', message='flour is low'),
+            Alert(stock_id=kept + 1, kind='low_stock', message='gone is low'),
+            Alert(stock_id=None, message='untyped'),
+        ])
+        db.session.commit()
+
+        delete_orphaned_alerts()
+
+        assert sorted(stock_id or 0 for stock_id, in db.session.query(Alert.stock_id)) == [0, kept]
+
+
+def test_thresholds_must_be_non_negative_integers(make_app):
+    app = make_app()
+    with app.app_context():
+        stock_id = add_stock()
+    client = app.test_client()
+    new_stock = {'name': 'rice', 'quantity': 1, 'expiration_date': '2030-01-01'}
+
+    for bad in (-1, True, '3', 1.5):
+        assert client.post('/stock', json=dict(new_stock, low_stock_threshold=bad)).status_code == 400
+        assert client.put(f'/stock/{stock_id}', json={'low_stock_threshold': bad}).status_code == 400
+        assert client.put('/stock/category-thresholds/grains', json={'threshold': bad}).status_code == 400
+    assert client.put('/stock/category-thresholds/grains', json={'threshold': None}).status_code == 400
+    assert client.put('/stock/category-thresholds/grains', data='not json').status_code == 400
+    assert client.post('/stock', data='not json').status_code == 400
+
+    assert client.post('/stock', json=dict(new_stock, low_stock_threshold=0)).status_code == 201
+    assert client.put(f'/stock/{stock_id}', json={'low_stock_threshold': 4}).status_code == 200
+    assert client.put(f'/stock/{stock_id}', json={'low_stock_threshold': None}).status_code == 200
+    assert client.put('/stock/category-thresholds/grains', json={'threshold': 2}).status_code == 200
+
+
+def quantities(app):
+    with app.app_context():
+        return dict(db.session.query(StockItem.stock_id, StockItem.quantity))
+
+
+def test_adjust_stock_quantities(make_app):
+    app = make_app(QUANTITY_ADJUST_MAX_BATCH=3)
+    with app.app_context():
+        flour, sugar = add_stock('flour', 5), add_stock('sugar', 1)
+    client = app.test_client()
+
+    response = client.patch(f'/stock/{flour}/adjust', json={'delta': -2})
+    assert response.status_code == 200
+    assert response.get_json() == {'quantities': [{'stock_id': flour, 'quantity': 3}]}
+
+    response = client.patch('/stock/adjust', json={'adjustments': [
+        {'stock_id': flour, 'delta': 1}, {'stock_id': sugar, 'delta': 4}, {'stock_id': flour, 'delta': 2},
+    ]})
+    assert response.status_code == 200
+    assert quantities(app) == {flour: 6, sugar: 5}
+
+
+def test_adjustments_that_cannot_apply_change_nothing(make_app):
+    app = make_app(QUANTITY_ADJUST_MAX_BATCH=3)
+    with app.app_context():
+        flour, sugar = add_stock('flour', 5), add_stock('sugar', 1)
+    client = app.test_client()
+
+    response = client.patch('/stock/adjust', json={'adjustments': [
+        {'stock_id': flour, 'delta': -1}, {'stock_id': sugar, 'delta': -2},
+    ]})
+    assert response.status_code == 409
+    assert response.get_json()['insufficient'] == [sugar]
+
+    response = client.patch('/stock/adjust', json={'adjustments': [
+        {'stock_id': flour, 'delta': 1}, {'stock_id': 999, 'delta': 1},
+    ]})
+    assert response.status_code == 404
+    assert response.get_json()['not_found'] == [999]
+    assert client.patch('/stock/999/adjust', json={'delta': 1}).status_code == 404
+
+    assert client.patch(f'/stock/{flour}/adjust', json={'delta': True}).status_code == 400
+    assert client.patch('/stock/adjust', json={'adjustments': [
+        {'stock_id': flour, 'delta': 1} for _ in range(4)
+    ]}).status_code == 400
+    assert quantities(app) == {flour: 5, sugar: 1}
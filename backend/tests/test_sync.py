@@ -0,0 +1,84 @@
+"""Delta sync of reminders: cursors, overlap, tombstones and expiry."""
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from db import db
+from models.reminder import Reminder
+from models.user import User
+from sync import CURSOR_FORMAT
+
+
+@pytest.fixture
+def app(make_app):
+    app = make_app(SYNC_CURSOR_OVERLAP_SECONDS=2, SYNC_TOMBSTONE_RETENTION_DAYS=30)
+    with app.app_context():
+        user = User('dana', 'dana@example.com', 'secret')
+        db.session.add(user)
+        db.session.commit()
+        app.user_id = user.user_id
+        yield app
+
+
+def add_reminder(user_id, title, updated_at=None):
+    reminder = Reminder(user_id=user_id, title=title, reminder_text='', due_date=date(2030, 1, 1))
+    db.session.add(reminder)
+    db.session.commit()
+    if updated_at is not None:
+        db.session.execute(db.update(Reminder).where(Reminder.reminder_id == reminder.reminder_id)
+                           .values(updated_at=updated_at))
+        db.session.commit()
+    return reminder.reminder_id
+
+
+def changes(client, since=None):
+    return client.get('/reminders/changes', query_string={'since': since} if since else {})
+
+
+def cursor(moment):
+    return moment.strftime(CURSOR_FORMAT)
+
+
+def titles(response):
+    return sorted(change['title'] for change in response.get_json()['changes'])
+
+
+def test_full_download_then_only_changes(app):
+    client = app.test_client()
+    now = datetime.utcnow()
+    add_reminder(app.user_id, 'old', updated_at=now - timedelta(hours=1))
+    add_reminder(app.user_id, 'recent', updated_at=now - timedelta(minutes=5))
+
+    response = changes(client)
+    assert titles(response) == ['old', 'recent']
+    assert response.get_json()['deleted'] == []
+
+    assert titles(changes(client, cursor(now - timedelta(minutes=10)))) == ['recent']
+
+
+def test_overlap_window_repeats_rows_stamped_just_before_the_cursor(app):
+    client = app.test_client()
+    since = datetime.utcnow().replace(microsecond=0) - timedelta(minutes=1)
+    add_reminder(app.user_id, 'edge', updated_at=since - timedelta(seconds=1))
+    add_reminder(app.user_id, 'before', updated_at=since - timedelta(seconds=5))
+
+    assert titles(changes(client, cursor(since))) == ['edge']
+
+
+def test_deletions_are_returned_as_tombstones(app):
+    client = app.test_client()
+    since = cursor(datetime.utcnow() - timedelta(minutes=1))
+    reminder_id = add_reminder(app.user_id, 'gone')
+    db.session.delete(db.session.get(Reminder, reminder_id))
+    db.session.commit()
+
+    body = changes(client, since).get_json()
+
+    assert body['changes'] == []
+    assert body['deleted'] == [reminder_id]
+
+
+def test_cursor_older_than_the_tombstones_requires_a_full_resync(app):
+    response = changes(app.test_client(), cursor(datetime.utcnow() - timedelta(days=31)))
+
+    assert response.status_code == 410
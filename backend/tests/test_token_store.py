@@ -0,0 +1,41 @@
+"""Password reset token stores."""
+from datetime import datetime, timedelta
+
+import pytest
+
+from db import db
+from models.reset_token import ResetToken
+from models.user import User
+import token_store
+
+
+def stored_tokens(store):
+    if isinstance(store, token_store.MemoryTokenStore):
+        return len(store)
+    return db.session.query(ResetToken).count()
+
+
+@pytest.mark.parametrize('kind', ['memory', 'database'])
+def test_tokens_are_single_use_and_swept_lazily(make_app, monkeypatch, kind):
+    now = [1000.0]
+    monkeypatch.setattr(token_store.time, 'monotonic', lambda: now[0])
+    app = make_app(RESET_TOKEN_STORE=kind, RESET_TOKEN_SWEEP_SECONDS=60)
+    with app.app_context():
+        user = User('gina', 'gina@example.com', 'secret')
+        db.session.add(user)
+        db.session.flush()
+        store = app.extensions['reset_tokens'].backend
+        later, earlier = datetime.utcnow() + timedelta(hours=1), datetime.utcnow() - timedelta(seconds=1)
+
+        store.put('stale', user.user_id, earlier)
+        store.put('fresh', user.user_id, later)
+        # The sweep ran on the first put; the next one is due after the interval
+        assert stored_tokens(store) == 2
+        now[0] += 60
+        store.put('other', user.user_id, later)
+        assert stored_tokens(store) == 2
+
+        assert store.pop('stale') is None
+        assert store.pop('fresh') == user.user_id
+        assert store.pop('fresh') is None
+        assert stored_tokens(store) == 1
@@ -0,0 +1,130 @@
+"""Expiring storage for password reset tokens.
+
+ResetTokenStore delegates to a backend picked by RESET_TOKEN_STORE:
+
+- 'database' (default) keeps tokens in the password_reset_tokens table, so
+  every worker process sees tokens issued by any other. Writes join the
+  caller's transaction; the caller commits.
+- 'memory' keeps them in a process-local dict, for tests and single-process
+  development.
+
+Neither backend runs a background job. Expired tokens are ignored on lookup
+and deleted in bulk at most once per RESET_TOKEN_SWEEP_SECONDS, piggybacking
+on token writes.
+"""
+import hashlib
+import threading
+import time
+from datetime import datetime
+from db import db
+from models.reset_token import ResetToken
+
+reset_token_table = ResetToken.__table__
+
+
+def token_hash(token):
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+
+class DatabaseTokenStore:
+    def __init__(self, sweep_interval=300):
+        self.sweep_interval = sweep_interval
+        self._last_sweep = 0
+
+    def put(self, token, user_id, expires_at):
+        self._maybe_sweep()
+        db.session.execute(reset_token_table.insert().values(
+            token_hash=token_hash(token), user_id=user_id, expires_at=expires_at
+        ))
+
+    def pop(self, token):
+        """Consume token and return its user_id, or None if it is unknown or expired."""
+        key = token_hash(token)
+        user_id = db.session.execute(
+            db.select(ResetToken.user_id).where(ResetToken.token_hash == key, ResetToken.expires_at > datetime.utcnow())
+        ).scalar()
+        if user_id is None:
+            return None
+        # Only the request whose delete removed the row gets to use the token
+        deleted = db.session.execute(reset_token_table.delete().where(reset_token_table.c.token_hash == key))
+        return user_id if deleted.rowcount == 1 else None
+
+    def sweep(self):
+        """Delete all expired tokens; returns how many were removed."""
+        return db.session.execute(
+            reset_token_table.delete().where(reset_token_table.c.expires_at <= datetime.utcnow())
+        ).rowcount
+
+    def _maybe_sweep(self):
+        now = time.monotonic()
+        if now - self._last_sweep >= self.sweep_interval:
+            self._last_sweep = now
+            self.sweep()
+
+
+class MemoryTokenStore:
+    def __init__(self, sweep_interval=300):
+        self.sweep_interval = sweep_interval
+        self._last_sweep = 0
+        self._tokens = {}
+        self._lock = threading.Lock()
+
+    def put(self, token, user_id, expires_at):
+        self._maybe_sweep()
+        with self._lock:
+            self._tokens[token_hash(token)] = (user_id, expires_at)
+
+    def pop(self, token):
+        with self._lock:
+            entry = self._tokens.pop(token_hash(token), None)
+        if entry is None or entry[1] <= datetime.utcnow():
+            return None
+        return entry[0]
+
+    def sweep(self):
+        now = datetime.utcnow()
+        with self._lock:
+            expired = [key for key, (_, expires_at) in self._tokens.items() if expires_at <= now]
+            for key in expired:
+                del self._tokens[key]
+        return len(expired)
+
+    def _maybe_sweep(self):
+        now = time.monotonic()
+        if now - self._last_sweep >= self.sweep_interval:
+            self._last_sweep = now
+            self.sweep()
+
+    def __len__(self):
+        return len(self._tokens)
+
+
+STORES = {
+    'database': DatabaseTokenStore,
+    'memory': MemoryTokenStore,
+}
+
+
+class ResetTokenStore:
+    """Facade over the configured token store backend."""
+
+    def __init__(self, app=None):
+        self.backend = MemoryTokenStore()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        kind = app.config['RESET_TOKEN_STORE']
+        if kind not in STORES:
+            raise ValueError(f"Unknown RESET_TOKEN_STORE: {kind}")
+        self.backend = STORES[kind](sweep_interval=app.config['RESET_TOKEN_SWEEP_SECONDS'])
+        app.extensions['reset_tokens'] = self
+
+    def put(self, token, user_id, expires_at):
+        self.backend.put(token, user_id, expires_at)
+
+    def pop(self, token):
+        return self.backend.pop(token)
+
+    def sweep(self):
+        return self.backend.sweep()
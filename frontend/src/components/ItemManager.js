@@ -14,8 +14,15 @@ const ItemManager = () => {
   // Fetch all items
   const fetchItems = async () => {
     try {
-      const response = await axios.get('/api/items');
-      setItems(response.data);
+      // The item list is paged; follow X-Next-Cursor until the last page
+      const all = [];
+      let cursor = null;
+      do {
+        const response = await axios.get('/api/items', { params: cursor ? { after: cursor } : {} });
+        all.push(...response.data);
+        cursor = response.headers['x-next-cursor'];
+      } while (cursor);
+      setItems(all);
     } catch (error) {
       console.error("Error fetching items:", error);
     }
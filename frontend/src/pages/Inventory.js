@@ -93,8 +93,15 @@ const Inventory = ({ isDarkMode }) => {
     const fetchInventory = async () => {
         try {
             setLoading(true);
-            const response = await api.get('/api/items');
-            setInventory(response.data);
+            // The item list is paged; follow X-Next-Cursor until the last page
+            const items = [];
+            let cursor = null;
+            do {
+                const response = await api.get('/api/items', { params: cursor ? { after: cursor } : {} });
+                items.push(...response.data);
+                cursor = response.headers['x-next-cursor'];
+            } while (cursor);
+            setInventory(items);
         } catch (error) {
             console.error('Error fetching inventory:', error);
             toast.error('Failed to load inventory');